@@ -1,45 +1,225 @@
 import os
-import google.generativeai as genai
 from dotenv import load_dotenv
 import json
 import logging
+import threading
 from collections import namedtuple
 import difflib
+from beispiel_index import BeispielIndex, FEW_SHOT_TOKEN_BUDGET
+from rate_limit import RateLimiter, mit_backoff
+from text_normalisierung import kuerze_auf_tokens, PROMPT_BODY_TOKENS
+from klassifikations_cache import KlassifikationsCache, KLASSIFIKATIONS_CACHE_DB, fingerprint
+from metriken import metriken
+import lokaler_classifier
+from lokaler_classifier import LokalerClassifier, protokolliere_kalibrierung
 
 load_dotenv()
 
+# Anzahl E-Mails pro Gemini-Anfrage in classify_batch
+GEMINI_BATCH_GROESSE = int(os.getenv("GEMINI_BATCH_GROESSE", 10))
+GEMINI_ANFRAGEN_PRO_MINUTE = float(os.getenv("GEMINI_ANFRAGEN_PRO_MINUTE", 60))
+# Kurze Spitzen bis zu 10 Sekunden Kontingent erlaubt
+gemini_limit = RateLimiter(GEMINI_ANFRAGEN_PRO_MINUTE / 60, kapazitaet=max(1.0, GEMINI_ANFRAGEN_PRO_MINUTE / 6))
+
+_model_lock = threading.Lock()
+
 # Modellkapselung
 class GeminiClassifier:
-    def __init__(self):
+    def __init__(self, api_key: str | None = None, cache_pfad: str | None = None,
+                 lokales_modell: LokalerClassifier | None = None, lokal: bool | None = None):
+        """
+        :param lokales_modell: fest vorgegebenes lokales Modell (z. B. nur im Speicher), sonst aus LOKALER_CLASSIFIER_DATEI
+        :param lokal: lokales Modell ein-/ausschalten (None: LOKALER_CLASSIFIER_AKTIV)
+        """
         self._model = None
-        self._api_key = os.getenv("GEMINI_API_KEY")
+        self._api_key = api_key or os.getenv("GEMINI_API_KEY")
         if not self._api_key:
             raise ValueError("❌ Gemini API Key fehlt. Bitte .env Datei erstellen oder setzen.")
-        genai.configure(api_key=self._api_key)
-        self._model = genai.GenerativeModel("models/gemini-1.5-pro")
+        self._index = None
+        self._index_version = None
+        self._lokal = lokales_modell
+        self._lokal_fest = lokales_modell is not None
+        self._lokal_aktiv = lokal
+        self._lokal_pfad = None
+        self._lokal_version = None
+        self.cache = KlassifikationsCache(cache_pfad or KLASSIFIKATIONS_CACHE_DB)
+        self.cache.bereinige()
+
+    def _gemini_modell(self):
+        """Konfiguriert Gemini erst bei der ersten Anfrage – entscheidet das lokale Modell alles, nie."""
+        with _model_lock:
+            if self._model is None:
+                # Erst hier importieren: google.generativeai (grpc, protobuf) kostet beim Start fast eine Sekunde
+                import google.generativeai as genai
+                genai.configure(api_key=self._api_key)
+                self._model = genai.GenerativeModel("models/gemini-1.5-pro")
+            return self._model
 
-    def classify(self, subject: str, sender: str, body: str, regeln: dict, gmail_labels: list[str] | None = None, trainingsdaten: list[dict] | None = None) -> dict:
+    def _beispiel_index(self, trainingsdaten: list[dict]) -> BeispielIndex:
+        """Baut den Ähnlichkeitsindex einmal pro Version des Trainingsspeichers auf (Listen ohne Version jedes Mal)."""
+        version = getattr(trainingsdaten, "version", None)
+        if self._index is None or version is None or self._index_version != version:
+            self._index = BeispielIndex(trainingsdaten)
+            self._index_version = version
+            logging.info(f"Few-Shot-Index über {len(trainingsdaten)} Beispiele aufgebaut.")
+        return self._index
+
+    def _lokales_modell(self, trainingsdaten: list[dict] | None) -> LokalerClassifier | None:
+        """Lädt das lokale Modell einmal von der Platte und gleicht es pro Version des Trainingsspeichers inkrementell ab."""
+        aktiv = lokaler_classifier.LOKALER_CLASSIFIER_AKTIV if self._lokal_aktiv is None else self._lokal_aktiv
+        if not aktiv:
+            return None
+        pfad = lokaler_classifier.LOKALER_CLASSIFIER_DATEI
+        # Neu laden, wenn ein Worker das nächste Postfach mit eigener Modelldatei übernimmt
+        if not self._lokal_fest and (self._lokal is None or self._lokal_pfad != pfad):
+            self._lokal = LokalerClassifier(pfad)
+            self._lokal_pfad = pfad
+            self._lokal_version = None
+        version = getattr(trainingsdaten, "version", None)
+        if trainingsdaten and (version is None or self._lokal_version != version):
+            self._lokal_version = version
+            if self._lokal.trainiere(trainingsdaten):
+                self._lokal.speichere()
+        return self._lokal
+
+    def _lokal_klassifiziere(self, subject: str, sender: str, body: str, regeln: dict, kategorien: list[str],
+                             kategorien_normalisiert: list[str], trainingsdaten: list[dict] | None) -> tuple[dict | None, tuple | None]:
         """
-        Klassifiziert eine E-Mail mithilfe von Gemini AI, optional mit Trainingsdaten.
-        :return: Dict mit Schlüsseln: kategorie, ist_newsletter, ist_unbezahlt, unsubscribe_url
+        Fragt das lokale Modell. :return: (Ergebnis, None), wenn es sicher genug ist, sonst
+        (None, (Kategorie, Wahrscheinlichkeit)) bzw. (None, None) ohne Vorhersage – dann entscheidet Gemini.
         """
+        modell = self._lokales_modell(trainingsdaten)
+        vorhersage = modell.vorhersage(subject, sender, body) if modell is not None else None
+        if vorhersage is None:
+            return None, None
+        label, wahrscheinlichkeit = vorhersage
+        # Trainingsdaten tragen Gmail-Labelnamen: zurück auf die Regel mit diesem Label bzw. das Gmail-Label
+        kategorie = next((k for k, regel in regeln.items() if regel.get("label") == label), label.lower().strip())
+        if lokaler_classifier.ist_systemlabel(label) or kategorie.lower().strip() not in kategorien_normalisiert:
+            kategorie = None
+        if kategorie is None or wahrscheinlichkeit < lokaler_classifier.LOKAL_SCHWELLE:
+            metriken.zaehle("lokal_eskaliert")
+            return None, (kategorie, wahrscheinlichkeit)
+        metriken.zaehle("lokal_treffer")
+        result = self._ordne_zu(kategorie, kategorien, kategorien_normalisiert)
+        logging.info(f"🧮 Lokales Modell: '{result['kategorie']}' (p={wahrscheinlichkeit:.2f}) für Betreff: '{subject}'")
+        return result, None
+
+    @staticmethod
+    def _kalibrierung(subject: str, lokal: tuple, result: dict) -> None:
+        """Loggt die unsichere lokale Vorhersage neben der Gemini-Antwort."""
+        kategorie, wahrscheinlichkeit = lokal
+        logging.info(f"🧮 Lokal '{kategorie}' (p={wahrscheinlichkeit:.2f}) vs. Gemini '{result['kategorie']}' "
+                     f"für Betreff: '{subject}'")
+        protokolliere_kalibrierung(kategorie, wahrscheinlichkeit, result["kategorie"])
+
+    def _generate(self, prompt: str):
+        """Gemini-Aufruf mit Anfragen-Limit und Backoff bei 429/5xx; erfasst Latenz und Token-Verbrauch."""
+        gemini_limit.erwerbe()
+        metriken.zaehle("gemini_anfragen")
+        try:
+            with metriken.messe("gemini_anfrage"):
+                response = mit_backoff(self._gemini_modell().generate_content, prompt)
+        except Exception:
+            metriken.zaehle("gemini_fehler")
+            raise
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None and metriken.aktiv:
+            metriken.zaehle("gemini_prompt_tokens", getattr(usage, "prompt_token_count", 0) or 0)
+            metriken.zaehle("gemini_antwort_tokens", getattr(usage, "candidates_token_count", 0) or 0)
+        return response
+
+    @staticmethod
+    def _kategorien(regeln: dict, gmail_labels: list[str] | None) -> tuple[list[str], list[str]]:
+        """Kategorien aus Regeln und Gmail-Labels, jeweils im Original und normalisiert (Kleinschreibung, Whitespace)."""
         kategorien = list(regeln.keys())
         if gmail_labels:
             gmail_labels_clean = [lbl.lower().strip() for lbl in gmail_labels if lbl.lower().strip() not in kategorien]
             kategorien += gmail_labels_clean
-        # Normalisiere Kategorien (Kleinschreibung, Whitespace)
         kategorien_normalisiert = [k.lower().strip() for k in kategorien]
+        return kategorien, kategorien_normalisiert
 
+    @staticmethod
+    def _leeres_ergebnis() -> dict:
+        return {
+            "kategorie": None,
+            "ist_newsletter": False,
+            "ist_unbezahlt": False,
+            "unsubscribe_url": None
+        }
+
+    @classmethod
+    def _fehler_ergebnis(cls) -> dict:
+        """Keine Kategorie, weil Gemini nicht geantwortet hat (im Gegensatz zu "unbekannt"); nicht gecacht."""
+        return {**cls._leeres_ergebnis(), "fehler": True}
+
+    def _ordne_zu(self, antwort: str, kategorien: list[str], kategorien_normalisiert: list[str]) -> dict:
+        """Ordnet eine Modellantwort einer Kategorie zu: exakte Übereinstimmung oder Fuzzy-Match."""
+        result = self._leeres_ergebnis()
+        antwort_norm = antwort.strip().lower()
+        if antwort_norm in kategorien_normalisiert:
+            idx = kategorien_normalisiert.index(antwort_norm)
+            result["kategorie"] = kategorien[idx]  # Originalname
+            if antwort_norm == "newsletter":
+                result["ist_newsletter"] = True
+        elif antwort_norm == "unbekannt":
+            result["kategorie"] = None
+        else:
+            # Fuzzy-Matching (z. B. Tippfehler abfangen)
+            matches = difflib.get_close_matches(antwort_norm, kategorien_normalisiert, n=1, cutoff=0.8)
+            if matches:
+                idx = kategorien_normalisiert.index(matches[0])
+                result["kategorie"] = kategorien[idx]
+                if matches[0] == "newsletter":
+                    result["ist_newsletter"] = True
+                logging.warning(f"⚠️ Fuzzy-Match: '{antwort}' wurde als '{kategorien[idx]}' interpretiert.")
+            else:
+                logging.warning(f"⚠️ Unerwartete Gemini-Antwort: {antwort}")
+                result["kategorie"] = None
+        return result
+
+    @staticmethod
+    def _beispiele_text(beispiele: list[dict]) -> str:
         prompt_examples = ""
-        if trainingsdaten:
-            for item in trainingsdaten:
-                prompt_examples += f"""
+        for item in beispiele:
+            prompt_examples += f"""
 --- Beispiel ---
 Label: {item['label']}
 Betreff: {item['subject']}
 Absender: {item['sender']}
 Inhalt: {item['body'][:200]}
 """
+        return prompt_examples
+
+    def classify(self, subject: str, sender: str, body: str, regeln: dict, gmail_labels: list[str] | None = None,
+                 trainingsdaten: list[dict] | None = None, lokal: bool = True) -> dict:
+        """
+        Klassifiziert eine E-Mail mithilfe von Gemini AI, optional mit Trainingsdaten.
+        Vorher wird das lokale Modell gefragt (lokal=False überspringt das); Gemini nur, wenn es unsicher ist.
+        :return: Dict mit Schlüsseln: kategorie, ist_newsletter, ist_unbezahlt, unsubscribe_url
+        """
+        kategorien, kategorien_normalisiert = self._kategorien(regeln, gmail_labels)
+
+        # Nahezu identische E-Mails (gleicher Absender, Betreff bis auf Zahlen/Daten) nicht erneut anfragen
+        self.cache.pruefe_kategorien(kategorien)
+        cache_schluessel = fingerprint(subject, sender, body)
+        cached = self.cache.get(cache_schluessel)
+        if cached is not None:
+            logging.info(f"🗂️ Cache-Treffer: '{cached['kategorie']}' für Betreff: '{subject}'")
+            return cached
+
+        lokale_vorhersage = None
+        if lokal:
+            result, lokale_vorhersage = self._lokal_klassifiziere(subject, sender, body, regeln, kategorien,
+                                                                  kategorien_normalisiert, trainingsdaten)
+            if result is not None:
+                return result
+
+        prompt_examples = ""
+        if trainingsdaten:
+            # Nur die ähnlichsten Beispiele statt des gesamten Trainingsdatensatzes
+            prompt_examples = self._beispiele_text(
+                self._beispiel_index(trainingsdaten).waehle_beispiele(subject, sender, body))
 
         prompt = f"""
 Du bist ein intelligenter E-Mail-Classifier. Hier sind Beispiele, wie E-Mails bisher klassifiziert wurden:
@@ -48,61 +228,182 @@ Du bist ein intelligenter E-Mail-Classifier. Hier sind Beispiele, wie E-Mails bi
 --- Neue E-Mail zur Klassifizierung ---
 Betreff: {subject}
 Absender: {sender}
-Inhalt (ggf. gekürzt): {body[:2000]}
+Inhalt (ggf. gekürzt): {kuerze_auf_tokens(body, PROMPT_BODY_TOKENS)}
 
 Basierend auf den obigen Beispielen, weise die E-Mail einer der folgenden Kategorien zu:
 {json.dumps(kategorien, ensure_ascii=False)}
 
-Gib nur eine Rückgabe aus: den exakten Namen der Kategorie (z. B. "rechnung", "newsletter", ...).
+Gib nur eine Rückgabe aus: den exakten Namen der Kategorie (z. B. "rechnung", "newsletter", ...).
 Wenn keine passende Kategorie vorhanden ist, gib "unbekannt" zurück.
 """
         try:
-            response = self._model.generate_content(prompt)
+            response = self._generate(prompt)
             antwort = response.text.strip().lower()
             logging.info(f"🔎 Gemini-Modellantwort: '{antwort}' für Betreff: '{subject}'")
-            result = {
-                "kategorie": None,
-                "ist_newsletter": False,
-                "ist_unbezahlt": False,
-                "unsubscribe_url": None
-            }
-            # Robustere Prüfung: exakte Übereinstimmung oder Fuzzy-Match
-            antwort_norm = antwort.strip().lower()
-            if antwort_norm in kategorien_normalisiert:
-                idx = kategorien_normalisiert.index(antwort_norm)
-                result["kategorie"] = kategorien[idx]  # Originalname
-                if antwort_norm == "newsletter":
-                    result["ist_newsletter"] = True
-            elif antwort_norm == "unbekannt":
-                result["kategorie"] = None
-            else:
-                # Fuzzy-Matching (z. B. Tippfehler abfangen)
-                matches = difflib.get_close_matches(antwort_norm, kategorien_normalisiert, n=1, cutoff=0.8)
-                if matches:
-                    idx = kategorien_normalisiert.index(matches[0])
-                    result["kategorie"] = kategorien[idx]
-                    if matches[0] == "newsletter":
-                        result["ist_newsletter"] = True
-                    logging.warning(f"⚠️ Fuzzy-Match: '{antwort}' wurde als '{kategorien[idx]}' interpretiert.")
-                else:
-                    logging.warning(f"⚠️ Unerwartete Gemini-Antwort: {antwort}")
-                    result["kategorie"] = None
+            result = self._ordne_zu(antwort, kategorien, kategorien_normalisiert)
+            if result["kategorie"]:
+                self.cache.set(cache_schluessel, result)
+            if lokale_vorhersage is not None:
+                self._kalibrierung(subject, lokale_vorhersage, result)
             return result
         except Exception as e:
             logging.error(f"❌ Gemini-Fehler: {e}")
-            return {
-                "kategorie": None,
-                "ist_newsletter": False,
-                "ist_unbezahlt": False,
-                "unsubscribe_url": None
-            }
+            return self._fehler_ergebnis()
+
+    def classify_batch(self, emails: list[dict], regeln: dict, gmail_labels: list[str] | None = None,
+                       trainingsdaten: list[dict] | None = None, batch_groesse: int = GEMINI_BATCH_GROESSE) -> dict[str, dict]:
+        """
+        Klassifiziert mehrere E-Mails (Dicts mit id, subject, sender, body) mit einer Gemini-Anfrage pro
+        batch_groesse E-Mails. Der statische Prompt-Teil (Anweisungen, Kategorien, Beispiele) wird so nur
+        einmal pro Batch gesendet. Was das lokale Modell sicher zuordnet, geht nicht an Gemini.
+        Fehlen Einträge in einer erhaltenen Antwort oder sind sie ungültig, werden diese E-Mails einzeln
+        nachklassifiziert; scheitert die Batch-Anfrage ganz, erhalten alle E-Mails des Batches ein
+        Fehler-Ergebnis ("fehler": True) ohne Einzelanfragen.
+        :return: Dict id -> Ergebnis-Dict wie classify
+        """
+        kategorien, kategorien_normalisiert = self._kategorien(regeln, gmail_labels)
+        self.cache.pruefe_kategorien(kategorien)
+        ergebnisse: dict[str, dict] = {}
+        lokale_vorhersagen: dict[str, tuple] = {}
+        offen = []
+        for mail in emails:
+            cached = self.cache.get(fingerprint(mail['subject'], mail['sender'], mail['body']))
+            if cached is not None:
+                logging.info(f"🗂️ Cache-Treffer: '{cached['kategorie']}' für Betreff: '{mail['subject']}'")
+                ergebnisse[mail['id']] = cached
+                continue
+            result, lokale_vorhersage = self._lokal_klassifiziere(mail['subject'], mail['sender'], mail['body'], regeln,
+                                                                  kategorien, kategorien_normalisiert, trainingsdaten)
+            if result is not None:
+                ergebnisse[mail['id']] = result
+                continue
+            if lokale_vorhersage is not None:
+                lokale_vorhersagen[mail['id']] = lokale_vorhersage
+            offen.append(mail)
+
+        for i in range(0, len(offen), batch_groesse):
+            chunk = offen[i:i + batch_groesse]
+            if len(chunk) == 1:
+                mail = chunk[0]
+                ergebnisse[mail['id']] = self.classify(mail['subject'], mail['sender'], mail['body'], regeln, gmail_labels,
+                                                       trainingsdaten, lokal=False)
+                continue
+            antworten = self._classify_chunk(chunk, kategorien, trainingsdaten)
+            if antworten is None:
+                # Anfrage insgesamt gescheitert (429, 5xx, Timeout): keine Einzelanfragen hinterher, die
+                # E-Mails gelten als nicht klassifiziert und werden beim nächsten Lauf erneut versucht
+                for mail in chunk:
+                    ergebnisse[mail['id']] = self._fehler_ergebnis()
+                continue
+            for nummer, mail in enumerate(chunk, start=1):
+                antwort = antworten.get(f"E{nummer}")
+                if antwort is None:
+                    # In der Antwort fehlend oder ungültig: einzeln erneut anfragen
+                    logging.warning(f"⚠️ Keine Batch-Antwort für Betreff '{mail['subject']}' – einzelne Anfrage.")
+                    ergebnisse[mail['id']] = self.classify(mail['subject'], mail['sender'], mail['body'], regeln,
+                                                           gmail_labels, trainingsdaten, lokal=False)
+                    continue
+                logging.info(f"🔎 Gemini-Modellantwort: '{antwort}' für Betreff: '{mail['subject']}'")
+                result = self._ordne_zu(antwort, kategorien, kategorien_normalisiert)
+                if result["kategorie"]:
+                    self.cache.set(fingerprint(mail['subject'], mail['sender'], mail['body']), result)
+                ergebnisse[mail['id']] = result
+        for mail in offen:
+            if mail['id'] in lokale_vorhersagen:
+                self._kalibrierung(mail['subject'], lokale_vorhersagen[mail['id']], ergebnisse[mail['id']])
+        return ergebnisse
+
+    def _classify_chunk(self, chunk: list[dict], kategorien: list[str], trainingsdaten: list[dict] | None) -> dict[str, str] | None:
+        """
+        Sendet eine Batch-Anfrage und gibt die Antworten als Dict (E<n> -> kategorie) zurück;
+        None, wenn die Anfrage selbst (nach Backoff) fehlschlägt.
+        """
+        prompt_examples = ""
+        if trainingsdaten:
+            index = self._beispiel_index(trainingsdaten)
+            beispiele = []
+            # Beispiele aller E-Mails des Batches zusammenführen; Budget gilt für den gesamten Batch
+            budget = FEW_SHOT_TOKEN_BUDGET // len(chunk)
+            for mail in chunk:
+                for item in index.waehle_beispiele(mail['subject'], mail['sender'], mail['body'], token_budget=budget):
+                    if not any(item is b for b in beispiele):
+                        beispiele.append(item)
+            prompt_examples = self._beispiele_text(beispiele)
+
+        neue_emails = ""
+        for nummer, mail in enumerate(chunk, start=1):
+            neue_emails += f"""
+--- E-Mail E{nummer} ---
+Betreff: {mail['subject']}
+Absender: {mail['sender']}
+Inhalt (ggf. gekürzt): {kuerze_auf_tokens(mail['body'], PROMPT_BODY_TOKENS)}
+"""
+
+        prompt = f"""
+Du bist ein intelligenter E-Mail-Classifier. Hier sind Beispiele, wie E-Mails bisher klassifiziert wurden:
+{prompt_examples}
+
+--- Neue E-Mails zur Klassifizierung ---
+{neue_emails}
+
+Basierend auf den obigen Beispielen, weise jede E-Mail einer der folgenden Kategorien zu:
+{json.dumps(kategorien, ensure_ascii=False)}
+
+Gib ausschließlich ein JSON-Array zurück, ein Objekt pro E-Mail, z. B.:
+[{{"id": "E1", "kategorie": "rechnung"}}, {{"id": "E2", "kategorie": "newsletter"}}]
+Verwende den exakten Namen der Kategorie. Wenn keine passende Kategorie vorhanden ist, gib "unbekannt" zurück.
+"""
+        try:
+            response = self._generate(prompt)
+            return self._parse_batch_antwort(response.text)
+        except Exception as e:
+            logging.error(f"❌ Gemini-Fehler (Batch): {e}")
+            return None
+
+    @staticmethod
+    def _parse_batch_antwort(text: str) -> dict[str, str]:
+        """Liest das JSON-Array der Batch-Antwort (auch in ```json-Blöcken) und ignoriert ungültige Einträge."""
+        text = text.strip()
+        start, ende = text.find('['), text.rfind(']')
+        if start == -1 or ende == -1:
+            logging.warning(f"⚠️ Batch-Antwort enthält kein JSON-Array: {text[:200]}")
+            return {}
+        try:
+            eintraege = json.loads(text[start:ende + 1])
+        except json.JSONDecodeError:
+            logging.warning(f"⚠️ Batch-Antwort ist kein gültiges JSON: {text[:200]}")
+            return {}
+        antworten = {}
+        for eintrag in eintraege:
+            if isinstance(eintrag, dict) and isinstance(eintrag.get("kategorie"), str) and eintrag.get("id") is not None:
+                antworten[str(eintrag["id"]).strip()] = eintrag["kategorie"].strip().lower()
+        return antworten
 
 # Singleton-Instanz für Modulgebrauch
 _classifier_instance = None
+_classifier_lock = threading.Lock()
+
+
+def _get_classifier() -> GeminiClassifier:
+    """Erzeugt die Singleton-Instanz beim ersten Gebrauch (threadsicher)."""
+    global _classifier_instance
+    with _classifier_lock:
+        if _classifier_instance is None:
+            _classifier_instance = GeminiClassifier()
+        return _classifier_instance
 
 def classify_email(subject: str, sender: str, body: str, regeln: dict, gmail_labels: list[str] | None = None, trainingsdaten: list[dict] | None = None) -> dict:
     """Wrapper für die GeminiClassifier-Klasse, um Kompatibilität zu wahren."""
-    global _classifier_instance
+    return _get_classifier().classify(subject, sender, body, regeln, gmail_labels, trainingsdaten)
+
+
+def classify_emails_batch(emails: list[dict], regeln: dict, gmail_labels: list[str] | None = None, trainingsdaten: list[dict] | None = None) -> dict[str, dict]:
+    """Wrapper für GeminiClassifier.classify_batch (Dict id -> Ergebnis)."""
+    return _get_classifier().classify_batch(emails, regeln, gmail_labels, trainingsdaten)
+
+
+def classifier_bericht() -> str | None:
+    """Gibt den Cache-Bericht des Classifiers zurück (None, wenn Gemini in diesem Lauf nicht genutzt wurde)."""
     if _classifier_instance is None:
-        _classifier_instance = GeminiClassifier()
-    return _classifier_instance.classify(subject, sender, body, regeln, gmail_labels, trainingsdaten)
+        return None
+    return _classifier_instance.cache.bericht()
@@ -0,0 +1,405 @@
+import argparse
+import base64
+import json
+import logging
+import mmap
+import os
+import re
+import sys
+from collections import Counter
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesHeaderParser, BytesParser
+from typing import Iterator
+
+from ai_classify import classify_emails_batch
+from gmail_utils import batch_execute, get_gmail_service, get_label_registry, lade_credentials, move_emails_to_labels, BATCH_MODIFY_GROESSE, QUOTA_MESSAGES_LIST
+from main import Sitzung, hole_gmail_labels, lese_email
+from utils import logge_neue_kategorie, BODY_MAX_BYTES
+
+# ==== Einstellungen ====
+BACKFILL_PLAN = os.getenv("BACKFILL_PLAN", "backfill_plan.jsonl")
+# Nachrichten pro Block: ein Batch für die ID-Zuordnung, ein Checkpoint im Plan
+BACKFILL_BLOCK = int(os.getenv("BACKFILL_BLOCK", 100))
+
+# Bereits gelesene Teile des Archivs alle 64 MB aus dem Speicher entlassen
+_FREIGABE_SCHRITT = 64 * 1024 * 1024
+_MBOX_TRENNER = b"\nFrom "
+_MBOX_ESCAPE = re.compile(rb"^>(>*From )", re.MULTILINE)
+_KOPF_ENDE = re.compile(rb"\r?\n\r?\n")
+
+
+class ArchivNachricht:
+    """
+    Eine Nachricht im gemappten Archiv: nur der Header wird sofort gelesen (für die Message-ID),
+    der vollständige Inhalt erst bei Bedarf geparst.
+    """
+
+    def __init__(self, puffer, start: int, ende: int, position: int, mbox: bool = False):
+        self._puffer = puffer
+        self._start = start
+        self._ende = ende
+        self._mbox = mbox
+        # Position hinter dieser Nachricht: dort setzt ein abgebrochener Lauf wieder an
+        self.position = position
+        kopf_ende = _KOPF_ENDE.search(puffer, start, ende)
+        kopf = puffer[start:kopf_ende.end() if kopf_ende else ende]
+        self.message_id = (BytesHeaderParser(policy=policy.default).parsebytes(kopf).get("Message-ID") or "").strip().strip("<>")
+
+    def parse(self) -> EmailMessage:
+        roh = self._puffer[self._start:self._ende]
+        if self._mbox:
+            # mboxrd: ">From " am Zeilenanfang war beim Export maskiert
+            roh = _MBOX_ESCAPE.sub(rb"\1", roh)
+        return BytesParser(policy=policy.default).parsebytes(roh)
+
+
+def _mappe(pfad: str):
+    """Mappt eine Datei nur lesend (None bei leerer Datei); der Deskriptor wird sofort wieder geschlossen."""
+    with open(pfad, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class MboxQuelle:
+    """mbox-Datei, per mmap Nachricht für Nachricht gelesen; Position ist der Byte-Offset der nächsten Nachricht."""
+
+    def __init__(self, pfad: str):
+        self.pfad = os.path.abspath(pfad)
+        self.beschreibung = f"mbox:{self.pfad}"
+
+    def nachrichten(self, start: int = 0) -> Iterator[ArchivNachricht]:
+        puffer = _mappe(self.pfad)
+        if puffer is None:
+            return
+        pos = start
+        if pos == 0 and puffer[:5] != b"From ":
+            treffer = puffer.find(_MBOX_TRENNER)
+            if treffer == -1:
+                return
+            pos = treffer + 1
+        freigegeben = 0
+        while pos < len(puffer):
+            naechste = puffer.find(_MBOX_TRENNER, pos)
+            naechste = len(puffer) if naechste == -1 else naechste + 1
+            # Die "From "-Trennzeile gehört nicht zur Nachricht
+            inhalt = puffer.find(b"\n", pos, naechste) + 1 or naechste
+            yield ArchivNachricht(puffer, inhalt, naechste, naechste, mbox=True)
+            pos = naechste
+            if pos - freigegeben >= _FREIGABE_SCHRITT and hasattr(mmap, "MADV_DONTNEED"):
+                # Gelesene Seiten verwerfen (nur lesend gemappt: bei erneutem Zugriff wieder von der Platte)
+                freigegeben = pos - pos % mmap.PAGESIZE - _FREIGABE_SCHRITT // 2
+                puffer.madvise(mmap.MADV_DONTNEED, 0, max(0, freigegeben))
+
+
+class EmlVerzeichnis:
+    """Verzeichnis mit .eml-Dateien (rekursiv, sortiert); Position ist die Anzahl bereits gelesener Dateien."""
+
+    def __init__(self, pfad: str):
+        self.pfad = os.path.abspath(pfad)
+        self.beschreibung = f"eml:{self.pfad}"
+
+    def _dateien(self) -> Iterator[str]:
+        for verzeichnis, unterordner, dateien in os.walk(self.pfad):
+            unterordner.sort()
+            for datei in sorted(dateien):
+                if datei.lower().endswith(".eml"):
+                    yield os.path.join(verzeichnis, datei)
+
+    def nachrichten(self, start: int = 0) -> Iterator[ArchivNachricht]:
+        for nummer, pfad in enumerate(self._dateien(), start=1):
+            if nummer <= start:
+                continue
+            puffer = _mappe(pfad)
+            if puffer is not None:
+                yield ArchivNachricht(puffer, 0, len(puffer), nummer)
+
+
+def oeffne_quelle(pfad: str) -> MboxQuelle | EmlVerzeichnis:
+    return EmlVerzeichnis(pfad) if os.path.isdir(pfad) else MboxQuelle(pfad)
+
+
+def als_gmail_nachricht(gmail_id: str, nachricht: EmailMessage) -> dict:
+    """
+    Bildet eine geparste Nachricht auf das Format der Gmail-API ab (Header-Liste, Base64url-Textteile),
+    damit get_email_body und lese_email sie wie eine abgerufene E-Mail verarbeiten. Anhänge bleiben leer.
+    """
+    def teil(t) -> dict:
+        payload = {"mimeType": t.get_content_type(), "headers": [{"name": k, "value": str(v)} for k, v in t.items()],
+                   "body": {}}
+        if t.is_multipart():
+            payload["parts"] = [teil(unterteil) for unterteil in t.iter_parts()]
+        elif t.get_content_maintype() == "text" and not t.is_attachment():
+            try:
+                text = t.get_content()
+            except (LookupError, UnicodeError):
+                text = (t.get_payload(decode=True) or b"").decode("utf-8", errors="ignore")
+            daten = text.encode("utf-8")[:BODY_MAX_BYTES]
+            payload["body"] = {"size": len(daten), "data": base64.urlsafe_b64encode(daten).decode()}
+        return payload
+    return {"id": gmail_id, "payload": teil(nachricht)}
+
+
+def finde_gmail_ids(service, message_ids: list[str]) -> tuple[dict[str, str], set[str]]:
+    """
+    Ordnet Message-IDs per messages.list(q="rfc822msgid:…") Gmail-IDs zu, gebündelt als Batch-Request.
+    :return: (Message-ID -> Gmail-ID, Message-IDs mit endgültig fehlgeschlagener Anfrage)
+    """
+    messages = service.users().messages()
+    # Message-IDs enthalten <, >, @ usw.: als Request-ID dient die Position
+    ergebnisse, fehler = batch_execute(
+        service,
+        [str(i) for i in range(len(message_ids))],
+        lambda i: messages.list(userId='me', q=f"rfc822msgid:{message_ids[int(i)]}", maxResults=1),
+        quota_pro_anfrage=QUOTA_MESSAGES_LIST
+    )
+    zuordnung = {message_ids[int(i)]: antwort["messages"][0]["id"]
+                 for i, antwort in ergebnisse.items() if antwort.get("messages")}
+    return zuordnung, {message_ids[int(i)] for i in fehler}
+
+
+class Plan:
+    """
+    Plan-Datei (JSON-Zeilen, nur angehängt): Kopfzeile mit der Quelle, Einträge {"id", "label"} und nach jedem
+    Block eine Checkpoint-Zeile mit der Position in der Quelle, geschrieben mit fsync. Beim Fortsetzen wird alles
+    nach dem letzten Checkpoint (ein bei einem Absturz halb geschriebener Block) abgeschnitten und ab dessen
+    Position weitergelesen – jede Nachricht landet genau einmal im Plan.
+    """
+
+    def __init__(self, pfad: str, quelle: str):
+        self.pfad = pfad
+        self.position = 0
+        self.zaehler: Counter = Counter()
+        self.fertig = False
+        if os.path.exists(pfad):
+            self._fortsetzen(quelle)
+        else:
+            tmp_pfad = f"{pfad}.tmp"
+            with open(tmp_pfad, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"quelle": quelle, "version": 1}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_pfad, pfad)
+        self._datei = open(pfad, "ab")
+
+    def _fortsetzen(self, quelle: str) -> None:
+        with open(self.pfad, "rb") as f:
+            kopf = json.loads(f.readline())
+            if kopf.get("quelle") != quelle:
+                raise ValueError(f"❌ Plan '{self.pfad}' gehört zu {kopf.get('quelle')}, nicht zu {quelle}.")
+            gueltig_bis = f.tell()
+            while True:
+                zeile = f.readline()
+                if not zeile.endswith(b"\n"):
+                    break
+                try:
+                    eintrag = json.loads(zeile)
+                except json.JSONDecodeError:
+                    break
+                if "checkpoint" in eintrag:
+                    self.position = eintrag["checkpoint"]
+                    self.zaehler = Counter(eintrag.get("zaehler", {}))
+                    self.fertig = eintrag.get("fertig", False)
+                    gueltig_bis = f.tell()
+        if os.path.getsize(self.pfad) > gueltig_bis:
+            logging.warning(f"Plan '{self.pfad}': unvollständigen Block nach dem letzten Checkpoint verworfen.")
+            os.truncate(self.pfad, gueltig_bis)
+        logging.info(f"Plan '{self.pfad}' wird ab Position {self.position} fortgesetzt ({dict(self.zaehler)}).")
+
+    def schreibe_block(self, eintraege: list[dict], position: int, fertig: bool = False) -> None:
+        """Hängt die Einträge eines Blocks samt Checkpoint in einem Schreibvorgang an und wartet auf die Platte."""
+        self.position = position
+        self.fertig = fertig
+        checkpoint = {"checkpoint": position, "zaehler": dict(self.zaehler)}
+        if fertig:
+            checkpoint["fertig"] = True
+        zeilen = [json.dumps(e, ensure_ascii=False) for e in eintraege] + [json.dumps(checkpoint, ensure_ascii=False)]
+        self._datei.write(("\n".join(zeilen) + "\n").encode("utf-8"))
+        self._datei.flush()
+        os.fsync(self._datei.fileno())
+
+    def close(self) -> None:
+        self._datei.close()
+
+
+def _plane_block(sitzung: Sitzung, block: list[ArchivNachricht], gmail_labels: list[str], zaehler: Counter) -> list[dict]:
+    """Ordnet die Nachrichten eines Blocks Gmail-IDs zu und klassifiziert sie wie im normalen Lauf."""
+    zaehler["gelesen"] += len(block)
+    mit_id = [n for n in block if n.message_id]
+    zaehler["ohne_message_id"] += len(block) - len(mit_id)
+    gmail_ids, fehlgeschlagen = finde_gmail_ids(sitzung.service, list(dict.fromkeys(n.message_id for n in mit_id)))
+
+    eintraege = []
+    mails = []
+    for nachricht in mit_id:
+        gmail_id = gmail_ids.get(nachricht.message_id)
+        if gmail_id is None:
+            status = "fehler" if nachricht.message_id in fehlgeschlagen else "nicht_gefunden"
+            zaehler[status] += 1
+            eintraege.append({"message_id": nachricht.message_id, "status": status})
+            continue
+        mail = lese_email(als_gmail_nachricht(gmail_id, nachricht.parse()))
+        mails.append((nachricht.message_id, mail, sitzung.regel_engine.klassifiziere(mail["subject"], mail["sender"], mail["body"])))
+
+    # Keyword-Regeln zuerst, übrige gesammelt über denselben Weg wie neue E-Mails (Cache, lokales Modell, Gemini)
+    fuer_gemini = [mail for _, mail, result in mails if result is None]
+    ergebnisse = classify_emails_batch(fuer_gemini, sitzung.rules_store.regeln, gmail_labels,
+                                       sitzung.trainingsdaten) if fuer_gemini else {}
+    fehlgeschlagen = [mail["id"] for _, mail, result in mails if result is None and ergebnisse.get(mail["id"], {}).get("fehler")]
+    if fehlgeschlagen:
+        # Block ohne Checkpoint verwerfen: ein erneuter Aufruf setzt am letzten Checkpoint fort
+        raise RuntimeError(f"Klassifizierung für {len(fehlgeschlagen)} E-Mails fehlgeschlagen (Gemini nicht erreichbar).")
+    for message_id, mail, result in mails:
+        kategorie = (result or ergebnisse.get(mail["id"]) or {}).get("kategorie")
+        if not kategorie:
+            zaehler["ohne_kategorie"] += 1
+            eintraege.append({"message_id": message_id, "status": "ohne_kategorie"})
+            continue
+        kategorie, labelname, neu = sitzung.rules_store.stelle_sicher(kategorie)
+        if neu:
+            logge_neue_kategorie(kategorie, labelname, sitzung.log_datei)
+        zaehler["geplant"] += 1
+        eintraege.append({"id": mail["id"], "label": labelname, "message_id": message_id})
+    return eintraege
+
+
+def plane(sitzung: Sitzung, quelle: MboxQuelle | EmlVerzeichnis, plan_pfad: str = BACKFILL_PLAN,
+          block_groesse: int = BACKFILL_BLOCK) -> Counter:
+    """
+    Liest das Archiv blockweise und schreibt den Plan (Gmail-ID -> Label). Setzt einen abgebrochenen Lauf
+    am letzten Checkpoint fort. Speicherbedarf: ein Block, unabhängig von der Archivgröße.
+    :return: Zähler (gelesen, geplant, nicht_gefunden, ohne_kategorie, …)
+    """
+    plan = Plan(plan_pfad, quelle.beschreibung)
+    try:
+        if plan.fertig:
+            logging.info(f"Plan '{plan_pfad}' ist bereits vollständig.")
+            return plan.zaehler
+        sitzung.lerne()
+        gmail_labels = hole_gmail_labels(sitzung.service)
+        block: list[ArchivNachricht] = []
+        for nachricht in quelle.nachrichten(plan.position):
+            block.append(nachricht)
+            if len(block) >= block_groesse:
+                eintraege = _plane_block(sitzung, block, gmail_labels, plan.zaehler)
+                # Neue Kategorien vor dem Checkpoint sichern, damit ein Neustart sie kennt
+                sitzung.rules_store.flush()
+                plan.schreibe_block(eintraege, block[-1].position)
+                logging.info(f"📦 Backfill: {plan.zaehler['gelesen']} gelesen, {plan.zaehler['geplant']} geplant.")
+                block = []
+        eintraege = _plane_block(sitzung, block, gmail_labels, plan.zaehler) if block else []
+        sitzung.rules_store.flush()
+        plan.schreibe_block(eintraege, block[-1].position if block else plan.position, fertig=True)
+        logging.info(f"✅ Plan vollständig: {dict(plan.zaehler)}")
+        return plan.zaehler
+    finally:
+        plan.close()
+
+
+def _lese_fortschritt(pfad: str) -> int:
+    try:
+        with open(pfad, "r", encoding="utf-8") as f:
+            return json.load(f).get("zeile", 0)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return 0
+
+
+def _speichere_fortschritt(pfad: str, zeile: int) -> None:
+    tmp_pfad = f"{pfad}.tmp"
+    with open(tmp_pfad, "w", encoding="utf-8") as f:
+        json.dump({"zeile": zeile}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_pfad, pfad)
+
+
+def wende_an(service, plan_pfad: str = BACKFILL_PLAN, archivieren: bool = False) -> Counter:
+    """
+    Überträgt den Plan per messages.batchModify, gruppiert nach Label (bis zu 1000 IDs pro Aufruf).
+    Standardmäßig wird nur das Label gesetzt; mit archivieren=True verlassen die E-Mails auch den Posteingang.
+    Nur Einträge vor einem Checkpoint gelten. Der Fortschritt (alle Zeilen bis dahin übertragen) wird nach
+    jedem Aufruf atomar gespeichert; ein erneuter Aufruf setzt dort fort. Doppelt gesetzte Labels schaden nicht.
+    :return: Zähler (angewendet, aufrufe)
+    """
+    fortschritt_pfad = f"{plan_pfad}.angewendet"
+    erledigt_bis = _lese_fortschritt(fortschritt_pfad)
+    registry = get_label_registry(service)
+    gruppen: dict[str, list[str]] = {}
+    erste_zeile: dict[str, int] = {}
+    unbestaetigt: list[tuple[int, str, str]] = []
+    zaehler: Counter = Counter()
+    gelesen_bis = erledigt_bis
+
+    def fortschritt() -> int:
+        # Alles vor der ältesten noch nicht übertragenen Zeile ist erledigt
+        offen = list(erste_zeile.values()) + [zeile for zeile, _, _ in unbestaetigt[:1]]
+        return min(offen, default=gelesen_bis + 1) - 1
+
+    def sende(label: str) -> None:
+        ids = gruppen.pop(label)
+        erste_zeile.pop(label)
+        fehler = move_emails_to_labels(service, {registry.get_or_create(label): ids}, archivieren=archivieren)
+        if fehler:
+            # Fortschritt bleibt vor dieser Gruppe stehen; der nächste Aufruf überträgt sie erneut
+            raise next(iter(fehler.values()))
+        zaehler["angewendet"] += len(ids)
+        zaehler["aufrufe"] += 1
+        _speichere_fortschritt(fortschritt_pfad, fortschritt())
+
+    with open(plan_pfad, "rb") as f:
+        for nummer, zeile in enumerate(f, start=1):
+            if nummer == 1 or nummer <= erledigt_bis:
+                continue
+            if not zeile.endswith(b"\n"):
+                break
+            try:
+                eintrag = json.loads(zeile)
+            except json.JSONDecodeError:
+                break
+            gelesen_bis = nummer
+            if "checkpoint" not in eintrag:
+                if eintrag.get("id") and eintrag.get("label"):
+                    unbestaetigt.append((nummer, eintrag["label"], eintrag["id"]))
+                continue
+            # Der Checkpoint bestätigt die Einträge seines Blocks
+            bestaetigt, unbestaetigt = unbestaetigt, []
+            for eintrag_zeile, label, gmail_id in bestaetigt:
+                erste_zeile.setdefault(label, eintrag_zeile)
+                gruppen.setdefault(label, []).append(gmail_id)
+                if len(gruppen[label]) >= BATCH_MODIFY_GROESSE:
+                    sende(label)
+    # Einträge ohne Checkpoint (Planung läuft noch oder ist abgebrochen) bleiben für den nächsten Aufruf
+    for label in list(gruppen):
+        sende(label)
+    if fortschritt() > erledigt_bis:
+        _speichere_fortschritt(fortschritt_pfad, fortschritt())
+    logging.info(f"✅ Plan angewendet: {zaehler['angewendet']} E-Mails in {zaehler['aufrufe']} batchModify-Aufrufen.")
+    return zaehler
+
+
+def main(argv=None):
+    """Backfill: Archiv (mbox oder .eml-Verzeichnis) in einen Plan übersetzen bzw. den Plan anwenden."""
+    parser = argparse.ArgumentParser(description="Bestehende E-Mails aus einem lokalen Export nachträglich labeln.")
+    befehle = parser.add_subparsers(dest="befehl", required=True)
+    planen = befehle.add_parser("plane", help="Archiv lesen, klassifizieren und den Plan schreiben (fortsetzbar)")
+    planen.add_argument("quelle", help="mbox-Datei oder Verzeichnis mit .eml-Dateien")
+    planen.add_argument("--plan", default=BACKFILL_PLAN)
+    planen.add_argument("--block", type=int, default=BACKFILL_BLOCK, help="Nachrichten pro Checkpoint")
+    anwenden = befehle.add_parser("anwenden", help="Plan per batchModify nach Gmail übertragen (fortsetzbar)")
+    anwenden.add_argument("--plan", default=BACKFILL_PLAN)
+    anwenden.add_argument("--archivieren", action="store_true", help="E-Mails zusätzlich aus dem Posteingang entfernen")
+    args = parser.parse_args(argv if argv is not None else [])
+
+    creds = lade_credentials()
+    if args.befehl == "anwenden":
+        return wende_an(get_gmail_service(creds), args.plan, args.archivieren)
+    sitzung = Sitzung(creds)
+    try:
+        return plane(sitzung, oeffne_quelle(args.quelle), args.plan, args.block)
+    finally:
+        sitzung.beenden()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
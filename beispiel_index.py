@@ -0,0 +1,106 @@
+import math
+import os
+import re
+import zlib
+from collections import Counter, defaultdict
+
+FEW_SHOT_K = int(os.getenv("FEW_SHOT_K", 10))
+FEW_SHOT_PRO_LABEL = int(os.getenv("FEW_SHOT_PRO_LABEL", 2))
+FEW_SHOT_TOKEN_BUDGET = int(os.getenv("FEW_SHOT_TOKEN_BUDGET", 4000))
+
+# Zeichen pro Token (grobe Schätzung für Gemini)
+ZEICHEN_PRO_TOKEN = 4
+_NGRAM = 3
+_DIMENSIONEN = 1 << 20
+_BODY_PREFIX = 300
+_DOMAIN_GEWICHT = 5
+
+
+def schaetze_tokens(text: str) -> int:
+    """Grobe Token-Schätzung anhand der Zeichenanzahl."""
+    return len(text) // ZEICHEN_PRO_TOKEN + 1
+
+
+def absender_domain(sender: str) -> str:
+    """Extrahiert die Domain aus einem From-Header ("Name <a@b.de>" -> "b.de")."""
+    match = re.search(r'@([\w.-]+)', sender or '')
+    return match.group(1).lower() if match else ''
+
+
+def _hash(token: str) -> int:
+    return zlib.crc32(token.encode('utf-8')) % _DIMENSIONEN
+
+
+def _features(subject: str, sender: str, body: str) -> Counter:
+    """Gehashte Zeichen-n-Gramme aus Betreff und Body-Anfang plus Absender-Domain als eigenes Merkmal."""
+    features: Counter = Counter()
+    for feld, text in (("s", subject), ("b", (body or '')[:_BODY_PREFIX])):
+        text = " " + re.sub(r'\s+', ' ', (text or '').lower()) + " "
+        for i in range(len(text) - _NGRAM + 1):
+            features[_hash(feld + text[i:i + _NGRAM])] += 1
+    domain = absender_domain(sender)
+    if domain:
+        features[_hash("@" + domain)] += _DOMAIN_GEWICHT
+    return features
+
+
+class BeispielIndex:
+    """
+    TF-IDF-Ähnlichkeitsindex über die Trainingsbeispiele (invertierter Index über gehashte n-Gramme).
+    Wird einmal pro Lauf aufgebaut; je E-Mail werden nur die ähnlichsten Beispiele in den Prompt übernommen.
+    """
+
+    def __init__(self, beispiele: list[dict]):
+        self.beispiele = beispiele
+        dokument_haeufigkeit: Counter = Counter()
+        roh = []
+        for item in beispiele:
+            features = _features(item.get('subject', ''), item.get('sender', ''), item.get('body', ''))
+            roh.append(features)
+            dokument_haeufigkeit.update(features.keys())
+        n = len(beispiele)
+        self._idf = {f: math.log((1 + n) / (1 + df)) + 1 for f, df in dokument_haeufigkeit.items()}
+        self._postings: dict[int, list[tuple[int, float]]] = defaultdict(list)
+        for idx, features in enumerate(roh):
+            vektor = self._gewichte(features)
+            for f, w in vektor.items():
+                self._postings[f].append((idx, w))
+
+    def _gewichte(self, features: Counter) -> dict[int, float]:
+        vektor = {f: (1 + math.log(tf)) * self._idf.get(f, 0.0) for f, tf in features.items()}
+        norm = math.sqrt(sum(w * w for w in vektor.values())) or 1.0
+        return {f: w / norm for f, w in vektor.items() if w}
+
+    def suche(self, subject: str, sender: str, body: str) -> list[tuple[float, int]]:
+        """Gibt (Kosinus-Ähnlichkeit, Index) aller Beispiele mit Überlappung absteigend sortiert zurück."""
+        scores: dict[int, float] = defaultdict(float)
+        for f, w in self._gewichte(_features(subject, sender, body)).items():
+            for idx, w_doc in self._postings.get(f, ()):
+                scores[idx] += w * w_doc
+        return sorted(((score, idx) for idx, score in scores.items()), reverse=True)
+
+    def waehle_beispiele(self, subject: str, sender: str, body: str, k: int = FEW_SHOT_K,
+                         pro_label: int = FEW_SHOT_PRO_LABEL, token_budget: int = FEW_SHOT_TOKEN_BUDGET) -> list[dict]:
+        """
+        Wählt die k ähnlichsten Beispiele plus die besten pro_label Beispiele je Label,
+        begrenzt auf token_budget (geschätzte Tokens).
+        """
+        treffer = self.suche(subject, sender, body)
+        gewaehlt = [idx for _, idx in treffer[:k]]
+        pro_label_anzahl: Counter = Counter()
+        for _, idx in treffer:
+            label = self.beispiele[idx]['label']
+            if pro_label_anzahl[label] < pro_label:
+                pro_label_anzahl[label] += 1
+                if idx not in gewaehlt:
+                    gewaehlt.append(idx)
+        ergebnis = []
+        verbraucht = 0
+        for idx in gewaehlt:
+            item = self.beispiele[idx]
+            kosten = schaetze_tokens(f"{item['label']} {item['subject']} {item['sender']} {item['body'][:200]}")
+            if verbraucht + kosten > token_budget:
+                break
+            verbraucht += kosten
+            ergebnis.append(item)
+        return ergebnis
@@ -0,0 +1,93 @@
+"""
+Micro-Benchmark der Text-Normalisierung auf einem synthetischen Fixture-Korpus.
+
+Aufruf (aus dem Projektverzeichnis):
+    python -m bench.bench_normalisierung [--anzahl 2000] [--ausgabe ergebnis.json]
+"""
+import argparse
+import json
+import random
+import time
+
+from text_normalisierung import normalisiere_text, zaehle_tokens, PROMPT_BODY_TOKENS
+
+
+def _newsletter_html(rnd: random.Random) -> str:
+    artikel = "".join(
+        f'<tr><td style="padding:12px;font-family:Arial,sans-serif;color:#333">'
+        f'<a href="https://click.news.example.com/ls/click?upn={rnd.getrandbits(256):x}">'
+        f'<img src="https://cdn.example.com/img/{rnd.getrandbits(64):x}.png" width="600"></a>'
+        f'<h2>Angebot {i}: {rnd.choice(["Sommer-Sale", "Neuheiten", "Nur heute"])}</h2>'
+        f'<p>Bis zu {rnd.randint(10, 70)}% Rabatt auf ausgewählte Artikel.</p></td></tr>'
+        for i in range(rnd.randint(3, 8))
+    )
+    return (
+        '<html><head><style>body{margin:0;padding:0} .btn{background:#f60;border-radius:4px}'
+        ' @media (max-width:600px){.col{width:100%!important}}</style></head><body>'
+        f'<table width="100%" cellpadding="0" cellspacing="0">{artikel}</table>'
+        '<p>Impressum: Beispiel Shop GmbH, Registergericht Berlin HRB 12345, Geschäftsführer M. Muster</p>'
+        f'<p><a href="https://news.example.com/unsubscribe?u={rnd.getrandbits(128):x}">Newsletter abbestellen</a></p>'
+        '</body></html>'
+    )
+
+
+def _antwort_text(rnd: random.Random) -> str:
+    zitat = "\n".join(f"> Zeile {i} der vorherigen Nachricht mit etwas Inhalt." for i in range(rnd.randint(10, 40)))
+    return (
+        f"Hallo Team,\n\nder Termin am {rnd.randint(1, 28)}.{rnd.randint(1, 12)}. passt mir gut.\n"
+        "Bitte schickt mir vorab die Agenda.\n\nViele Grüße\n-- \nMax Mustermann\nBeispiel AG\n"
+        f"Am 01.07.2025 schrieb Erika <erika@example.com>:\n{zitat}\n"
+    )
+
+
+def _rechnung_text(rnd: random.Random) -> str:
+    return (
+        f"Sehr geehrte Kundin, sehr geehrter Kunde,\n\nIhre Rechnung Nr. {rnd.randint(10000, 99999)} "
+        f"über {rnd.randint(10, 500)},{rnd.randint(10, 99)} EUR ist ab sofort verfügbar:\n"
+        f"https://kundencenter.example.de/rechnungen/download?token={rnd.getrandbits(512):x}\n\n"
+        "Diese E-Mail wurde automatisch erstellt, bitte antworten Sie nicht darauf.\n"
+        "Copyright © 2025 Beispiel Telekom GmbH. Alle Rechte vorbehalten.\n"
+    )
+
+
+def erzeuge_korpus(anzahl: int, seed: int = 42) -> list[str]:
+    """Mischung aus HTML-Newslettern, Antworten mit Zitatverlauf und Rechnungsmails."""
+    rnd = random.Random(seed)
+    erzeuger = [_newsletter_html, _newsletter_html, _antwort_text, _rechnung_text]
+    return [rnd.choice(erzeuger)(rnd) for _ in range(anzahl)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--anzahl", type=int, default=2000)
+    parser.add_argument("--ausgabe", help="Ergebnis zusätzlich als JSON-Datei schreiben")
+    args = parser.parse_args(argv)
+
+    korpus = erzeuge_korpus(args.anzahl)
+    zeichen = sum(len(body) for body in korpus)
+    start = time.perf_counter()
+    normalisiert = [normalisiere_text(body) for body in korpus]
+    dauer = time.perf_counter() - start
+
+    # Vergleich mit dem bisherigen Vorgehen: Rohtext nach 2000 Zeichen abschneiden
+    tokens_vorher = sum(zaehle_tokens(body[:2000]) for body in korpus) / len(korpus)
+    tokens_nachher = sum(zaehle_tokens(text) for text in normalisiert) / len(korpus)
+    ergebnis = {
+        "benchmark": "normalisierung",
+        "emails": len(korpus),
+        "zeichen_pro_sekunde": round(zeichen / dauer),
+        "emails_pro_sekunde": round(len(korpus) / dauer, 1),
+        "tokens_vorher_avg": round(tokens_vorher, 1),
+        "tokens_nachher_avg": round(tokens_nachher, 1),
+        "tokens_gespart_avg": round(tokens_vorher - tokens_nachher, 1),
+        "token_budget": PROMPT_BODY_TOKENS,
+    }
+    print(json.dumps(ergebnis, indent=2, ensure_ascii=False))
+    if args.ausgabe:
+        with open(args.ausgabe, "w", encoding="utf-8") as f:
+            json.dump(ergebnis, f, indent=2, ensure_ascii=False)
+    return ergebnis
+
+
+if __name__ == "__main__":
+    main()
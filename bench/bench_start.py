@@ -0,0 +1,96 @@
+"""
+Startzeit-Benchmark: Importzeit von main.py, geladene schwere Module und ein kompletter Lauf ohne neue
+E-Mails (typischer Cron-Aufruf) gegen das Fake-Postfach. Jede Messung läuft in einem frischen Interpreter.
+
+Aufruf (aus dem Projektverzeichnis):
+    python -m bench.bench_start [--wiederholungen 5] [--ausgabe start_ergebnis.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJEKT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHWERE_MODULE = ["google.generativeai", "grpc", "google.protobuf", "googleapiclient.discovery", "google_auth_oauthlib"]
+
+
+def _messung_import() -> dict:
+    start = time.perf_counter()
+    import main  # noqa: F401
+    dauer = time.perf_counter() - start
+    return {"import_s": dauer, "geladen": [m for m in SCHWERE_MODULE if m in sys.modules]}
+
+
+def _messung_leerlauf() -> dict:
+    """main.main() zweimal ohne neue E-Mails: Erstlauf (Voll-Scan) und Folgelauf (historyId)."""
+    start = time.perf_counter()
+    import main
+    from bench.fake_gmail import FakeGmailService, FakePostfach
+    import_s = time.perf_counter() - start
+
+    service = FakeGmailService(FakePostfach(ungelesen=0))
+    main.lade_credentials = lambda: None
+    main.get_gmail_service = lambda creds=None: service
+    laeufe = []
+    with tempfile.TemporaryDirectory(prefix="bench-start-") as verzeichnis:
+        os.chdir(verzeichnis)
+        for _ in range(2):
+            service.setze_zaehler_zurueck()
+            start = time.perf_counter()
+            main.main([])
+            laeufe.append({"dauer_s": time.perf_counter() - start, "gmail_aufrufe": dict(service.aufrufe)})
+        os.chdir(PROJEKT)
+    return {"import_s": import_s, "erstlauf": laeufe[0], "folgelauf": laeufe[1],
+            "gemini_geladen": "google.generativeai" in sys.modules}
+
+
+def _kindprozess(art: str) -> dict:
+    start = time.perf_counter()
+    ausgabe = subprocess.run([sys.executable, "-m", "bench.bench_start", "--messung", art], cwd=PROJEKT,
+                             check=True, capture_output=True, text=True).stdout
+    ergebnis = json.loads(ausgabe.strip().splitlines()[-1])
+    ergebnis["prozess_s"] = time.perf_counter() - start
+    return ergebnis
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wiederholungen", type=int, default=5)
+    parser.add_argument("--ausgabe", help="Ergebnis zusätzlich als JSON-Datei schreiben")
+    parser.add_argument("--messung", choices=["import", "leerlauf"], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.messung:
+        import logging
+        logging.disable(logging.CRITICAL)
+        messung = _messung_import() if args.messung == "import" else _messung_leerlauf()
+        print(json.dumps(messung))
+        return messung
+
+    importe = [_kindprozess("import") for _ in range(args.wiederholungen)]
+    leerlaeufe = [_kindprozess("leerlauf") for _ in range(args.wiederholungen)]
+    ergebnis = {
+        "benchmark": "start",
+        "wiederholungen": args.wiederholungen,
+        "import_main_s_median": round(statistics.median(m["import_s"] for m in importe), 4),
+        "prozess_import_s_median": round(statistics.median(m["prozess_s"] for m in importe), 4),
+        "schwere_module_nach_import": importe[0]["geladen"],
+        "leerlauf_erstlauf_s_median": round(statistics.median(m["erstlauf"]["dauer_s"] for m in leerlaeufe), 4),
+        "leerlauf_folgelauf_s_median": round(statistics.median(m["folgelauf"]["dauer_s"] for m in leerlaeufe), 4),
+        "leerlauf_prozess_s_median": round(statistics.median(m["prozess_s"] for m in leerlaeufe), 4),
+        "leerlauf_gmail_aufrufe": leerlaeufe[0]["folgelauf"]["gmail_aufrufe"],
+        "leerlauf_gemini_geladen": leerlaeufe[0]["gemini_geladen"],
+    }
+    print(json.dumps(ergebnis, indent=2, ensure_ascii=False))
+    if args.ausgabe:
+        with open(args.ausgabe, "w", encoding="utf-8") as f:
+            json.dump(ergebnis, f, indent=2, ensure_ascii=False)
+    return ergebnis
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+End-to-End-Benchmarks ohne Netzwerk: der echte Ablauf aus main.py gegen ein Fake-Gmail-Postfach
+(bench.fake_gmail) und ein Fake-Gemini-Modell (bench.fake_gemini).
+
+Szenarien:
+    kaltstart    Erster Lauf: leere Trainings-/Cache-Datenbanken, Voll-Scan, MAX_EMAILS ungelesene E-Mails
+    training     Abgleich der Trainingsdaten aus allen Labels (kalt und erneut mit gefülltem Speicher)
+    backlog_1k   1.000 ungelesene E-Mails auf einmal (warmer Trainingsspeicher)
+    backlog_10k  10.000 ungelesene E-Mails auf einmal
+    polling      Wiederholte Läufe per historyId mit wenigen neuen E-Mails je Lauf
+
+Das lokale Modell (lokaler_classifier) ist standardmäßig aus, damit Gemini-Anfragen und Tokens mit früheren
+Läufen vergleichbar bleiben; --lokal misst den Pfad mit lokalem Modell vor Gemini.
+
+Jedes Szenario läuft in einem eigenen Prozess (für eine aussagekräftige Peak-RSS) und einem leeren
+Arbeitsverzeichnis. Das Ergebnis wird als JSON geschrieben und kann mit früheren Läufen verglichen werden.
+
+Aufruf (aus dem Projektverzeichnis):
+    python -m bench.bench_szenarien [--szenario backlog_1k ...] [--pipeline] [--lokal] [--gemini-latenz 0.5]
+                                    [--gmail-latenz 0.05] [--ausgabe bench_ergebnis.json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROJEKT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+import ai_classify
+import gmail_utils
+import main as ablauf
+from bench.fake_gemini import FakeGeminiModel, erzeuge_classifier
+from bench.fake_gmail import FakeGmailService, FakePostfach
+from metriken import metriken
+from rate_limit import RateLimiter
+from regel_engine import RegelEngine
+from rules_utils import RulesStore, speichere_regeln
+from sync_state import SyncState, hole_neue_nachrichten
+from training_store import TrainingsStore
+from unsubscribe import AbmeldeExecutor
+
+SZENARIEN = ["kaltstart", "training", "backlog_1k", "backlog_10k", "polling"]
+
+# Bewusst nur ein Teil der Kategorien mit Keywords: der Rest geht an (Fake-)Gemini
+BENCH_REGELN = {
+    "rechnung": {"keywords": ["rechnung"], "label": "Rechnungen"},
+    "newsletter": {"keywords": ["newsletter abbestellen"], "label": "Newsletter"},
+    "termine": {"keywords": [], "label": "Termine"},
+    "bank": {"keywords": [], "label": "Bank"},
+}
+
+
+class _FakeSession:
+    """Abmelde-HTTP-Anfragen gehen nicht ins Netz."""
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def post(self, url, **kwargs):
+        return SimpleNamespace(status_code=200)
+
+    get = post
+
+    def close(self):
+        pass
+
+
+def peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KiB, macOS: Bytes
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class Umgebung:
+    """Postfach, Services, Classifier und lokale Zustände eines Szenarios."""
+
+    def __init__(self, args, ungelesen: int):
+        self.args = args
+        self.postfach = FakePostfach(ungelesen=ungelesen, gelabelt_pro_label=args.gelabelt, seed=args.seed,
+                                     mime_mix=args.mime_mix)
+        self.service = FakeGmailService(self.postfach, latenz=args.gmail_latenz)
+        self.model = FakeGeminiModel(latenz=args.gemini_latenz, fehlerquote=args.gemini_fehlerquote, seed=args.seed)
+        ai_classify._classifier_instance = erzeuge_classifier(self.model, "klassifikations_cache.db", lokal=args.lokal)
+        speichere_regeln(BENCH_REGELN, "regeln.json")
+        self.rules_store = RulesStore("regeln.json")
+        self.regel_engine = RegelEngine(self.rules_store.regeln)
+        self.trainings_store = TrainingsStore("trainingsdaten.db")
+        self.sync_state = SyncState("sync_state.json")
+        self.trainingsdaten: list[dict] = []
+
+    def trainieren(self) -> None:
+        self.trainingsdaten = ablauf.sammle_label_trainingsdaten(self.service, max_emails_per_label=self.args.gelabelt,
+                                                                 store=self.trainings_store)
+
+    def lauf(self, max_emails: int | None) -> int:
+        """Ein Durchlauf wie main.main(): neue E-Mails abrufen, klassifizieren, verschieben. Gibt die Anzahl zurück."""
+        messages, history_id = hole_neue_nachrichten(self.service, self.sync_state, max_emails=max_emails)
+        gmail_labels = ablauf.hole_gmail_labels(self.service)
+        abmelde_executor = AbmeldeExecutor("unsubscribe_log.txt", session=_FakeSession())
+        try:
+            if self.args.pipeline:
+                vollstaendig = ablauf.klassifiziere_pipeline(self.service, self.service.kopie, messages, self.rules_store,
+                                                             gmail_labels, self.trainingsdaten, self.regel_engine,
+                                                             abmelde_executor)
+            else:
+                vollstaendig = ablauf.klassifiziere_serien(self.service, messages, self.rules_store, gmail_labels,
+                                                           self.trainingsdaten, self.regel_engine, abmelde_executor)
+            self.sync_state.speichere(history_id if vollstaendig else None)
+        finally:
+            abmelde_executor.beenden()
+            self.rules_store.flush()
+        return len(messages)
+
+    def messung(self, funktion) -> dict:
+        """Führt funktion aus und liefert Dauer, Gmail- und Gemini-Zähler nur für diesen Abschnitt."""
+        self.service.setze_zaehler_zurueck()
+        metriken.zuruecksetzen()
+        anfragen, prompt_tokens, antwort_tokens = self.model.anfragen, self.model.prompt_tokens, self.model.antwort_tokens
+        start = time.perf_counter()
+        emails = funktion()
+        dauer = time.perf_counter() - start
+        pro_email = max(emails, 1)
+        return {
+            "emails": emails,
+            "dauer_s": round(dauer, 3),
+            "emails_pro_sekunde": round(emails / dauer, 1) if dauer else None,
+            "gmail_http_anfragen": self.service.http_anfragen,
+            "gmail_api_aufrufe": sum(self.service.aufrufe.values()),
+            "gmail_api_aufrufe_pro_email": round(sum(self.service.aufrufe.values()) / pro_email, 2),
+            "gmail_quota_pro_email": round(self.service.quota_einheiten / pro_email, 1),
+            "gmail_aufrufe": dict(self.service.aufrufe),
+            "gemini_anfragen": self.model.anfragen - anfragen,
+            "gemini_anfragen_pro_email": round((self.model.anfragen - anfragen) / pro_email, 3),
+            "prompt_tokens_pro_email": round((self.model.prompt_tokens - prompt_tokens) / pro_email, 1),
+            "antwort_tokens_pro_email": round((self.model.antwort_tokens - antwort_tokens) / pro_email, 1),
+            # Zeiten pro Stufe aus der Instrumentierung (metriken.py)
+            "zeiten": metriken.zusammenfassung()["zeiten"],
+        }
+
+
+def szenario_kaltstart(args) -> dict:
+    umgebung = Umgebung(args, ungelesen=ablauf.MAX_EMAILS)
+
+    def kaltstart():
+        umgebung.trainieren()
+        return umgebung.lauf(ablauf.MAX_EMAILS)
+    return umgebung.messung(kaltstart)
+
+
+def szenario_training(args) -> dict:
+    umgebung = Umgebung(args, ungelesen=0)
+
+    def training():
+        umgebung.trainieren()
+        return len(umgebung.trainingsdaten)
+    kalt = umgebung.messung(training)
+    warm = umgebung.messung(training)
+    return dict(kalt, warm=warm)
+
+
+def _backlog(args, anzahl: int) -> dict:
+    umgebung = Umgebung(args, ungelesen=anzahl)
+    umgebung.trainieren()
+    ergebnis = umgebung.messung(lambda: umgebung.lauf(None))
+    ergebnis["rest_ungelesen"] = umgebung.postfach.ungelesen_in_inbox()
+    return ergebnis
+
+
+def szenario_backlog_1k(args) -> dict:
+    return _backlog(args, 1000)
+
+
+def szenario_backlog_10k(args) -> dict:
+    return _backlog(args, 10000)
+
+
+def szenario_polling(args) -> dict:
+    umgebung = Umgebung(args, ungelesen=ablauf.MAX_EMAILS)
+    umgebung.trainieren()
+    umgebung.lauf(ablauf.MAX_EMAILS)  # Erstlauf setzt die historyId
+
+    def polling():
+        gesamt = 0
+        for _ in range(args.polls):
+            umgebung.postfach.fuege_ungelesene_hinzu(args.neu_pro_poll)
+            gesamt += umgebung.lauf(ablauf.MAX_EMAILS)
+        return gesamt
+    ergebnis = umgebung.messung(polling)
+    ergebnis["polls"] = args.polls
+    ergebnis["gmail_http_anfragen_pro_poll"] = round(ergebnis["gmail_http_anfragen"] / args.polls, 1)
+    return ergebnis
+
+
+def fuehre_szenario_aus(name: str, args) -> dict:
+    """Führt ein Szenario im aktuellen Prozess in einem leeren Arbeitsverzeichnis aus."""
+    # Limits würden nur die Wartezeit messen, nicht den Code
+    gmail_utils.gmail_quota = RateLimiter(args.gmail_quota)
+    ai_classify.gemini_limit = RateLimiter(args.gemini_rpm / 60, kapazitaet=max(1.0, args.gemini_rpm / 6))
+    verzeichnis = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as arbeitsverzeichnis:
+        os.chdir(arbeitsverzeichnis)
+        try:
+            ergebnis = globals()[f"szenario_{name}"](args)
+        finally:
+            os.chdir(verzeichnis)
+    ergebnis["peak_rss_mb"] = peak_rss_mb()
+    return ergebnis
+
+
+def _mime_mix(wert: str) -> dict[str, int]:
+    """"text=3,html=3,alternative=3,mixed=1" -> Dict"""
+    return {teil.split("=")[0]: int(teil.split("=")[1]) for teil in wert.split(",") if teil}
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--szenario", action="append", choices=SZENARIEN, help="Mehrfach angebbar, Standard: alle")
+    parser.add_argument("--pipeline", action="store_true", help="Pipeline-Modus statt seriellem Ablauf messen")
+    parser.add_argument("--lokal", action="store_true", help="Lokales Modell vor Gemini befragen")
+    parser.add_argument("--gelabelt", type=int, default=50, help="E-Mails pro Label im Trainingsbestand")
+    parser.add_argument("--mime-mix", type=_mime_mix, default=None, help="z. B. text=3,html=3,alternative=3,mixed=1")
+    parser.add_argument("--gmail-latenz", type=float, default=0.0, help="Sekunden pro Gmail-HTTP-Anfrage")
+    parser.add_argument("--gmail-quota", type=float, default=0, help="Quota-Einheiten/s (0 = unbegrenzt)")
+    parser.add_argument("--gemini-latenz", type=float, default=0.0, help="Sekunden pro Gemini-Anfrage")
+    parser.add_argument("--gemini-fehlerquote", type=float, default=0.0, help="Anteil fehlschlagender Anfragen (429)")
+    parser.add_argument("--gemini-rpm", type=float, default=0, help="Gemini-Anfragen pro Minute (0 = unbegrenzt)")
+    parser.add_argument("--polls", type=int, default=20)
+    parser.add_argument("--neu-pro-poll", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ausgabe", default="bench_ergebnis.json", help="Ergebnisdatei (JSON)")
+    parser.add_argument("--im-prozess", action="store_true", help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None) -> dict:
+    args = _parser().parse_args(argv)
+    logging.getLogger().setLevel(logging.WARNING)
+    szenarien = args.szenario or SZENARIEN
+
+    if args.im_prozess:
+        ergebnisse = {name: fuehre_szenario_aus(name, args) for name in szenarien}
+    else:
+        ergebnisse = {}
+        weitere_argumente = _ohne_szenario_und_ausgabe(argv if argv is not None else sys.argv[1:])
+        for name in szenarien:
+            with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+                tmp_pfad = tmp.name
+            try:
+                befehl = [sys.executable, "-m", "bench.bench_szenarien", *weitere_argumente,
+                          "--szenario", name, "--ausgabe", tmp_pfad, "--im-prozess"]
+                subprocess.run(befehl, cwd=PROJEKT, check=True, stdout=subprocess.DEVNULL)
+                with open(tmp_pfad, encoding="utf-8") as f:
+                    ergebnisse[name] = json.load(f)["szenarien"][name]
+            finally:
+                os.remove(tmp_pfad)
+            print(f"{name}: {json.dumps(ergebnisse[name], ensure_ascii=False)}", file=sys.stderr)
+
+    bericht = {
+        "benchmark": "szenarien",
+        "zeitpunkt": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plattform": platform.platform(),
+        "parameter": {k: v for k, v in vars(args).items() if k not in ("szenario", "ausgabe", "im_prozess")},
+        "szenarien": ergebnisse,
+    }
+    with open(args.ausgabe, "w", encoding="utf-8") as f:
+        json.dump(bericht, f, indent=2, ensure_ascii=False)
+    if not args.im_prozess:
+        print(json.dumps(bericht, indent=2, ensure_ascii=False))
+    return bericht
+
+
+def _ohne_szenario_und_ausgabe(argumente: list[str]) -> list[str]:
+    """Reicht die übrigen Kommandozeilenargumente an den Kindprozess weiter."""
+    ergebnis = []
+    ueberspringen = False
+    for argument in argumente:
+        if ueberspringen:
+            ueberspringen = False
+            continue
+        if argument in ("--szenario", "--ausgabe"):
+            ueberspringen = True
+            continue
+        if argument.startswith(("--szenario=", "--ausgabe=")):
+            continue
+        ergebnis.append(argument)
+    return ergebnis
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Ersatz für das Gemini-Modell im GeminiClassifier: konfigurierbare Latenz und Fehlerquote, zählt Anfragen
+und Tokens (wie usage_metadata der echten API). Kategorien werden anhand von Betreff-Schlüsselwörtern
+bestimmt, Antworten im selben Format wie Gemini (einzelner Name bzw. JSON-Array im Batch-Modus).
+"""
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from ai_classify import GeminiClassifier
+from lokaler_classifier import LokalerClassifier
+from text_normalisierung import zaehle_tokens
+
+SCHLUESSELWOERTER = {
+    "rechnung": ["rechnung"],
+    "newsletter": ["rabatt", "angebot", "neuheiten"],
+    "termine": ["termin", "besprechung"],
+    "bank": ["kontoauszug"],
+    "reisen": ["buchung", "flug"],
+}
+_BATCH_MAIL = re.compile(r'^--- E-Mail (E\d+) ---\nBetreff: (.*)$', re.MULTILINE)
+_EINZEL_BETREFF = re.compile(r'^--- Neue E-Mail zur Klassifizierung ---\nBetreff: (.*)$', re.MULTILINE)
+
+
+class FakeGeminiFehler(Exception):
+    """Wie google.api_core-Fehler: HTTP-Status im Attribut code (429 -> mit_backoff wiederholt)."""
+
+    def __init__(self, code: int = 429):
+        super().__init__(f"{code} Fake-Gemini-Fehler")
+        self.code = code
+
+
+class FakeGeminiModel:
+    def __init__(self, latenz: float = 0.0, fehlerquote: float = 0.0, fehler_code: int = 429, seed: int = 42):
+        self.latenz = latenz
+        self.fehlerquote = fehlerquote
+        self.fehler_code = fehler_code
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self.anfragen = 0
+        self.fehler = 0
+        self.prompt_tokens = 0
+        self.antwort_tokens = 0
+
+    @staticmethod
+    def _kategorie(betreff: str) -> str:
+        betreff = betreff.lower()
+        for kategorie, woerter in SCHLUESSELWOERTER.items():
+            if any(wort in betreff for wort in woerter):
+                return kategorie
+        return "unbekannt"
+
+    def generate_content(self, prompt: str):
+        with self._lock:
+            self.anfragen += 1
+            fehlschlag = self._rnd.random() < self.fehlerquote
+            if fehlschlag:
+                self.fehler += 1
+        if self.latenz:
+            time.sleep(self.latenz)
+        if fehlschlag:
+            raise FakeGeminiFehler(self.fehler_code)
+
+        batch = _BATCH_MAIL.findall(prompt)
+        if batch:
+            text = json.dumps([{"id": mail_id, "kategorie": self._kategorie(betreff)} for mail_id, betreff in batch])
+        else:
+            betreff = _EINZEL_BETREFF.search(prompt)
+            text = self._kategorie(betreff.group(1) if betreff else "")
+        usage = SimpleNamespace(prompt_token_count=zaehle_tokens(prompt), candidates_token_count=zaehle_tokens(text))
+        usage.total_token_count = usage.prompt_token_count + usage.candidates_token_count
+        with self._lock:
+            self.prompt_tokens += usage.prompt_token_count
+            self.antwort_tokens += usage.candidates_token_count
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+def erzeuge_classifier(model: FakeGeminiModel, cache_pfad: str, lokal: bool = False) -> GeminiClassifier:
+    """
+    GeminiClassifier mit Fake-Modell, ohne google.generativeai zu konfigurieren. Das lokale Modell ist
+    standardmäßig aus, damit die Benchmarks den Gemini-Pfad messen; mit lokal=True lernt es nur im Speicher.
+    """
+    classifier = GeminiClassifier(api_key="fake", cache_pfad=cache_pfad,
+                                  lokales_modell=LokalerClassifier(pfad=None) if lokal else None, lokal=lokal)
+    classifier._model = model
+    return classifier
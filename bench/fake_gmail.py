@@ -0,0 +1,359 @@
+"""
+In-Process-Nachbildung der Gmail-API für Benchmarks: synthetisches Postfach mit konfigurierbarer Größe
+und MIME-Mischung, zählt HTTP-Anfragen, API-Aufrufe und Quota-Einheiten.
+
+Unterstützt: labels.list/create, messages.list (auch q="rfc822msgid:…")/get/modify/batchModify, history.list,
+getProfile und Batch-Requests (new_batch_http_request). Feldmasken (fields) werden ignoriert.
+"""
+import base64
+import random
+import threading
+import time
+from collections import Counter
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from bench.bench_normalisierung import _antwort_text, _newsletter_html, _rechnung_text
+
+# Quota-Einheiten laut Gmail-API-Dokumentation
+QUOTA = {
+    "labels.list": 1, "labels.create": 5, "messages.list": 5, "messages.get": 5, "messages.modify": 5,
+    "messages.batchModify": 50, "history.list": 2, "getProfile": 1,
+}
+MIME_MIX_STANDARD = {"text": 3, "html": 3, "alternative": 3, "mixed": 1}
+_SEITE = 100
+
+
+def _b64(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode().rstrip("=")
+
+
+def _http_fehler(status: int, text: str) -> HttpError:
+    return HttpError(httplib2.Response({"status": status}), text.encode())
+
+
+def _bank_text(rnd: random.Random) -> str:
+    return (f"Guten Tag,\n\nfür Ihr Konto steht ein neuer Kontoauszug ({rnd.randint(1, 12)}/2025) bereit.\n"
+            "Melden Sie sich im Online-Banking an, um ihn abzurufen.\n\nIhre Beispielbank\n")
+
+
+def _reise_text(rnd: random.Random) -> str:
+    return (f"Vielen Dank für Ihre Buchung {rnd.getrandbits(32):X}.\nAbflug: {rnd.randint(1, 28)}.08. "
+            f"{rnd.randint(5, 22)}:{rnd.randint(10, 59)} Uhr, Sitzplatz {rnd.randint(1, 40)}{rnd.choice('ABCDEF')}\n")
+
+
+# Synthetische E-Mail-Arten: (Kategorie, Label-ID des Trainingsbestands, Betreff-Vorlagen, Absender, Body-Erzeuger)
+ARTEN = [
+    ("rechnung", "Label_1", ["Ihre Rechnung Nr. {n}", "Rechnung {n} ist verfügbar"], "rechnung@telekom.example", _rechnung_text),
+    ("newsletter", "Label_2", ["Nur heute: {p}% Rabatt", "Neuheiten der Woche", "Angebot für Sie: {p}% sparen"],
+     "news@shop{s}.example", _newsletter_html),
+    ("termine", "Label_3", ["Re: Termin am {t}.", "AW: Besprechung nächste Woche"], "kollege{s}@firma.example", _antwort_text),
+    ("bank", "Label_4", ["Neuer Kontoauszug verfügbar", "Ihr Kontoauszug {t}/2025"], "service@bank.example", _bank_text),
+    # Weder Label noch Regel: Gemini kann sie keiner Kategorie zuordnen, sie bleiben in der INBOX
+    ("reisen", None, ["Buchungsbestätigung {n}", "Ihr Flug am {t}.08."], "buchung@airline{s}.example", _reise_text),
+]
+
+
+def _payload(mime: str, body: str, ist_html: bool, headers: list[dict]) -> dict:
+    text_typ = "text/html" if ist_html else "text/plain"
+    if mime == "text":
+        return {"mimeType": "text/plain", "headers": headers, "body": {"size": len(body), "data": _b64(body)}}
+    if mime == "html":
+        return {"mimeType": text_typ, "headers": headers, "body": {"size": len(body), "data": _b64(body)}}
+    alternative = {
+        "mimeType": "multipart/alternative", "body": {"size": 0},
+        "parts": [
+            {"mimeType": "text/plain", "body": {"size": len(body), "data": _b64(body)}},
+            {"mimeType": "text/html", "body": {"size": len(body) + 26, "data": _b64(f"<html><body>{body}</body></html>")}},
+        ],
+    }
+    if mime == "alternative":
+        return dict(alternative, headers=headers)
+    return {
+        "mimeType": "multipart/mixed", "headers": headers, "body": {"size": 0},
+        "parts": [alternative, {"mimeType": "application/pdf", "filename": "dokument.pdf",
+                                "body": {"size": 48213, "attachmentId": "ANGEHAENGT"}}],
+    }
+
+
+class FakePostfach:
+    """Synthetisches Postfach: gelabelte E-Mails als Trainingsbestand plus ungelesene E-Mails in der INBOX."""
+
+    SYSTEM_LABELS = ["INBOX", "UNREAD", "SENT", "TRASH", "SPAM"]
+    BENUTZER_LABELS = {"Label_1": "Rechnungen", "Label_2": "Newsletter", "Label_3": "Termine", "Label_4": "Bank"}
+
+    def __init__(self, ungelesen: int = 50, gelabelt_pro_label: int = 50, seed: int = 42,
+                 mime_mix: dict[str, int] | None = None):
+        self._rnd = random.Random(seed)
+        self._mime_mix = mime_mix or MIME_MIX_STANDARD
+        self._lock = threading.Lock()
+        self.labels = {label: {"id": label, "name": label, "type": "system"} for label in self.SYSTEM_LABELS}
+        self.labels.update({lid: {"id": lid, "name": name, "type": "user"} for lid, name in self.BENUTZER_LABELS.items()})
+        self.nachrichten: dict[str, dict] = {}
+        self.kategorien: dict[str, str] = {}  # msg_id -> wahre Kategorie
+        self.history: list[tuple[int, str]] = []
+        self.history_id = 1000
+        self._naechste_id = 0
+        for art in ARTEN:
+            if art[1]:
+                for _ in range(gelabelt_pro_label):
+                    self._neue_nachricht(art, [art[1]])
+        self.fuege_ungelesene_hinzu(ungelesen)
+
+    def _neue_nachricht(self, art, label_ids: list[str]) -> str:
+        kategorie, _, betreffe, absender, erzeuger = art
+        rnd = self._rnd
+        self._naechste_id += 1
+        msg_id = f"{self._naechste_id:016x}"
+        betreff = rnd.choice(betreffe).format(n=rnd.randint(10000, 99999), p=rnd.randint(10, 70), t=rnd.randint(1, 28))
+        body = erzeuger(rnd)
+        ist_html = body.lstrip().startswith("<html")
+        mime = rnd.choices(list(self._mime_mix), weights=list(self._mime_mix.values()))[0]
+        if ist_html and mime == "text":
+            mime = "html"
+        headers = [
+            {"name": "From", "value": absender.format(s=rnd.randint(1, 20))},
+            {"name": "To", "value": "ich@example.com"},
+            {"name": "Subject", "value": betreff},
+            {"name": "Message-ID", "value": f"<{msg_id}@fake.example>"},
+            {"name": "Date", "value": "Mon, 01 Sep 2025 08:00:00 +0200"},
+        ]
+        if kategorie == "newsletter":
+            headers.append({"name": "List-Unsubscribe", "value": f"<https://shop.example/abmelden?u={msg_id}>"})
+            headers.append({"name": "List-Unsubscribe-Post", "value": "List-Unsubscribe=One-Click"})
+        self.history_id += 1
+        self.nachrichten[msg_id] = {
+            "id": msg_id, "threadId": msg_id, "labelIds": list(label_ids), "historyId": str(self.history_id),
+            "snippet": " ".join(body.split())[:140], "payload": _payload(mime, body, ist_html, headers),
+        }
+        self.kategorien[msg_id] = kategorie
+        self.history.append((self.history_id, msg_id))
+        return msg_id
+
+    def fuege_ungelesene_hinzu(self, anzahl: int) -> list[str]:
+        """Neue ungelesene E-Mails in der INBOX (z. B. zwischen zwei Polling-Läufen)."""
+        with self._lock:
+            return [self._neue_nachricht(self._rnd.choice(ARTEN), ["INBOX", "UNREAD"]) for _ in range(anzahl)]
+
+    def ungelesen_in_inbox(self) -> int:
+        return sum(1 for m in self.nachrichten.values() if "INBOX" in m["labelIds"] and "UNREAD" in m["labelIds"])
+
+    def als_rfc822(self, msg_id: str) -> bytes:
+        """Die Nachricht als RFC-822-Bytes, wie in einem mbox- oder .eml-Export (für Backfill-Tests)."""
+        from email.message import EmailMessage
+        from utils import get_email_body
+        nachricht = self.nachrichten[msg_id]
+        mail = EmailMessage()
+        for header in nachricht["payload"]["headers"]:
+            mail[header["name"]] = header["value"]
+        text = get_email_body(nachricht, max_bytes=None)
+        mail.set_content(text, subtype="html" if text.lstrip().startswith("<html") else "plain")
+        return mail.as_bytes()
+
+
+class _Anfrage:
+    """Entspricht googleapiclient.http.HttpRequest: erst execute() führt den Aufruf aus."""
+
+    def __init__(self, service: "FakeGmailService", methode: str, funktion):
+        self._service = service
+        self.methode = methode
+        self._funktion = funktion
+
+    def _ausfuehren(self):
+        self._service._zaehle(self.methode)
+        return self._funktion()
+
+    def execute(self):
+        self._service._http_anfrage()
+        return self._ausfuehren()
+
+
+class _FakeBatch:
+    def __init__(self, service: "FakeGmailService"):
+        self._service = service
+        self._anfragen = []
+
+    def add(self, anfrage: _Anfrage, callback=None, request_id=None):
+        self._anfragen.append((anfrage, callback, request_id or str(len(self._anfragen))))
+
+    def execute(self):
+        self._service._http_anfrage()
+        for anfrage, callback, request_id in self._anfragen:
+            try:
+                antwort, fehler = anfrage._ausfuehren(), None
+            except HttpError as e:
+                antwort, fehler = None, e
+            if callback:
+                callback(request_id, antwort, fehler)
+
+
+class _Ressource:
+    def __init__(self, service: "FakeGmailService"):
+        self._s = service
+        self._p = service.postfach
+
+
+class _Labels(_Ressource):
+    def list(self, userId):
+        return _Anfrage(self._s, "labels.list", lambda: {"labels": [dict(l) for l in self._p.labels.values()]})
+
+    def create(self, userId, body):
+        def anlegen():
+            with self._p._lock:
+                if any(l["name"].lower() == body["name"].lower() for l in self._p.labels.values()):
+                    raise _http_fehler(409, "Label name exists or conflicts")
+                label_id = f"Label_{len(self._p.labels) + 1}"
+                self._p.labels[label_id] = dict(body, id=label_id, type="user")
+                return dict(self._p.labels[label_id])
+        return _Anfrage(self._s, "labels.create", anlegen)
+
+
+class _Messages(_Ressource):
+    def list(self, userId, labelIds=None, q=None, maxResults=100, pageToken=None):
+        def auflisten():
+            gesucht = set(labelIds or [])
+            if q and "is:unread" in q:
+                gesucht.add("UNREAD")
+            treffer = [m for m in reversed(self._p.nachrichten.values()) if gesucht <= set(m["labelIds"])]
+            if q and q.startswith("rfc822msgid:"):
+                message_id = q[len("rfc822msgid:"):].strip("<>")
+                treffer = [m for m in treffer if any(h["name"] == "Message-ID" and h["value"].strip("<>") == message_id
+                                                     for h in m["payload"]["headers"])]
+            start = int(pageToken or 0)
+            ergebnis = {"messages": [{"id": m["id"], "threadId": m["threadId"]} for m in treffer[start:start + maxResults]],
+                        "resultSizeEstimate": len(treffer)}
+            if start + maxResults < len(treffer):
+                ergebnis["nextPageToken"] = str(start + maxResults)
+            return ergebnis
+        return _Anfrage(self._s, "messages.list", auflisten)
+
+    def get(self, userId, id, format="full", metadataHeaders=None, fields=None):
+        def abrufen():
+            msg = self._p.nachrichten.get(id)
+            if msg is None:
+                raise _http_fehler(404, "Requested entity was not found.")
+            if format == "minimal":
+                return {k: msg[k] for k in ("id", "threadId", "labelIds", "snippet", "historyId")}
+            if format == "metadata":
+                headers = msg["payload"]["headers"]
+                if metadataHeaders:
+                    namen = {h.lower() for h in metadataHeaders}
+                    headers = [h for h in headers if h["name"].lower() in namen]
+                return dict(msg, labelIds=list(msg["labelIds"]),
+                            payload={"mimeType": msg["payload"]["mimeType"], "headers": headers})
+            return dict(msg, labelIds=list(msg["labelIds"]))
+        return _Anfrage(self._s, "messages.get", abrufen)
+
+    def _aendere(self, msg_id: str, body: dict) -> None:
+        msg = self._p.nachrichten.get(msg_id)
+        if msg is None:
+            raise _http_fehler(404, "Requested entity was not found.")
+        labels = [l for l in msg["labelIds"] if l not in body.get("removeLabelIds", [])]
+        msg["labelIds"] = labels + [l for l in body.get("addLabelIds", []) if l not in labels]
+
+    def modify(self, userId, id, body):
+        def aendern():
+            with self._p._lock:
+                self._aendere(id, body)
+                return dict(self._p.nachrichten[id])
+        return _Anfrage(self._s, "messages.modify", aendern)
+
+    def batchModify(self, userId, body):
+        def aendern():
+            if len(body["ids"]) > 1000:
+                raise _http_fehler(400, "Too many ids")
+            with self._p._lock:
+                for msg_id in body["ids"]:
+                    if msg_id in self._p.nachrichten:
+                        self._aendere(msg_id, body)
+            return ""
+        return _Anfrage(self._s, "messages.batchModify", aendern)
+
+
+class _History(_Ressource):
+    def list(self, userId, startHistoryId, historyTypes=None, labelId=None, pageToken=None):
+        def auflisten():
+            start = int(startHistoryId)
+            # Ältere historyIds als die erste bekannte gelten als abgelaufen
+            if self._p.history and start < self._p.history[0][0] - 1:
+                raise _http_fehler(404, "Requested entity was not found.")
+            eintraege = [(hid, msg_id) for hid, msg_id in self._p.history if hid > start
+                         and (not labelId or labelId in self._p.nachrichten[msg_id]["labelIds"])]
+            offset = int(pageToken or 0)
+            seite = eintraege[offset:offset + _SEITE]
+            ergebnis = {
+                "history": [{"id": str(hid), "messagesAdded": [{"message": {
+                    "id": msg_id, "threadId": msg_id, "labelIds": list(self._p.nachrichten[msg_id]["labelIds"])}}]}
+                    for hid, msg_id in seite],
+                "historyId": str(self._p.history_id),
+            }
+            if offset + _SEITE < len(eintraege):
+                ergebnis["nextPageToken"] = str(offset + _SEITE)
+            return ergebnis
+        return _Anfrage(self._s, "history.list", auflisten)
+
+
+class _Users(_Ressource):
+    def labels(self):
+        return _Labels(self._s)
+
+    def messages(self):
+        return _Messages(self._s)
+
+    def history(self):
+        return _History(self._s)
+
+    def getProfile(self, userId):
+        return _Anfrage(self._s, "getProfile",
+                        lambda: {"emailAddress": "ich@example.com", "historyId": str(self._p.history_id)})
+
+
+class FakeGmailService:
+    """
+    Ersatz für das Objekt aus googleapiclient.discovery.build('gmail', 'v1').
+    latenz simuliert die Round-Trip-Zeit pro HTTP-Anfrage (ein Batch zählt als eine Anfrage).
+    Mehrere Services können sich ein Postfach und die Zähler teilen (wie Services pro Thread).
+    """
+
+    def __init__(self, postfach: FakePostfach, latenz: float = 0.0, zaehler: dict | None = None):
+        self.postfach = postfach
+        self.latenz = latenz
+        self._zaehler = zaehler if zaehler is not None else {"lock": threading.Lock(), "aufrufe": Counter(), "http": 0}
+
+    def kopie(self) -> "FakeGmailService":
+        """Weiterer Service auf demselben Postfach mit gemeinsamen Zählern (für service_factory)."""
+        return FakeGmailService(self.postfach, self.latenz, self._zaehler)
+
+    def _http_anfrage(self) -> None:
+        with self._zaehler["lock"]:
+            self._zaehler["http"] += 1
+        if self.latenz:
+            time.sleep(self.latenz)
+
+    def _zaehle(self, methode: str) -> None:
+        with self._zaehler["lock"]:
+            self._zaehler["aufrufe"][methode] += 1
+
+    @property
+    def aufrufe(self) -> Counter:
+        return self._zaehler["aufrufe"]
+
+    @property
+    def http_anfragen(self) -> int:
+        return self._zaehler["http"]
+
+    @property
+    def quota_einheiten(self) -> int:
+        return sum(QUOTA.get(methode, 1) * anzahl for methode, anzahl in self.aufrufe.items())
+
+    def setze_zaehler_zurueck(self) -> None:
+        with self._zaehler["lock"]:
+            self._zaehler["aufrufe"].clear()
+            self._zaehler["http"] = 0
+
+    def users(self):
+        return _Users(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _FakeBatch(self)
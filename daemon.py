@@ -0,0 +1,108 @@
+import logging
+import os
+import signal
+import threading
+
+from gmail_utils import erneuere_credentials, get_label_registry
+from metriken import metriken
+
+# Abfrageintervall: kurz nach neuen E-Mails, bei Leerlauf schrittweise länger
+DAEMON_POLL_MIN = float(os.getenv("DAEMON_POLL_MIN", 30))
+DAEMON_POLL_MAX = float(os.getenv("DAEMON_POLL_MAX", 600))
+DAEMON_POLL_FAKTOR = float(os.getenv("DAEMON_POLL_FAKTOR", 2))
+# Abstand zwischen zwei Abgleichen der Trainingsdaten im Hintergrund
+DAEMON_TRAINING_INTERVALL = float(os.getenv("DAEMON_TRAINING_INTERVALL", 3600))
+
+
+class PollIntervall:
+    """Adaptives Abfrageintervall: nach Aktivität minimum, danach pro leerem Abruf um faktor länger bis maximum."""
+
+    def __init__(self, minimum: float = DAEMON_POLL_MIN, maximum: float = DAEMON_POLL_MAX,
+                 faktor: float = DAEMON_POLL_FAKTOR):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.faktor = faktor
+        self.aktuell = minimum
+
+    def naechstes(self, neue_emails: int) -> float:
+        if neue_emails:
+            self.aktuell = self.minimum
+        else:
+            self.aktuell = min(self.maximum, self.aktuell * self.faktor)
+        return self.aktuell
+
+
+class Daemon:
+    """
+    Dauerbetrieb: Gmail-Service, Classifier, Label-Registry, Regeln und Trainingsdaten der Sitzung bleiben
+    im Speicher; pro Abruf fallen nur Abfrage, Laden und Klassifizieren der neuen E-Mails an.
+    Trainingsdaten werden im Hintergrund inkrementell abgeglichen, das OAuth-Token vor Ablauf erneuert.
+    SIGTERM/SIGINT beenden den Daemon nach dem laufenden Abruf.
+    """
+
+    def __init__(self, sitzung, intervall: PollIntervall | None = None,
+                 training_intervall: float = DAEMON_TRAINING_INTERVALL):
+        self.sitzung = sitzung
+        self.intervall = intervall or PollIntervall()
+        self.training_intervall = training_intervall
+        self._stopp = threading.Event()
+        self._training_aktualisiert = threading.Event()
+        self.abrufe = 0
+
+    def stoppe(self, signum=None, frame=None) -> None:
+        if signum is not None:
+            logging.info(f"Signal {signum} empfangen – Daemon wird beendet.")
+        self._stopp.set()
+
+    def _training_schleife(self) -> None:
+        # Eigener Service: der Haupt-Thread nutzt seinen gleichzeitig
+        service = self.sitzung.neuer_service()
+        while not self._stopp.wait(self.training_intervall):
+            try:
+                get_label_registry(service).refresh()
+                self.sitzung.lerne(service)
+                self._training_aktualisiert.set()
+            except Exception as e:
+                logging.warning(f"Abgleich der Trainingsdaten im Hintergrund fehlgeschlagen: {e}")
+
+    def _abruf(self) -> int:
+        erneuere_credentials(self.sitzung.creds)
+        if self._training_aktualisiert.is_set():
+            # Labels können sich mit den Trainingsdaten geändert haben
+            self._training_aktualisiert.clear()
+            get_label_registry(self.sitzung.service).refresh()
+        self.sitzung.aktualisiere_regeln()
+        return self.sitzung.verarbeite_neue()
+
+    def ausfuehren(self) -> None:
+        vorherige_handler = {}
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                vorherige_handler[signum] = signal.signal(signum, self.stoppe)
+        logging.info("Daemon gestartet.")
+        training = None
+        try:
+            self.sitzung.lerne()
+            training = threading.Thread(target=self._training_schleife, name="training", daemon=True)
+            training.start()
+            while not self._stopp.is_set():
+                try:
+                    neue = self._abruf()
+                except Exception as e:
+                    # Netzwerk- oder API-Fehler beenden den Daemon nicht; nächster Versuch nach Backoff
+                    logging.exception(f"Abruf fehlgeschlagen: {e}")
+                    neue = 0
+                self.abrufe += 1
+                metriken.schreibe()
+                wartezeit = self.intervall.naechstes(neue)
+                logging.info(f"Nächster Abruf in {wartezeit:.0f}s.")
+                self._stopp.wait(wartezeit)
+        finally:
+            # Ein laufender Abgleich schreibt noch in den TrainingsStore: erst nach seinem Ende schließen
+            self._stopp.set()
+            if training is not None:
+                training.join()
+            self.sitzung.beenden()
+            for signum, handler in vorherige_handler.items():
+                signal.signal(signum, handler)
+            logging.info(f"Daemon beendet nach {self.abrufe} Abrufen.")
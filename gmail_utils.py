@@ -1,38 +1,236 @@
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from typing import Callable, TYPE_CHECKING
+import datetime
+import json
+import logging
 import os
+import threading
+import time
+import weakref
+from rate_limit import RateLimiter, mit_backoff, WIEDERHOLBARE_STATUS
+from metriken import metriken, gemessen
+
+if TYPE_CHECKING:
+    from googleapiclient.discovery import Resource
 
 SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
+# Access-Tokens so viele Sekunden vor Ablauf erneuern (Daemon-Modus)
+TOKEN_VORLAUF = float(os.getenv("TOKEN_VORLAUF", 300))
+# Optional: lokale Kopie des Gmail-Discovery-Dokuments (sonst die mit googleapiclient ausgelieferte)
+GMAIL_DISCOVERY_DATEI = os.getenv("GMAIL_DISCOVERY_DATEI", "")
+
+# Gmail erlaubt max. 100 Teilanfragen pro Batch, empfohlen sind 50.
+BATCH_GROESSE = int(os.getenv("BATCH_GROESSE", 50))
+BATCH_MAX_VERSUCHE = int(os.getenv("BATCH_MAX_VERSUCHE", 3))
+# messages.batchModify akzeptiert max. 1000 IDs pro Aufruf.
+BATCH_MODIFY_GROESSE = 1000
+
+# Feldmasken: nur die für die Klassifizierung benötigten Teile der Antwort übertragen
+METADATA_HEADERS = ['Subject', 'From', 'List-Unsubscribe', 'List-Unsubscribe-Post']
+METADATA_FIELDS = 'id,threadId,labelIds,snippet,payload(mimeType,headers)'
+FULL_FIELDS = 'id,threadId,labelIds,snippet,payload(mimeType,headers,body(data,size),parts)'
+
+# Gmail-Kontingent: 250 Quota-Einheiten pro Nutzer und Sekunde
+GMAIL_QUOTA_PRO_SEKUNDE = float(os.getenv("GMAIL_QUOTA_PRO_SEKUNDE", 250))
+QUOTA_MESSAGES_GET = 5
+QUOTA_MESSAGES_LIST = 5
+QUOTA_MESSAGES_MODIFY = 5
+QUOTA_BATCH_MODIFY = 50
+QUOTA_LABELS_LIST = 1
+QUOTA_LABELS_CREATE = 5
+gmail_quota = RateLimiter(GMAIL_QUOTA_PRO_SEKUNDE)
+
+
+def zaehle_gmail_anfrage(quota_einheiten: int, api_aufrufe: int = 1) -> None:
+    """Erfasst eine HTTP-Anfrage an Gmail (ein Batch zählt einmal) mit ihren API-Aufrufen und Quota-Einheiten."""
+    if metriken.aktiv:
+        metriken.zaehle("gmail_http_anfragen")
+        metriken.zaehle("gmail_api_aufrufe", api_aufrufe)
+        metriken.zaehle("gmail_quota_einheiten", quota_einheiten)
 
-def get_gmail_service() -> build:
+
+def lade_credentials(token_datei: str = 'token.json', credentials_datei: str = 'credentials.json',
+                     interaktiv: bool = True) -> Credentials:
+    """
+    Lädt die OAuth-Credentials aus token_datei, erneuert abgelaufene Tokens bzw. startet den Browser-Login.
+    Ohne interaktiv (z. B. in Worker-Prozessen) wird statt des Logins ein RuntimeError ausgelöst.
+    """
     creds = None
-    if os.path.exists('token.json'):
+    if os.path.exists(token_datei):
         try:
-            creds = Credentials.from_authorized_user_file('token.json', SCOPES)
+            creds = Credentials.from_authorized_user_file(token_datei, SCOPES)
         except Exception:
-            print("⚠️ Fehler mit token.json – Datei wird neu erstellt.")
+            print(f"⚠️ Fehler mit {token_datei} – Datei wird neu erstellt.")
+    if creds and not creds.valid and creds.refresh_token:
+        try:
+            erneuere_credentials(creds, token_datei, vorlauf=None)
+        except Exception as e:
+            logging.warning(f"Token konnte nicht erneuert werden, neuer Login nötig: {e}")
     if not creds or not creds.valid:
-        flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
+        if not interaktiv:
+            raise RuntimeError(f"❌ Kein gültiges Token in {token_datei} – einmal interaktiv anmelden.")
+        # Nur für den (seltenen) Browser-Login nötig
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        flow = InstalledAppFlow.from_client_secrets_file(credentials_datei, SCOPES)
         creds = flow.run_local_server(port=0)
-        with open('token.json', 'w') as token:
+        with open(token_datei, 'w') as token:
             token.write(creds.to_json())
-    return build('gmail', 'v1', credentials=creds)
+    return creds
+
+
+def erneuere_credentials(creds: Credentials, token_datei: str = 'token.json', vorlauf: float | None = TOKEN_VORLAUF) -> bool:
+    """
+    Erneuert das Access-Token, wenn es in weniger als vorlauf Sekunden abläuft (vorlauf=None: immer),
+    und speichert es.
+    Bestehende Service-Objekte verwenden dasselbe Credentials-Objekt und sind damit sofort aktuell.
+    :return: True, wenn erneuert wurde
+    """
+    if not creds.refresh_token:
+        return False
+    if creds.expiry is not None and vorlauf is not None:
+        # expiry ist naive UTC
+        jetzt = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        if (creds.expiry - jetzt).total_seconds() > vorlauf:
+            return False
+    from google.auth.transport.requests import Request
+    creds.refresh(Request())
+    with open(token_datei, 'w') as token:
+        token.write(creds.to_json())
+    logging.info("🔑 OAuth-Token erneuert.")
+    return True
+
+
+_discovery_dokument: dict | None = None
+_discovery_lock = threading.Lock()
+
+
+def _gmail_discovery_dokument() -> dict | None:
+    """Lädt das Discovery-Dokument einmal pro Prozess (GMAIL_DISCOVERY_DATEI oder statische Kopie von googleapiclient)."""
+    global _discovery_dokument
+    with _discovery_lock:
+        if _discovery_dokument is None:
+            if GMAIL_DISCOVERY_DATEI and os.path.exists(GMAIL_DISCOVERY_DATEI):
+                with open(GMAIL_DISCOVERY_DATEI, "r", encoding="utf-8") as f:
+                    _discovery_dokument = json.load(f)
+            else:
+                from googleapiclient.discovery_cache import get_static_doc
+                text = get_static_doc('gmail', 'v1')
+                if text:
+                    _discovery_dokument = json.loads(text)
+        return _discovery_dokument
+
+
+def get_gmail_service(creds: Credentials | None = None) -> "Resource":
+    """
+    Erstellt einen Gmail-Service. Service-Objekte sind nicht threadsicher: pro Thread einen eigenen anlegen.
+    Das Discovery-Dokument wird nur einmal gelesen und geparst, weitere Services entstehen per build_from_document.
+    """
+    from googleapiclient.discovery import build, build_from_document
+    if creds is None:
+        creds = lade_credentials()
+    dokument = _gmail_discovery_dokument()
+    if dokument is None:
+        return build('gmail', 'v1', credentials=creds)
+    return build_from_document(dokument, credentials=creds)
+
+class LabelRegistry:
+    """
+    Einmal pro Lauf geladenes Verzeichnis aller Gmail-Labels.
+    Indiziert nach Name (case-insensitiv) und ID; lädt nur bei einem Fehltreffer oder 409-Konflikt neu.
+    """
+
+    def __init__(self, service):
+        self._service = service
+        self._lock = threading.Lock()
+        self._by_name: dict[str, dict] = {}
+        self._by_id: dict[str, dict] = {}
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Lädt die Label-Liste neu von Gmail."""
+        zaehle_gmail_anfrage(QUOTA_LABELS_LIST)
+        with metriken.messe("gmail_labels_list"):
+            response = self._service.users().labels().list(userId='me').execute()
+        labels = response.get('labels', [])
+        self._by_id = {label['id']: label for label in labels}
+        self._by_name = {label['name'].lower(): label for label in labels}
+
+    def get_id(self, label_name: str) -> str | None:
+        label = self._by_name.get(label_name.lower())
+        return label['id'] if label else None
+
+    def get_name(self, label_id: str) -> str | None:
+        label = self._by_id.get(label_id)
+        return label['name'] if label else None
+
+    def alle(self) -> dict[str, str]:
+        """Gibt alle Labels als Dict (id->name) zurück."""
+        return {label_id: label['name'] for label_id, label in self._by_id.items()}
+
+    def namen(self) -> list[str]:
+        """Gibt alle Labelnamen kleingeschrieben zurück."""
+        return list(self._by_name)
+
+    def _add(self, label: dict) -> None:
+        self._by_id[label['id']] = label
+        self._by_name[label['name'].lower()] = label
+
+    def get_or_create(self, label_name: str) -> str:
+        """Gibt die ID des Labels zurück und legt es bei Bedarf an."""
+        label_id = self.get_id(label_name)
+        if label_id:
+            return label_id
+        with self._lock:
+            # Ein anderer Thread könnte das Label inzwischen angelegt haben
+            label_id = self.get_id(label_name)
+            if label_id:
+                return label_id
+            self.refresh()
+            label_id = self.get_id(label_name)
+            if label_id:
+                return label_id
+            new_label = {
+                'name': label_name,
+                'labelListVisibility': 'labelShow',
+                'messageListVisibility': 'show'
+            }
+            zaehle_gmail_anfrage(QUOTA_LABELS_CREATE)
+            try:
+                created = self._service.users().labels().create(userId='me', body=new_label).execute()
+            except HttpError as e:
+                if getattr(e.resp, 'status', None) != 409:
+                    raise
+                # Label existiert bereits (z. B. von einem anderen Prozess angelegt)
+                self.refresh()
+                label_id = self.get_id(label_name)
+                if not label_id:
+                    raise
+                return label_id
+            self._add(created)
+            return created['id']
+
+
+_label_registries: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_label_registries_lock = threading.Lock()
+
+
+def get_label_registry(service) -> LabelRegistry:
+    """Gibt die LabelRegistry für diesen Service zurück (einmal pro Service geladen)."""
+    with _label_registries_lock:
+        registry = _label_registries.get(service)
+        if registry is None:
+            registry = LabelRegistry(service)
+            _label_registries[service] = registry
+        return registry
+
 
 def get_or_create_label(service, label_name: str) -> str:
-    labels = service.users().labels().list(userId='me').execute()
-    for label in labels['labels']:
-        if label['name'].lower() == label_name.lower():
-            return label['id']
-    new_label = {
-        'name': label_name,
-        'labelListVisibility': 'labelShow',
-        'messageListVisibility': 'show'
-    }
-    created = service.users().labels().create(userId='me', body=new_label).execute()
-    return created['id']
+    return get_label_registry(service).get_or_create(label_name)
 
+@gemessen("gmail_modify")
 def move_email_to_label(service, message_id: str, label_id: str):
+    zaehle_gmail_anfrage(QUOTA_MESSAGES_MODIFY)
     service.users().messages().modify(
         userId='me',
         id=message_id,
@@ -42,17 +240,143 @@ def move_email_to_label(service, message_id: str, label_id: str):
         }
     ).execute()
 
+def ist_wiederholbar(fehler: Exception) -> bool:
+    """Prüft, ob ein Fehler vorübergehend ist (Rate-Limit, Serverfehler, Netzwerk)."""
+    if isinstance(fehler, HttpError):
+        return getattr(fehler.resp, 'status', None) in WIEDERHOLBARE_STATUS
+    return True
+
+
+def batch_execute(service, ids: list[str], make_request: Callable[[str], object],
+                  chunk_size: int = BATCH_GROESSE, max_versuche: int = BATCH_MAX_VERSUCHE,
+                  quota_pro_anfrage: int = QUOTA_MESSAGES_GET) -> tuple[dict, dict]:
+    """
+    Führt eine Anfrage pro ID als Gmail-Batch-HTTP-Request aus (chunk_size Teilanfragen pro HTTP-Aufruf).
+    Fehlgeschlagene Teilanfragen werden einzeln erfasst und nur diese erneut versucht.
+    :return: (ergebnisse id->Antwort, fehler id->Exception)
+    """
+    ergebnisse: dict = {}
+    fehler: dict = {}
+    offen = list(dict.fromkeys(ids))
+    for versuch in range(max_versuche):
+        if not offen:
+            break
+        if versuch:
+            time.sleep(min(2 ** versuch, 30))
+
+        fehlgeschlagen = []
+        for i in range(0, len(offen), chunk_size):
+            chunk = offen[i:i + chunk_size]
+
+            def callback(request_id, response, exception):
+                if exception is None:
+                    ergebnisse[request_id] = response
+                    fehler.pop(request_id, None)
+                else:
+                    fehler[request_id] = exception
+                    if ist_wiederholbar(exception):
+                        fehlgeschlagen.append(request_id)
+
+            gmail_quota.erwerbe(quota_pro_anfrage * len(chunk))
+            zaehle_gmail_anfrage(quota_pro_anfrage * len(chunk), len(chunk))
+            batch = service.new_batch_http_request()
+            for item_id in chunk:
+                batch.add(make_request(item_id), callback=callback, request_id=item_id)
+            try:
+                with metriken.messe("gmail_batch"):
+                    batch.execute()
+            except Exception as e:
+                # Gesamter Batch gescheitert: alle IDs des Chunks ohne Ergebnis erneut versuchen,
+                # auch solche mit einem Fehler aus einem früheren Versuch
+                logging.warning(f"Batch-Anfrage fehlgeschlagen ({len(chunk)} Einträge): {e}")
+                bereits = set(fehlgeschlagen)
+                for item_id in chunk:
+                    if item_id not in ergebnisse:
+                        fehler[item_id] = e
+                        if item_id not in bereits:
+                            fehlgeschlagen.append(item_id)
+        offen = fehlgeschlagen
+    for item_id, e in fehler.items():
+        logging.warning(f"Batch-Teilanfrage '{item_id}' endgültig fehlgeschlagen: {e}")
+    return ergebnisse, fehler
+
+
+def batch_get_messages(service, message_ids: list[str], format: str = 'full',
+                       chunk_size: int = BATCH_GROESSE, metadata_headers: list[str] | None = None,
+                       fields: str | None = None) -> dict[str, dict]:
+    """
+    Holt mehrere E-Mails per Batch-Request. Gibt ein Dict (id->Nachricht) der erfolgreich geladenen E-Mails zurück.
+    Mit format='metadata', metadata_headers und einer fields-Maske werden nur die benötigten Header übertragen.
+    """
+    messages = service.users().messages()
+    parameter = {}
+    if metadata_headers:
+        parameter['metadataHeaders'] = metadata_headers
+    if fields:
+        parameter['fields'] = fields
+    ergebnisse, _ = batch_execute(
+        service,
+        message_ids,
+        lambda msg_id: messages.get(userId='me', id=msg_id, format=format, **parameter),
+        chunk_size=chunk_size
+    )
+    return ergebnisse
+
+
+def batch_get_metadata(service, message_ids: list[str]) -> dict[str, dict]:
+    """Holt nur Betreff, Absender, List-Unsubscribe-Header, Labels und Snippet (ohne Body)."""
+    return batch_get_messages(service, message_ids, format='metadata',
+                              metadata_headers=METADATA_HEADERS, fields=METADATA_FIELDS)
+
+
+def batch_get_full(service, message_ids: list[str]) -> dict[str, dict]:
+    """Holt die vollständigen E-Mails, beschränkt auf die für Header und Textteile nötigen Felder."""
+    return batch_get_messages(service, message_ids, format='full', fields=FULL_FIELDS)
+
+
+def move_emails_to_labels(service, verschiebungen: dict[str, list[str]], archivieren: bool = True) -> dict[str, Exception]:
+    """
+    Verschiebt E-Mails gruppiert nach Ziel-Label per messages.batchModify (max. 1000 IDs pro Aufruf).
+    Scheitert ein Aufruf (nach Backoff), werden die übrigen Gruppen trotzdem verschoben.
+    :param verschiebungen: Dict label_id -> Liste von message_ids
+    :param archivieren: INBOX entfernen (sonst wird nur das Label gesetzt)
+    :return: fehler label_id -> Exception (leer, wenn alles verschoben wurde)
+    """
+    fehler: dict[str, Exception] = {}
+    for label_id, message_ids in verschiebungen.items():
+        message_ids = list(dict.fromkeys(message_ids))
+        for i in range(0, len(message_ids), BATCH_MODIFY_GROESSE):
+            gmail_quota.erwerbe(QUOTA_BATCH_MODIFY)
+            zaehle_gmail_anfrage(QUOTA_BATCH_MODIFY)
+            try:
+                with metriken.messe("gmail_batch_modify"):
+                    mit_backoff(service.users().messages().batchModify(
+                        userId='me',
+                        body={
+                            'ids': message_ids[i:i + BATCH_MODIFY_GROESSE],
+                            'addLabelIds': [label_id],
+                            'removeLabelIds': ['INBOX'] if archivieren else []
+                        }
+                    ).execute)
+            except Exception as e:
+                logging.warning(f"batchModify für Label '{label_id}' fehlgeschlagen "
+                                f"({len(message_ids[i:i + BATCH_MODIFY_GROESSE])} E-Mails): {e}")
+                fehler[label_id] = e
+    return fehler
+
+
 def get_all_labels(service) -> dict[str, str]:
     """Gibt alle Labels als Dict (id->name) zurück."""
-    labels = service.users().labels().list(userId='me').execute()
-    return {label['id']: label['name'] for label in labels['labels']}
+    return get_label_registry(service).alle()
 
 
 def get_emails_for_label(service, label_id: str, max_results: int = 100) -> list[dict]:
     """Holt bis zu max_results E-Mails für ein bestimmtes Label."""
-    results = service.users().messages().list(
-        userId='me',
-        labelIds=[label_id],
-        maxResults=max_results
-    ).execute()
+    zaehle_gmail_anfrage(QUOTA_MESSAGES_LIST)
+    with metriken.messe("gmail_messages_list"):
+        results = service.users().messages().list(
+            userId='me',
+            labelIds=[label_id],
+            maxResults=max_results
+        ).execute()
     return results.get('messages', [])
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+KLASSIFIKATIONS_CACHE_DB = os.getenv("KLASSIFIKATIONS_CACHE_DB", "klassifikations_cache.db")
+KLASSIFIKATIONS_CACHE_GROESSE = int(os.getenv("KLASSIFIKATIONS_CACHE_GROESSE", 1024))
+# Standard: 30 Tage
+KLASSIFIKATIONS_CACHE_TTL = int(os.getenv("KLASSIFIKATIONS_CACHE_TTL", 30 * 24 * 3600))
+
+_BODY_PREFIX = 200
+_DATUM = re.compile(r'\b\d{1,4}[./-]\d{1,2}[./-]\d{1,4}\b')
+_ZIFFERN = re.compile(r'\d+(?:[.,]\d+)*')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _maskiere(text: str) -> str:
+    """Ersetzt Datumsangaben und Zahlen durch Platzhalter und normalisiert Whitespace/Groß-/Kleinschreibung."""
+    text = _DATUM.sub('<datum>', text or '')
+    text = _ZIFFERN.sub('#', text)
+    return _WHITESPACE.sub(' ', text).strip().casefold()
+
+
+def fingerprint(subject: str, sender: str, body: str) -> str:
+    """Normalisierter Schlüssel: Absenderadresse, maskierter Betreff und Hash des (maskierten) Body-Anfangs."""
+    match = re.search(r'<([^>]+)>', sender or '')
+    adresse = (match.group(1) if match else sender or '').strip().lower()
+    body_hash = hashlib.sha1(_maskiere((body or '')[:_BODY_PREFIX]).encode('utf-8')).hexdigest()
+    return hashlib.sha1(f"{adresse}\x1f{_maskiere(subject)}\x1f{body_hash}".encode('utf-8')).hexdigest()
+
+
+def kategorien_signatur(kategorien: list[str]) -> str:
+    return hashlib.sha1(json.dumps(sorted(kategorien), ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class KlassifikationsCache:
+    """
+    Zweistufiger Cache für Klassifizierungsergebnisse: LRU im Speicher vor einer SQLite-Datei,
+    die Neustarts übersteht. Einträge laufen nach ttl Sekunden ab. Schlüssel enthalten die Signatur der
+    Kategorienliste: ändert sie sich, gelten die alten Einträge nicht mehr. So können sich mehrere Postfächer
+    (auch aus mehreren Prozessen) eine Datei teilen, ohne sich gegenseitig den Cache zu verwerfen.
+    """
+
+    def __init__(self, pfad: str = KLASSIFIKATIONS_CACHE_DB, max_eintraege: int = KLASSIFIKATIONS_CACHE_GROESSE,
+                 ttl: int = KLASSIFIKATIONS_CACHE_TTL):
+        self._max_eintraege = max_eintraege
+        self._ttl = ttl
+        self._speicher: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        # Wartet auf Schreibsperren anderer Prozesse statt sofort abzubrechen
+        self._conn = sqlite3.connect(pfad, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS cache (schluessel TEXT PRIMARY KEY, ergebnis TEXT, zeit REAL)")
+        self._signatur = ""
+        self.treffer_speicher = 0
+        self.treffer_disk = 0
+        self.fehltreffer = 0
+
+    def pruefe_kategorien(self, kategorien: list[str]) -> None:
+        """Stellt auf die aktuelle Kategorienliste um; Einträge zu anderen Listen werden nicht mehr gefunden."""
+        self._signatur = kategorien_signatur(kategorien)
+
+    def get(self, schluessel: str) -> dict | None:
+        jetzt = time.time()
+        schluessel = f"{self._signatur}:{schluessel}"
+        with self._lock:
+            eintrag = self._speicher.get(schluessel)
+            if eintrag and jetzt - eintrag[0] < self._ttl:
+                self._speicher.move_to_end(schluessel)
+                self.treffer_speicher += 1
+                return dict(eintrag[1])
+            row = self._conn.execute("SELECT ergebnis, zeit FROM cache WHERE schluessel = ?", (schluessel,)).fetchone()
+            if row and jetzt - row[1] < self._ttl:
+                ergebnis = json.loads(row[0])
+                self._merke(schluessel, row[1], ergebnis)
+                self.treffer_disk += 1
+                return dict(ergebnis)
+            self.fehltreffer += 1
+            return None
+
+    def set(self, schluessel: str, ergebnis: dict) -> None:
+        jetzt = time.time()
+        schluessel = f"{self._signatur}:{schluessel}"
+        with self._lock, self._conn:
+            self._merke(schluessel, jetzt, dict(ergebnis))
+            self._conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?)",
+                               (schluessel, json.dumps(ergebnis, ensure_ascii=False), jetzt))
+
+    def _merke(self, schluessel: str, zeit: float, ergebnis: dict) -> None:
+        self._speicher[schluessel] = (zeit, ergebnis)
+        self._speicher.move_to_end(schluessel)
+        while len(self._speicher) > self._max_eintraege:
+            self._speicher.popitem(last=False)
+
+    def bereinige(self) -> None:
+        """Löscht abgelaufene Einträge aus der Datei."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache WHERE zeit < ?", (time.time() - self._ttl,))
+
+    def bericht(self) -> str:
+        treffer = self.treffer_speicher + self.treffer_disk
+        gesamt = treffer + self.fehltreffer
+        quote = treffer / gesamt * 100 if gesamt else 0.0
+        return (f"Klassifikations-Cache: {treffer}/{gesamt} Treffer ({quote:.1f} %; "
+                f"Speicher {self.treffer_speicher}, Disk {self.treffer_disk}), {self.fehltreffer} Fehltreffer.")
@@ -0,0 +1,214 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import lokaler_classifier
+from ai_classify import gemini_limit, GEMINI_ANFRAGEN_PRO_MINUTE
+from gmail_utils import gmail_quota, lade_credentials, GMAIL_QUOTA_PRO_SEKUNDE
+from main import Sitzung
+from metriken import metriken
+
+# ==== Einstellungen ====
+KONTEN_DATEI = os.getenv("KONTEN_DATEI", "konten.json")
+KONTEN_WORKER = int(os.getenv("KONTEN_WORKER", 2))
+KONTEN_BERICHT = os.getenv("KONTEN_BERICHT", "konten_bericht.json")
+
+# Zähler aus metriken, die pro Postfach in die Zusammenfassung übernommen werden
+BERICHT_ZAEHLER = ["emails_verarbeitet", "neue_kategorien", "gmail_api_aufrufe", "gmail_quota_einheiten",
+                   "gemini_anfragen", "gemini_prompt_tokens", "gemini_antwort_tokens", "lokal_treffer"]
+
+
+class Konto:
+    """
+    Ein Postfach: eigenes OAuth-Token, eigene Regeln, Logs und Zustandsdateien (standardmäßig alle im
+    Verzeichnis konten/<name>) sowie eigene Limits für Gmail-Quota, Gemini-Anfragen und E-Mails pro Lauf.
+    """
+
+    FELDER = {"name", "verzeichnis", "token", "regeln", "log", "lauf_log", "max_emails",
+              "gmail_quota_pro_sekunde", "gemini_anfragen_pro_minute"}
+
+    def __init__(self, name: str, verzeichnis: str | None = None, token: str | None = None, regeln: str | None = None,
+                 log: str | None = None, lauf_log: str | None = None, max_emails: int | None = None,
+                 gmail_quota_pro_sekunde: float | None = None, gemini_anfragen_pro_minute: float | None = None):
+        self.name = name
+        self.verzeichnis = verzeichnis or os.path.join("konten", name)
+        self.token = token or self._pfad("token.json")
+        self.regeln = regeln or self._pfad("regeln.json")
+        self.log = log or self._pfad("mail_log.txt")
+        self.lauf_log = lauf_log or self._pfad("lauf.log")
+        self.sync_state = self._pfad("sync_state.json")
+        self.trainings_db = self._pfad("trainingsdaten.db")
+        self.unsubscribe_log = self._pfad("unsubscribe_log.txt")
+        self.lokales_modell = self._pfad("lokaler_classifier.json")
+        self.kalibrierung = self._pfad("lokal_kalibrierung.jsonl")
+        self.metriken = self._pfad("metriken.json")
+        self.max_emails = max_emails
+        # Gmail-Quota gilt pro Nutzer und damit pro Postfach
+        self.gmail_quota_pro_sekunde = gmail_quota_pro_sekunde if gmail_quota_pro_sekunde is not None else GMAIL_QUOTA_PRO_SEKUNDE
+        # None: Anteil am gemeinsamen API-Key, wird vom Runner anhand der Worker-Anzahl gesetzt
+        self.gemini_anfragen_pro_minute = gemini_anfragen_pro_minute
+
+    def _pfad(self, datei: str) -> str:
+        return os.path.join(self.verzeichnis, datei)
+
+    @classmethod
+    def aus_dict(cls, eintrag: dict, basis: str = "") -> "Konto":
+        """Erzeugt ein Konto aus einem Eintrag der Konten-Datei; relative Pfade gelten relativ zu basis."""
+        unbekannt = set(eintrag) - cls.FELDER
+        if unbekannt:
+            raise ValueError(f"❌ Unbekannte Felder für Konto '{eintrag.get('name')}': {', '.join(sorted(unbekannt))}")
+        if not eintrag.get("name"):
+            raise ValueError("❌ Jedes Konto braucht einen Namen.")
+        werte = dict(eintrag)
+        werte.setdefault("verzeichnis", os.path.join("konten", werte["name"]))
+        for feld in ("verzeichnis", "token", "regeln", "log", "lauf_log"):
+            if werte.get(feld):
+                werte[feld] = os.path.join(basis, werte[feld])
+        return cls(**werte)
+
+
+def lade_konten(pfad: str = KONTEN_DATEI) -> tuple[list[Konto], str]:
+    """
+    Liest die Konten-Datei, z. B.:
+    {"credentials": "credentials.json", "konten": [{"name": "mario", "max_emails": 100}, {"name": "team", ...}]}
+    :return: (Konten, Pfad der gemeinsamen OAuth-Client-Datei)
+    """
+    with open(pfad, "r", encoding="utf-8") as f:
+        daten = json.load(f)
+    basis = os.path.dirname(os.path.abspath(pfad))
+    konten = [Konto.aus_dict(eintrag, basis) for eintrag in daten.get("konten", [])]
+    namen = [konto.name for konto in konten]
+    doppelt = {name for name in namen if namen.count(name) > 1}
+    if doppelt:
+        raise ValueError(f"❌ Doppelte Kontonamen: {', '.join(sorted(doppelt))}")
+    return konten, os.path.join(basis, daten.get("credentials", "credentials.json"))
+
+
+def _worker_start() -> None:
+    """
+    Einmal pro Worker-Prozess: gemeinsam genutzte, nur gelesene Ressourcen laden. Das Discovery-Dokument,
+    der Gemini-Classifier (API-Key, Modell nach der ersten Anfrage) und seine Verbindung zum globalen
+    Klassifikations-Cache bleiben für alle Postfächer erhalten, die der Worker nacheinander übernimmt.
+    """
+    from ai_classify import _get_classifier
+    from gmail_utils import _gmail_discovery_dokument
+    _gmail_discovery_dokument()
+    try:
+        _get_classifier()
+    except ValueError as e:
+        # Ohne API-Key arbeiten die Postfächer nur mit Regeln; der Fehler erscheint sonst erst bei Gemini
+        logging.warning(f"Gemini-Classifier im Worker nicht verfügbar: {e}")
+
+
+def verarbeite_konto(konto: Konto, credentials_datei: str = "credentials.json", pipeline: bool = False) -> dict:
+    """
+    Ein Lauf für ein Postfach (im Worker-Prozess) mit den Limits und Dateien des Kontos.
+    Fehler landen im Bericht, statt die übrigen Postfächer abzubrechen.
+    :return: Zusammenfassung des Postfachs
+    """
+    os.makedirs(konto.verzeichnis, exist_ok=True)
+    metriken.zuruecksetzen()
+    gmail_quota.setze_rate(konto.gmail_quota_pro_sekunde)
+    gemini_rpm = konto.gemini_anfragen_pro_minute if konto.gemini_anfragen_pro_minute is not None else GEMINI_ANFRAGEN_PRO_MINUTE
+    gemini_limit.setze_rate(gemini_rpm / 60, kapazitaet=max(1.0, gemini_rpm / 6))
+    # Das lokale Modell lernt aus den Labels dieses Postfachs
+    lokaler_classifier.LOKALER_CLASSIFIER_DATEI = konto.lokales_modell
+    lokaler_classifier.LOKAL_KALIBRIERUNG_DATEI = konto.kalibrierung
+
+    handler = logging.FileHandler(konto.lauf_log, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+    logging.getLogger().addHandler(handler)
+    bericht = {"konto": konto.name, "status": "ok", "emails": 0, "fehler": None}
+    start = time.perf_counter()
+    try:
+        logging.info(f"📮 Postfach '{konto.name}' (Prozess {os.getpid()}).")
+        creds = lade_credentials(konto.token, credentials_datei, interaktiv=False)
+        sitzung = Sitzung(creds, pipeline=pipeline, regeln_datei=konto.regeln, trainings_db=konto.trainings_db,
+                          sync_state_datei=konto.sync_state, unsubscribe_log=konto.unsubscribe_log,
+                          log_datei=konto.log, max_emails=konto.max_emails, metriken_datei=konto.metriken)
+        try:
+            bericht["emails"] = sitzung.lauf()
+        finally:
+            sitzung.beenden()
+    except Exception as e:
+        logging.exception(f"❌ Postfach '{konto.name}' fehlgeschlagen: {e}")
+        bericht.update(status="fehler", fehler=str(e))
+    finally:
+        logging.getLogger().removeHandler(handler)
+        handler.close()
+    bericht["dauer_s"] = round(time.perf_counter() - start, 3)
+    for name in BERICHT_ZAEHLER:
+        bericht[name] = metriken.zaehler(name)
+    bericht["gmail_quota_wartezeit_s"] = round(gmail_quota.wartezeit, 3)
+    bericht["gemini_wartezeit_s"] = round(gemini_limit.wartezeit, 3)
+    return bericht
+
+
+def fuehre_aus(konten: list[Konto], credentials_datei: str = "credentials.json", worker: int = KONTEN_WORKER,
+               pipeline: bool = False) -> list[dict]:
+    """Verteilt die Postfächer auf einen Pool aus worker Prozessen. :return: Berichte in Reihenfolge der Konten"""
+    if not konten:
+        return []
+    worker = max(1, min(worker, len(konten)))
+    # Alle Worker teilen sich einen API-Key: gleichzeitig laufende Postfächer teilen sich dessen Limit
+    anteil = GEMINI_ANFRAGEN_PRO_MINUTE / worker
+    for konto in konten:
+        if konto.gemini_anfragen_pro_minute is None:
+            konto.gemini_anfragen_pro_minute = anteil
+        elif konto.gemini_anfragen_pro_minute > anteil:
+            logging.warning(f"Gemini-Limit von Postfach '{konto.name}' ({konto.gemini_anfragen_pro_minute:g}/min) "
+                            f"auf den Anteil am API-Key begrenzt: {anteil:g}/min.")
+            konto.gemini_anfragen_pro_minute = anteil
+    logging.info(f"{len(konten)} Postfächer auf {worker} Worker-Prozesse verteilt.")
+    berichte: dict[str, dict] = {}
+    with ProcessPoolExecutor(max_workers=worker, initializer=_worker_start) as pool:
+        auftraege = {pool.submit(verarbeite_konto, konto, credentials_datei, pipeline): konto for konto in konten}
+        for auftrag in as_completed(auftraege):
+            konto = auftraege[auftrag]
+            try:
+                berichte[konto.name] = auftrag.result()
+            except Exception as e:
+                # z. B. abgestürzter Worker-Prozess
+                logging.error(f"❌ Worker für Postfach '{konto.name}' abgebrochen: {e}")
+                berichte[konto.name] = {"konto": konto.name, "status": "fehler", "emails": 0, "fehler": str(e)}
+    return [berichte[konto.name] for konto in konten]
+
+
+def bericht_text(berichte: list[dict]) -> str:
+    """Zusammenfassung pro Postfach als Tabelle fürs Log."""
+    zeilen = [f"{'Postfach':<20} {'Status':<7} {'E-Mails':>7} {'Gmail-Quota':>11} {'Gemini':>6} {'Lokal':>5} {'Dauer':>8}"]
+    for b in berichte:
+        zeilen.append(f"{b['konto']:<20} {b['status']:<7} {b.get('emails', 0):>7} {b.get('gmail_quota_einheiten', 0):>11g} "
+                      f"{b.get('gemini_anfragen', 0):>6g} {b.get('lokal_treffer', 0):>5g} {b.get('dauer_s', 0):>7.1f}s")
+        if b.get("fehler"):
+            zeilen.append(f"    ❌ {b['fehler']}")
+    return "\n".join(zeilen)
+
+
+def main(argv=None) -> list[dict]:
+    """Verarbeitet alle Postfächer der Konten-Datei parallel und schreibt eine Zusammenfassung pro Postfach."""
+    parser = argparse.ArgumentParser(description="Mehrere Gmail-Postfächer parallel klassifizieren und labeln.")
+    parser.add_argument("--konten", default=KONTEN_DATEI, help="Konten-Datei (JSON)")
+    parser.add_argument("--worker", type=int, default=KONTEN_WORKER, help="Anzahl Worker-Prozesse")
+    parser.add_argument("--pipeline", action="store_true", help="Pro Postfach den Pipeline-Modus verwenden")
+    parser.add_argument("--bericht", default=KONTEN_BERICHT, help="Zusammenfassung als JSON (leer = aus)")
+    args = parser.parse_args(argv if argv is not None else [])
+
+    konten, credentials_datei = lade_konten(args.konten)
+    berichte = fuehre_aus(konten, credentials_datei, args.worker, args.pipeline)
+    logging.info("Zusammenfassung pro Postfach:\n" + bericht_text(berichte))
+    if args.bericht:
+        tmp_pfad = f"{args.bericht}.tmp"
+        with open(tmp_pfad, "w", encoding="utf-8") as f:
+            json.dump(berichte, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_pfad, args.bericht)
+    return berichte
+
+
+if __name__ == "__main__":
+    berichte = main(sys.argv[1:])
+    sys.exit(0 if all(b["status"] == "ok" for b in berichte) else 1)
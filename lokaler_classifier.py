@@ -0,0 +1,206 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+
+from beispiel_index import absender_domain
+
+LOKALER_CLASSIFIER_AKTIV = os.getenv("LOKALER_CLASSIFIER_AKTIV", "1").lower() not in ("0", "false", "nein", "")
+LOKALER_CLASSIFIER_DATEI = os.getenv("LOKALER_CLASSIFIER_DATEI", "lokaler_classifier.json")
+# Gemini wird nur gefragt, wenn die Wahrscheinlichkeit der besten Klasse darunter liegt
+LOKAL_SCHWELLE = float(os.getenv("LOKAL_SCHWELLE", 0.9))
+# Unterhalb dieser Anzahl Trainingsbeispiele wird das lokale Modell nicht befragt
+LOKAL_MIN_BEISPIELE = int(os.getenv("LOKAL_MIN_BEISPIELE", 20))
+# Lokale Vorhersagen neben den Gemini-Antworten (JSON-Zeilen) zur Kalibrierung der Schwelle; leer = aus
+LOKAL_KALIBRIERUNG_DATEI = os.getenv("LOKAL_KALIBRIERUNG_DATEI", "lokal_kalibrierung.jsonl")
+
+_DIMENSIONEN = 1 << 18
+_BODY_PREFIX = 1000
+_WORT = re.compile(r'[^\W\d_]{2,}|\d+', re.UNICODE)
+_ADRESSE = re.compile(r'[\w.+-]+@[\w.-]+')
+# Gmail-Systemlabels beschreiben Zustand oder Ordner, keine Kategorie
+_SYSTEM_LABELS = {"INBOX", "UNREAD", "STARRED", "IMPORTANT", "SENT", "DRAFT", "SPAM", "TRASH", "CHAT"}
+
+
+def _hash(token: str) -> int:
+    return zlib.crc32(token.encode('utf-8')) % _DIMENSIONEN
+
+
+def merkmale(subject: str, sender: str, body: str) -> Counter:
+    """Gehashte Wörter aus Betreff und Body-Anfang (getrennte Namensräume) plus Absenderadresse und -domain."""
+    features: Counter = Counter()
+    for praefix, text in (("s:", subject), ("b:", (body or '')[:_BODY_PREFIX])):
+        for wort in _WORT.findall((text or '').casefold()):
+            # Zahlen (Rechnungsnummern, Beträge, Daten) tragen keine Kategorie-Information
+            features[_hash(praefix + ("0" if wort.isdigit() else wort))] += 1
+    adresse = _ADRESSE.search((sender or '').lower())
+    if adresse:
+        features[_hash("a:" + adresse.group(0))] += 1
+    domain = absender_domain(sender)
+    if domain:
+        features[_hash("d:" + domain)] += 1
+    return features
+
+
+def ist_systemlabel(label: str | None) -> bool:
+    """True für Gmail-Systemlabels (UNREAD, STARRED, ...) und die Tabs CATEGORY_*."""
+    label = (label or "").upper()
+    return label in _SYSTEM_LABELS or label.startswith("CATEGORY_")
+
+
+def _schluessel(item: dict) -> str:
+    """
+    Beispiele werden über Label und Message-ID wiedererkannt, damit eine E-Mail mit mehreren Labels
+    für jedes zählt (ältere Daten ohne ID über ihren Inhalt).
+    """
+    if item.get("id"):
+        return f"{item.get('label', '')}\x1f{item['id']}"
+    inhalt = "\x1f".join((item.get("label", ""), item.get("subject", ""), item.get("sender", ""), item.get("body", "")[:200]))
+    return hashlib.sha1(inhalt.encode("utf-8")).hexdigest()
+
+
+class LokalerClassifier:
+    """
+    Multinomiales Naive Bayes über gehashte Wort- und Absender-Merkmale, reines Python.
+    Wird inkrementell mit den Trainingsdaten abgeglichen (neue Beispiele hinzu, entfernte wieder abgezogen)
+    und als JSON gespeichert; ein sicheres Ergebnis erspart die Gemini-Anfrage.
+    """
+
+    def __init__(self, pfad: str | None = LOKALER_CLASSIFIER_DATEI, alpha: float = 1.0):
+        self._pfad = pfad
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._beispiele: dict[str, tuple[str, dict[int, int]]] = {}
+        self._dokumente: Counter = Counter()
+        self._zaehler: dict[str, Counter] = {}
+        self._summen: Counter = Counter()
+        self._vokabular: Counter = Counter()
+        if pfad:
+            self._lade()
+
+    def __len__(self) -> int:
+        return len(self._beispiele)
+
+    def _lade(self) -> None:
+        try:
+            with open(self._pfad, "r", encoding="utf-8") as f:
+                daten = json.load(f)
+        except FileNotFoundError:
+            return
+        except (json.JSONDecodeError, OSError) as e:
+            logging.warning(f"Lokales Modell '{self._pfad}' unlesbar, wird neu trainiert: {e}")
+            return
+        for schluessel, (label, features) in daten.get("beispiele", {}).items():
+            if ist_systemlabel(label):
+                continue
+            self._addiere(schluessel, label, {int(h): n for h, n in features.items()})
+
+    def speichere(self) -> None:
+        if not self._pfad:
+            return
+        with self._lock:
+            daten = {"version": 1, "beispiele": {k: [label, features] for k, (label, features) in self._beispiele.items()}}
+        tmp_pfad = f"{self._pfad}.tmp"
+        with open(tmp_pfad, "w", encoding="utf-8") as f:
+            json.dump(daten, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_pfad, self._pfad)
+
+    def _addiere(self, schluessel: str, label: str, features: dict[int, int]) -> None:
+        self._beispiele[schluessel] = (label, features)
+        self._dokumente[label] += 1
+        zaehler = self._zaehler.setdefault(label, Counter())
+        for h, n in features.items():
+            zaehler[h] += n
+            self._summen[label] += n
+            self._vokabular[h] += n
+
+    def _entferne(self, schluessel: str) -> None:
+        label, features = self._beispiele.pop(schluessel)
+        self._dokumente[label] -= 1
+        zaehler = self._zaehler[label]
+        for h, n in features.items():
+            zaehler[h] -= n
+            if zaehler[h] <= 0:
+                del zaehler[h]
+            self._summen[label] -= n
+            self._vokabular[h] -= n
+            if self._vokabular[h] <= 0:
+                del self._vokabular[h]
+        if self._dokumente[label] <= 0:
+            del self._dokumente[label], self._zaehler[label], self._summen[label]
+
+    def trainiere(self, trainingsdaten: list[dict]) -> bool:
+        """
+        Gleicht das Modell mit den Trainingsdaten ab: nur neue Beispiele werden hinzugerechnet, nicht mehr
+        vorhandene (oder umgelabelte) abgezogen; Systemlabels werden nicht gelernt.
+        :return: True, wenn sich das Modell geändert hat
+        """
+        aktuell = {_schluessel(item): item for item in trainingsdaten if not ist_systemlabel(item.get("label"))}
+        with self._lock:
+            veraltet = [k for k, (label, _) in self._beispiele.items()
+                        if k not in aktuell or aktuell[k].get("label") != label]
+            for schluessel in veraltet:
+                self._entferne(schluessel)
+            neu = [k for k in aktuell if k not in self._beispiele]
+            for schluessel in neu:
+                item = aktuell[schluessel]
+                features = merkmale(item.get("subject", ""), item.get("sender", ""), item.get("body", ""))
+                self._addiere(schluessel, item["label"], dict(features))
+        if neu or veraltet:
+            logging.info(f"Lokales Modell: {len(neu)} Beispiele gelernt, {len(veraltet)} entfernt "
+                         f"({len(self._beispiele)} gesamt, {len(self._dokumente)} Labels).")
+        return bool(neu or veraltet)
+
+    def wahrscheinlichkeiten(self, subject: str, sender: str, body: str) -> dict[str, float]:
+        """A-posteriori-Wahrscheinlichkeit pro Label (leer, wenn das Modell zu wenig gelernt hat)."""
+        features = merkmale(subject, sender, body)
+        with self._lock:
+            gesamt = sum(self._dokumente.values())
+            if gesamt < LOKAL_MIN_BEISPIELE or len(self._dokumente) < 2:
+                return {}
+            vokabular = max(1, len(self._vokabular))
+            log_werte = {}
+            for label, anzahl in self._dokumente.items():
+                zaehler = self._zaehler[label]
+                nenner = math.log(self._summen[label] + self.alpha * vokabular)
+                wert = math.log(anzahl / gesamt)
+                for h, n in features.items():
+                    # Merkmale, die in keinem Beispiel vorkamen, verschieben nichts
+                    if h in self._vokabular:
+                        wert += n * (math.log(zaehler.get(h, 0) + self.alpha) - nenner)
+                log_werte[label] = wert
+        maximum = max(log_werte.values())
+        exp_werte = {label: math.exp(wert - maximum) for label, wert in log_werte.items()}
+        summe = sum(exp_werte.values())
+        return {label: wert / summe for label, wert in exp_werte.items()}
+
+    def vorhersage(self, subject: str, sender: str, body: str) -> tuple[str, float] | None:
+        """Wahrscheinlichstes Label samt Wahrscheinlichkeit oder None."""
+        wahrscheinlichkeiten = self.wahrscheinlichkeiten(subject, sender, body)
+        if not wahrscheinlichkeiten:
+            return None
+        return max(wahrscheinlichkeiten.items(), key=lambda eintrag: eintrag[1])
+
+
+_kalibrierung_lock = threading.Lock()
+
+
+def protokolliere_kalibrierung(lokal: str | None, wahrscheinlichkeit: float, gemini: str | None,
+                               pfad: str | None = None) -> None:
+    """Hängt lokale Vorhersage, ihre Wahrscheinlichkeit und die Gemini-Kategorie an die Kalibrierungsdatei an."""
+    pfad = LOKAL_KALIBRIERUNG_DATEI if pfad is None else pfad
+    if not pfad:
+        return
+    zeile = json.dumps({"lokal": lokal, "wahrscheinlichkeit": round(wahrscheinlichkeit, 4), "gemini": gemini,
+                        "uebereinstimmung": lokal is not None and lokal == gemini}, ensure_ascii=False)
+    with _kalibrierung_lock:
+        try:
+            with open(pfad, "a", encoding="utf-8") as f:
+                f.write(zeile + "\n")
+        except OSError as e:
+            logging.warning(f"Kalibrierungsprotokoll '{pfad}' nicht beschreibbar: {e}")
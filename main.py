@@ -1,15 +1,21 @@
-import json
-import base64
-import email
-import datetime
-import requests
 import logging
 import os
+import sys
+import argparse
+import threading
 from dotenv import load_dotenv
-from gmail_utils import get_gmail_service, get_or_create_label, move_email_to_label, get_all_labels, get_emails_for_label
-from ai_classify import classify_email
-from utils import get_email_body, extract_list_unsubscribe, abmelden_via_list_unsubscribe, log_unsubscribe_link, logge_neue_kategorie
-from rules_utils import lade_regeln, speichere_regeln
+from gmail_utils import get_gmail_service, lade_credentials, get_or_create_label, move_email_to_label, move_emails_to_labels, get_all_labels, batch_get_metadata, batch_get_full, get_label_registry, BATCH_GROESSE, BATCH_MODIFY_GROESSE
+from ai_classify import classify_email, classify_emails_batch, classifier_bericht, GEMINI_BATCH_GROESSE
+from utils import get_email_body, extract_list_unsubscribe, extract_header, abmelden_via_list_unsubscribe, log_unsubscribe_link, logge_neue_kategorie
+from rules_utils import RulesStore
+from training_store import TrainingsStore, TRAININGS_DB
+from regel_engine import RegelEngine
+from sync_state import SyncState, hole_neue_nachrichten, SYNC_STATE_DATEI
+from pipeline import Pipeline, Stufe
+from text_normalisierung import normalisiere_email
+from unsubscribe import AbmeldeExecutor
+from metriken import metriken, gemessen
+from lokaler_classifier import ist_systemlabel
 
 # ==== Einstellungen ====
 load_dotenv()
@@ -17,124 +23,388 @@ REGELN_DATEI = os.getenv("REGELN_DATEI", "regeln.json")
 LOG_DATEI = os.getenv("LOG_DATEI", "mail_log.txt")
 MAX_EMAILS = int(os.getenv("MAX_EMAILS", 50))
 UNSUBSCRIBE_LOG = os.getenv("UNSUBSCRIBE_LOG", "unsubscribe_log.txt")
-
+PIPELINE_LADE_WORKER = int(os.getenv("PIPELINE_LADE_WORKER", 4))
+PIPELINE_PARSE_WORKER = int(os.getenv("PIPELINE_PARSE_WORKER", 1))
+PIPELINE_KLASSIFIZIER_WORKER = int(os.getenv("PIPELINE_KLASSIFIZIER_WORKER", 4))
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 
 
 def hole_gmail_labels(service):
     """Holt alle Gmail-Labels als Liste (kleingeschrieben)."""
-    label_response = service.users().labels().list(userId='me').execute()
-    return [label['name'].lower() for label in label_response.get('labels', [])]
+    return get_label_registry(service).namen()
+
+
+def hole_ungelesene_emails(service, sync_state, max_emails=None):
+    """Holt neue ungelesene E-Mails aus der INBOX (max. max_emails bzw. MAX_EMAILS) samt zu speichernder historyId."""
+    return hole_neue_nachrichten(service, sync_state, max_emails=max_emails or MAX_EMAILS)
 
 
-def hole_ungelesene_emails(service):
-    """Holt ungelesene E-Mails aus der INBOX (max. MAX_EMAILS)."""
-    results = service.users().messages().list(
-        userId='me',
-        labelIds=['INBOX'],
-        q="is:unread"
-    ).execute()
-    return results.get('messages', [])[:MAX_EMAILS]
+def lese_email(full_msg):
+    """Liest ID, Betreff, Absender und (normalisierten) Body aus einer geladenen E-Mail."""
+    headers = full_msg['payload']['headers']
+    return {
+        "id": full_msg.get('id'),
+        "subject": next((h['value'] for h in headers if h['name'] == 'Subject'), '(Kein Betreff)'),
+        "sender": next((h['value'] for h in headers if h['name'] == 'From'), ''),
+        # Für den Prompt aufbereitet: Text statt HTML, ohne Zitate/Fußzeilen, auf Token-Budget gekürzt
+        "body": normalisiere_email(full_msg.get('id'), get_email_body(full_msg)),
+    }
 
 
-def verarbeite_email(msg, service, regeln, gmail_labels, trainingsdaten=None):
-    """Verarbeitet eine einzelne E-Mail: Klassifizierung, Label, ggf. neue Regel, Verschieben, Abmelden."""
+def verarbeite_email(msg, service, rules_store, gmail_labels, trainingsdaten=None, full_msg=None, verschiebungen=None, regel_engine=None, result=None, abmelde_executor=None, log_datei=None):
+    """
+    Verarbeitet eine einzelne E-Mail: Klassifizierung, Label, ggf. neue Regel, Verschieben, Abmelden.
+    Eindeutige Keyword-Treffer der regel_engine werden ohne Gemini entschieden; ein bereits
+    (per Batch) ermitteltes result überspringt die Klassifizierung.
+    Ist full_msg bereits (per Batch) geladen, entfällt der Einzelabruf. Wird ein Dict verschiebungen
+    (label_id -> message_ids) übergeben, wird die E-Mail nur vorgemerkt und später gesammelt verschoben.
+    Mit abmelde_executor laufen Newsletter-Abmeldungen im Hintergrund statt blockierend.
+    Neue Kategorien landen im rules_store und werden erst beim flush() gesammelt gespeichert und in
+    log_datei (Standard LOG_DATEI) protokolliert.
+    :return: False, wenn die Klassifizierung fehlschlug (Gemini nicht erreichbar) und die E-Mail später
+             erneut versucht werden muss; True sonst (auch wenn keine Kategorie passt)
+    """
     msg_id = msg['id']
-    full_msg = service.users().messages().get(userId='me', id=msg_id, format='full').execute()
+    if full_msg is None:
+        full_msg = service.users().messages().get(userId='me', id=msg_id, format='full').execute()
     headers = full_msg['payload']['headers']
-    subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '(Kein Betreff)')
-    sender = next((h['value'] for h in headers if h['name'] == 'From'), '')
-    body = get_email_body(full_msg)
+    mail = lese_email(full_msg)
+    subject, sender, body = mail["subject"], mail["sender"], mail["body"]
 
-    # ==== KI-Kategorisierung & Newsletter-Check ====
-    result = classify_email(subject, sender, body, regeln, gmail_labels, trainingsdaten)
+    # ==== Keyword-Regeln als Schnellpfad, sonst KI-Kategorisierung & Newsletter-Check ====
+    with metriken.messe("email_klassifizieren"):
+        if result is None and regel_engine:
+            result = regel_engine.klassifiziere(subject, sender, body)
+        if result is None:
+            result = classify_email(subject, sender, body, rules_store.regeln, gmail_labels, trainingsdaten)
     kategorie = result.get("kategorie")
     ist_newsletter = result.get("ist_newsletter", False)
     ist_unbezahlt = result.get("ist_unbezahlt", False)
     unsubscribe_url = result.get("unsubscribe_url")
 
-    # Dynamische Kategorien aus Regeln
-    kategorien_regeln = list(regeln.keys())
-    kategorien_normalisiert = [k.lower().strip() for k in kategorien_regeln]
     if not kategorie:
+        if result.get("fehler"):
+            logging.warning(f"Klassifizierung fehlgeschlagen, wird erneut versucht: {subject}")
+            metriken.zaehle("emails_klassifizierung_fehlgeschlagen")
+            return False
         logging.warning(f"Keine Kategorie erkannt für: {subject}")
-        return
-    if kategorie.lower().strip() not in kategorien_normalisiert:
-        # Neue Kategorie automatisch als Regel anlegen
-        labelname = kategorie.capitalize()
-        regeln[kategorie] = {
-            "keywords": [],
-            "label": labelname
-        }
-        speichere_regeln(regeln, REGELN_DATEI)
-        logge_neue_kategorie(kategorie, labelname, LOG_DATEI)
-        logging.info(f"Neue Kategorie '{kategorie}' wurde zu den Regeln hinzugefügt.")
+        metriken.zaehle("emails_ohne_kategorie")
+        return True
 
-    # ==== Regel prüfen oder neu anlegen ====
-    if kategorie not in regeln:
-        labelname = kategorie.capitalize()
-        regeln[kategorie] = {
-            "keywords": [],
-            "label": labelname
-        }
-        speichere_regeln(regeln, REGELN_DATEI)
-        logge_neue_kategorie(kategorie, labelname, LOG_DATEI)
+    # ==== Regel nachschlagen oder neue Kategorie anlegen (threadsicher, Schreiben gesammelt im RulesStore) ====
+    kategorie, labelname, neu = rules_store.stelle_sicher(kategorie)
+    if neu:
+        metriken.zaehle("neue_kategorien")
+        logge_neue_kategorie(kategorie, labelname, log_datei or LOG_DATEI)
+        logging.info(f"Neue Kategorie '{kategorie}' wurde zu den Regeln hinzugefügt.")
 
-    # ==== Gmail Label ID holen oder erstellen ====
-    label_id = get_or_create_label(service, regeln[kategorie]["label"])
+    with metriken.messe("email_label"):
+        # ==== Gmail Label ID holen oder erstellen ====
+        label_id = get_or_create_label(service, labelname)
 
-    # ==== E-Mail verschieben ====
-    move_email_to_label(service, msg_id, label_id)
-    logging.info(f"E-Mail '{subject}' wurde als '{kategorie}' klassifiziert und verschoben.")
+        # ==== E-Mail verschieben (sofort oder gesammelt per batchModify) ====
+        if verschiebungen is None:
+            move_email_to_label(service, msg_id, label_id)
+            logging.info(f"E-Mail '{subject}' wurde als '{kategorie}' klassifiziert und verschoben.")
+        else:
+            verschiebungen.setdefault(label_id, []).append(msg_id)
+            logging.info(f"E-Mail '{subject}' wurde als '{kategorie}' klassifiziert und zum Verschieben vorgemerkt.")
+    metriken.zaehle("emails_verarbeitet")
 
     # ==== Automatische Newsletter-Abmeldung über List-Unsubscribe-Header ====
     list_unsubscribe = extract_list_unsubscribe(headers)
     if ist_newsletter and ist_unbezahlt and list_unsubscribe:
-        abmelden_via_list_unsubscribe(list_unsubscribe, subject, lambda s, u: log_unsubscribe_link(s, u, UNSUBSCRIBE_LOG))
-
-
-def sammle_label_trainingsdaten(service, max_emails_per_label=50):
-    """Durchsucht alle Labels und sammelt Betreff, Absender, Body der enthaltenen E-Mails als Trainingsdaten."""
-    label_dict = get_all_labels(service)
-    trainingsdaten = []
-    for label_id, label_name in label_dict.items():
-        if label_name.lower() in ["inbox", "spam", "papierkorb", "trash", "sent", "gesendet"]:
-            continue  # Systemordner überspringen
-        messages = get_emails_for_label(service, label_id, max_results=max_emails_per_label)
-        for msg in messages:
-            msg_id = msg['id']
-            try:
-                full_msg = service.users().messages().get(userId='me', id=msg_id, format='full').execute()
-                headers = full_msg['payload']['headers']
-                subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '(Kein Betreff)')
-                sender = next((h['value'] for h in headers if h['name'] == 'From'), '')
-                body = get_email_body(full_msg)
-                trainingsdaten.append({
-                    "label": label_name,
-                    "subject": subject,
-                    "sender": sender,
-                    "body": body
-                })
-            except Exception as e:
-                logging.warning(f"Fehler beim Einlesen einer E-Mail aus Label '{label_name}': {e}")
-    logging.info(f"Trainingsdaten aus {len(label_dict)} Labels gesammelt. Gesamt: {len(trainingsdaten)} E-Mails.")
+        metriken.zaehle("abmeldungen")
+        if abmelde_executor is None:
+            abmelden_via_list_unsubscribe(list_unsubscribe, subject, lambda s, u: log_unsubscribe_link(s, u, UNSUBSCRIBE_LOG))
+        else:
+            abmelde_executor.abmelden(list_unsubscribe, subject, sender, extract_header(headers, 'List-Unsubscribe-Post'))
+    return True
+
+
+@gemessen("trainingsdaten")
+def sammle_label_trainingsdaten(service, max_emails_per_label=50, store=None):
+    """
+    Gleicht die Inhalte aller Labels mit dem lokalen Trainingsspeicher ab (nur neue E-Mails werden geladen)
+    und gibt Betreff, Absender, Body der enthaltenen E-Mails als Trainingsdaten zurück.
+    """
+    label_dict = {
+        label_id: label_name
+        for label_id, label_name in get_all_labels(service).items()
+        # Systemordner und -labels (UNREAD, STARRED, CATEGORY_*) überspringen
+        if label_name.lower() not in ["inbox", "spam", "papierkorb", "trash", "sent", "gesendet"]
+        and not ist_systemlabel(label_id)
+    }
+    if store is None:
+        store = TrainingsStore(TRAININGS_DB)
+    try:
+        store.synchronisiere(service, label_dict, max_pro_label=max_emails_per_label)
+    except Exception as e:
+        logging.warning(f"Abgleich der Trainingsdaten fehlgeschlagen, verwende lokalen Stand: {e}")
+    trainingsdaten = store.lade()
+    logging.info(f"Trainingsdaten aus {len(label_dict)} Labels geladen. Gesamt: {len(trainingsdaten)} E-Mails.")
     return trainingsdaten
 
 
-def main():
-    """Hauptfunktion: Lerne aus bestehenden Label-Inhalten, dann verarbeite neue ungelesene E-Mails."""
-    regeln = lade_regeln(REGELN_DATEI)
-    service = get_gmail_service()
-    gmail_labels = hole_gmail_labels(service)
-    # Schritt 1: Bestehende Label-Inhalte einlesen und als Trainingsdaten sammeln
-    trainingsdaten = sammle_label_trainingsdaten(service, max_emails_per_label=50)
-    # Schritt 2: Neue ungelesene E-Mails wie bisher verarbeiten
-    messages = hole_ungelesene_emails(service)
-    logging.info(f"📬 {len(messages)} neue ungelesene E-Mails gefunden.")
+def hole_emails(service, messages, regel_engine):
+    """
+    Lädt E-Mails sparsam: zuerst nur Metadaten (Betreff, Absender, List-Unsubscribe, Snippet). Der Body wird
+    nur für E-Mails nachgeladen, die die Keyword-Regeln anhand der Header nicht eindeutig zuordnen.
+    :return: (Liste von (msg, full_msg, mail|None, result|None), IDs deren Abruf endgültig fehlschlug);
+             mail ist None, wenn der geladene Body noch geparst werden muss (siehe parse_email)
+    """
+    with metriken.messe("laden_metadaten"):
+        metadaten = batch_get_metadata(service, [msg['id'] for msg in messages])
+    geladen = []
+    fehlend = []
+    body_noetig = []
     for msg in messages:
-        verarbeite_email(msg, service, regeln, gmail_labels, trainingsdaten)
+        meta = metadaten.get(msg['id'])
+        if meta is None:
+            fehlend.append(msg['id'])
+            continue
+        if not ist_ungelesen_in_inbox(meta):
+            continue  # inzwischen gelesen oder verschoben
+        mail = lese_email(meta)
+        mail["id"] = msg['id']
+        result = regel_engine.klassifiziere(mail["subject"], mail["sender"], meta.get('snippet', ''), vorlaeufig=True)
+        if result is None:
+            body_noetig.append(msg)
+        else:
+            geladen.append((msg, meta, mail, result))
+
+    with metriken.messe("laden_body"):
+        full_msgs = batch_get_full(service, [msg['id'] for msg in body_noetig]) if body_noetig else {}
+    metriken.zaehle("emails_body_geladen", len(body_noetig))
+    for msg in body_noetig:
+        full_msg = full_msgs.get(msg['id'])
+        if full_msg is None:
+            fehlend.append(msg['id'])
+            continue
+        geladen.append((msg, full_msg, None, None))
+    return geladen, fehlend
+
+
+def parse_email(item, regel_engine):
+    """Dekodiert und normalisiert den Body einer vollständig geladenen E-Mail und wendet die Keyword-Regeln an."""
+    msg, full_msg, mail, result = item
+    if mail is None:
+        with metriken.messe("parsen"):
+            mail = lese_email(full_msg)
+        mail["id"] = msg['id']
+        result = regel_engine.klassifiziere(mail["subject"], mail["sender"], mail["body"])
+    return msg, full_msg, mail, result
+
+
+def lade_emails(service, messages, regel_engine):
+    """
+    Laden und Parsen in einem Schritt (serieller Ablauf).
+    :return: (Liste von (msg, full_msg, mail, result|None), IDs deren Abruf endgültig fehlschlug)
+    """
+    geladen, fehlend = hole_emails(service, messages, regel_engine)
+    return [parse_email(item, regel_engine) for item in geladen], fehlend
+
+
+def klassifiziere_serien(service, messages, rules_store, gmail_labels, trainingsdaten, regel_engine, abmelde_executor=None, log_datei=None):
+    """
+    Serieller Ablauf: E-Mails per Batch laden (Metadaten zuerst), Keyword-Regeln zuerst, übrige E-Mails
+    gesammelt per Batch an Gemini, Verschiebungen am Ende per batchModify.
+    :return: True, wenn alle E-Mails geladen, klassifiziert und verschoben werden konnten
+    """
+    geladen, fehlend = lade_emails(service, messages, regel_engine)
+    fuer_gemini = [mail for _, _, mail, result in geladen if result is None]
+    with metriken.messe("gemini_batch"):
+        ergebnisse = classify_emails_batch(fuer_gemini, rules_store.regeln, gmail_labels, trainingsdaten) if fuer_gemini else {}
+
+    verschiebungen = {}
+    for msg, full_msg, mail, result in geladen:
+        if not verarbeite_email(msg, service, rules_store, gmail_labels, trainingsdaten, full_msg=full_msg,
+                                verschiebungen=verschiebungen, result=result or ergebnisse.get(msg['id']),
+                                abmelde_executor=abmelde_executor, log_datei=log_datei):
+            fehlend.append(msg['id'])
+    nicht_verschoben = move_emails_to_labels(service, verschiebungen)
+    # Bei fehlgeschlagenem Abruf, Klassifizieren oder Verschieben Stand nicht fortschreiben,
+    # damit die E-Mails erneut gefunden werden
+    return not fehlend and not nicht_verschoben
+
+
+def ist_ungelesen_in_inbox(full_msg):
+    label_ids = full_msg.get('labelIds', ['INBOX', 'UNREAD'])
+    return 'INBOX' in label_ids and 'UNREAD' in label_ids
+
+
+def klassifiziere_pipeline(service, service_factory, messages, rules_store, gmail_labels, trainingsdaten, regel_engine, abmelde_executor=None, log_datei=None):
+    """
+    Pipeline-Modus: Laden, Parsen, Klassifizieren und Label setzen laufen als eigene Stufen mit begrenzten
+    Queues; E/A-lastige Stufen haben Worker-Pools, Abmeldungen laufen im abmelde_executor.
+    Gmail-Quota und Gemini-Anfragen werden über Token-Buckets begrenzt (siehe gmail_utils.gmail_quota,
+    ai_classify.gemini_limit).
+    :return: True, wenn alle E-Mails fehlerfrei verarbeitet wurden
+    """
+    thread_services = threading.local()
+    fehlend = []
+
+    def laden(msgs, emit):
+        # Gmail-Service-Objekte sind nicht threadsicher -> einer pro Worker-Thread
+        if not hasattr(thread_services, "service"):
+            thread_services.service = service_factory()
+        geladen, nicht_geladen = hole_emails(thread_services.service, msgs, regel_engine)
+        fehlend.extend(nicht_geladen)
+        for item in geladen:
+            emit(item)
+
+    def parsen(items, emit):
+        for item in items:
+            emit(parse_email(item, regel_engine))
+
+    def klassifizieren(items, emit):
+        fuer_gemini = [mail for _, _, mail, result in items if result is None]
+        with metriken.messe("gemini_batch"):
+            ergebnisse = classify_emails_batch(fuer_gemini, rules_store.regeln, gmail_labels, trainingsdaten) if fuer_gemini else {}
+        for msg, full_msg, mail, result in items:
+            emit((msg, full_msg, result or ergebnisse.get(msg['id'])))
+
+    def label_setzen(items, emit):
+        verschiebungen = {}
+        for msg, full_msg, result in items:
+            if not verarbeite_email(msg, service, rules_store, gmail_labels, trainingsdaten, full_msg=full_msg,
+                                    verschiebungen=verschiebungen, result=result, abmelde_executor=abmelde_executor,
+                                    log_datei=log_datei):
+                fehlend.append(msg['id'])
+        for label_id in move_emails_to_labels(service, verschiebungen):
+            fehlend.extend(verschiebungen[label_id])
+
+    pipeline = Pipeline([
+        Stufe("laden", laden, worker=PIPELINE_LADE_WORKER, batch_groesse=BATCH_GROESSE),
+        # Body dekodieren, HTML -> Text, normalisieren: CPU-lastig, mehr Threads helfen wegen des GIL nicht
+        Stufe("parsen", parsen, worker=PIPELINE_PARSE_WORKER, batch_groesse=BATCH_GROESSE),
+        Stufe("klassifizieren", klassifizieren, worker=PIPELINE_KLASSIFIZIER_WORKER, batch_groesse=GEMINI_BATCH_GROESSE),
+        # Verschiebungen sammeln, damit batchModify möglichst viele IDs auf einmal bekommt
+        Stufe("label", label_setzen, batch_groesse=BATCH_MODIFY_GROESSE, batch_wartezeit=0.5),
+    ])
+    pipeline.ausfuehren(messages)
+    logging.info(pipeline.bericht())
+    return not fehlend and pipeline.fehler == 0
+
+
+class Sitzung:
+    """
+    Zustand für die Verarbeitung: Gmail-Service, Regeln, Keyword-Engine, Trainingsdaten, Sync-Stand und
+    Abmelde-Executor. Einmal aufgebaut; im Daemon-Modus bleibt alles zwischen den Abrufen im Speicher.
+    Die Dateipfade sind pro Postfach überschreibbar (siehe konten.py), sonst gelten die Einstellungen oben.
+    """
+
+    def __init__(self, creds, pipeline: bool = False, regeln_datei: str | None = None, trainings_db: str | None = None,
+                 sync_state_datei: str | None = None, unsubscribe_log: str | None = None, log_datei: str | None = None,
+                 max_emails: int | None = None, metriken_datei: str | None = None):
+        self.creds = creds
+        self.pipeline = pipeline
+        self.log_datei = log_datei or LOG_DATEI
+        self.max_emails = max_emails or MAX_EMAILS
+        self.metriken_datei = metriken_datei
+        self.service = get_gmail_service(creds)
+        self.rules_store = RulesStore(regeln_datei or REGELN_DATEI)
+        self.regel_engine = RegelEngine(self.rules_store.regeln)
+        self.trainings_store = TrainingsStore(trainings_db or TRAININGS_DB)
+        self.trainingsdaten: list[dict] = []
+        self.sync_state = SyncState(sync_state_datei or SYNC_STATE_DATEI)
+        self.abmelde_executor = AbmeldeExecutor(unsubscribe_log or UNSUBSCRIBE_LOG)
+
+    def neuer_service(self):
+        """Eigener Service für weitere Threads (Service-Objekte sind nicht threadsicher)."""
+        return get_gmail_service(self.creds)
+
+    def lerne(self, service=None) -> list[dict]:
+        """Bestehende Label-Inhalte einlesen und als Trainingsdaten übernehmen."""
+        self.trainingsdaten = sammle_label_trainingsdaten(service or self.service, max_emails_per_label=50,
+                                                          store=self.trainings_store)
+        return self.trainingsdaten
+
+    def aktualisiere_regeln(self) -> None:
+        """Übernimmt extern geänderte Regeln (Hot Reload) samt neu kompilierter Keyword-Engine."""
+        if self.rules_store.aktualisiere():
+            self.regel_engine = RegelEngine(self.rules_store.regeln)
+
+    def hole_neue(self) -> tuple[list[dict], str | None]:
+        """Günstige Abfrage neuer ungelesener E-Mails (historyId bzw. Voll-Scan) samt neuer historyId."""
+        messages, neue_history_id = hole_ungelesene_emails(self.service, self.sync_state, self.max_emails)
+        logging.info(f"📬 {len(messages)} neue ungelesene E-Mails gefunden.")
+        return messages, neue_history_id
+
+    def verarbeite(self, messages: list[dict], neue_history_id: str | None) -> int:
+        """Verarbeitet die abgefragten E-Mails und schreibt den Sync-Stand fort. Gibt deren Anzahl zurück."""
+        vollstaendig = True
+        trainingsdaten = self.trainingsdaten
+        gmail_labels = hole_gmail_labels(self.service) if messages else []
+        # Keyword-Regeln zuerst, alle übrigen E-Mails gesammelt per Batch an Gemini
+        if messages and self.pipeline:
+            vollstaendig = klassifiziere_pipeline(self.service, self.neuer_service, messages, self.rules_store,
+                                                  gmail_labels, trainingsdaten, self.regel_engine, self.abmelde_executor,
+                                                  self.log_datei)
+        elif messages:
+            vollstaendig = klassifiziere_serien(self.service, messages, self.rules_store, gmail_labels, trainingsdaten,
+                                                self.regel_engine, self.abmelde_executor, self.log_datei)
+        if vollstaendig:
+            self.sync_state.speichere(neue_history_id)
+        else:
+            # historyId nicht fortschreiben: der nächste Abruf liefert dieselben E-Mails erneut
+            # (bereits verschobene fallen dort über ist_ungelesen_in_inbox heraus)
+            logging.warning("Nicht alle E-Mails verarbeitet – Sync-Stand bleibt stehen, nächster Lauf versucht sie erneut.")
+        self.rules_store.flush()
+        return len(messages)
+
+    def lauf(self) -> int:
+        """Einzelner Lauf (Cron): neue E-Mails abfragen, nur dann Trainingsdaten abgleichen, verarbeiten."""
+        messages, neue_history_id = self.hole_neue()
+        # Ohne neue E-Mails weder Trainingsdaten abgleichen noch Gemini laden (typischer Cron-Lauf)
+        if messages:
+            self.lerne()
+        return self.verarbeite(messages, neue_history_id)
+
+    def verarbeite_neue(self) -> int:
+        """Neue ungelesene E-Mails abrufen und verarbeiten. Gibt die Anzahl gefundener E-Mails zurück."""
+        return self.verarbeite(*self.hole_neue())
+
+    def beenden(self) -> None:
+        """Offene Abmeldungen abwarten, neue Kategorien speichern und Berichte ausgeben."""
+        try:
+            self.abmelde_executor.beenden()
+        finally:
+            self.rules_store.flush()
+            self.trainings_store.close()
+        logging.info(self.regel_engine.bericht())
+        logging.info(self.abmelde_executor.bericht())
+        cache_bericht = classifier_bericht()
+        if cache_bericht:
+            logging.info(cache_bericht)
+        # Laufzusammenfassung (Zeiten pro Stufe, Gmail-Quota, Gemini-Anfragen und Tokens)
+        if self.metriken_datei:
+            # Pro Postfach nur JSON; das Prometheus-Textfile gehört zum Einzelbetrieb
+            metriken.schreibe(self.metriken_datei, None)
+        else:
+            metriken.schreibe()
+
+
+def main(argv=None):
+    """Hauptfunktion: Lerne aus bestehenden Label-Inhalten, dann verarbeite neue ungelesene E-Mails."""
+    parser = argparse.ArgumentParser(description="Gmail-E-Mails mit Gemini AI klassifizieren und labeln.")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Laden, Klassifizieren, Labeln und Abmelden nebenläufig in Stufen ausführen")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Dauerhaft laufen und in adaptiven Abständen nach neuen E-Mails sehen")
+    args = parser.parse_args(argv if argv is not None else [])
+
+    sitzung = Sitzung(lade_credentials(), pipeline=args.pipeline)
+    if args.daemon:
+        from daemon import Daemon
+        Daemon(sitzung).ausfuehren()
+        return
+    try:
+        sitzung.lauf()
+    finally:
+        sitzung.beenden()
 
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])
@@ -0,0 +1,175 @@
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Messung abschaltbar; ausgeschaltet kosten Zähler und Timer nur eine Attributabfrage
+METRIKEN_AKTIV = os.getenv("METRIKEN_AKTIV", "1").lower() not in ("0", "false", "nein", "")
+METRIKEN_DATEI = os.getenv("METRIKEN_DATEI", "metriken.json")
+# Optional: Textfile für den node_exporter (textfile collector), z. B. /var/lib/node_exporter/mail_ai.prom
+METRIKEN_PROMETHEUS = os.getenv("METRIKEN_PROMETHEUS", "")
+
+# Obergrenzen der Latenz-Buckets in Sekunden (wie die Prometheus-Standardbuckets)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_PROMETHEUS_PRAEFIX = "mail_ai_"
+_AUS = nullcontext()
+
+
+class Histogramm:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.anzahl = 0
+        self.summe = 0.0
+        self.maximum = 0.0
+
+    def beobachte(self, sekunden: float) -> None:
+        self.buckets[bisect.bisect_left(BUCKETS, sekunden)] += 1
+        self.anzahl += 1
+        self.summe += sekunden
+        self.maximum = max(self.maximum, sekunden)
+
+    def quantil(self, q: float) -> float:
+        """
+        Obergrenze des Buckets, in dem das Quantil liegt (wie histogram_quantile, ohne Interpolation),
+        höchstens aber das beobachtete Maximum.
+        """
+        ziel = q * self.anzahl
+        kumuliert = 0
+        for idx, anzahl in enumerate(self.buckets):
+            kumuliert += anzahl
+            if kumuliert >= ziel:
+                return min(BUCKETS[idx], self.maximum) if idx < len(BUCKETS) else self.maximum
+        return self.maximum
+
+    def zusammenfassung(self) -> dict:
+        return {
+            "anzahl": self.anzahl,
+            "summe_s": round(self.summe, 4),
+            "mittel_s": round(self.summe / self.anzahl, 4) if self.anzahl else 0.0,
+            "p50_s": self.quantil(0.5),
+            "p95_s": self.quantil(0.95),
+            "max_s": round(self.maximum, 4),
+        }
+
+
+class Metriken:
+    """
+    Zähler (z. B. Gmail-Quota-Einheiten, Gemini-Anfragen, Tokens) und Latenz-Histogramme pro Stufe.
+    Threadsicher; am Laufende als JSON-Zusammenfassung bzw. Prometheus-Textfile geschrieben.
+    """
+
+    def __init__(self, aktiv: bool = METRIKEN_AKTIV):
+        self.aktiv = aktiv
+        self._lock = threading.Lock()
+        self._zaehler: dict[str, float] = {}
+        self._histogramme: dict[str, Histogramm] = {}
+        self._start = time.time()
+
+    def zuruecksetzen(self) -> None:
+        with self._lock:
+            self._zaehler.clear()
+            self._histogramme.clear()
+            self._start = time.time()
+
+    def zaehle(self, name: str, wert: float = 1) -> None:
+        if not self.aktiv:
+            return
+        with self._lock:
+            self._zaehler[name] = self._zaehler.get(name, 0) + wert
+
+    def beobachte(self, name: str, sekunden: float) -> None:
+        if not self.aktiv:
+            return
+        with self._lock:
+            histogramm = self._histogramme.get(name)
+            if histogramm is None:
+                histogramm = self._histogramme[name] = Histogramm()
+            histogramm.beobachte(sekunden)
+
+    def messe(self, name: str):
+        """Context-Manager: misst die Dauer des Blocks als Beobachtung von name."""
+        if not self.aktiv:
+            return _AUS
+        return self._messung(name)
+
+    @contextmanager
+    def _messung(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.beobachte(name, time.perf_counter() - start)
+
+    def zaehler(self, name: str) -> float:
+        with self._lock:
+            return self._zaehler.get(name, 0)
+
+    def zusammenfassung(self) -> dict:
+        with self._lock:
+            return {
+                "start": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self._start)),
+                "dauer_s": round(time.time() - self._start, 3),
+                "zaehler": dict(sorted(self._zaehler.items())),
+                "zeiten": {name: h.zusammenfassung() for name, h in sorted(self._histogramme.items())},
+            }
+
+    def prometheus_text(self) -> str:
+        zeilen = []
+        with self._lock:
+            for name, wert in sorted(self._zaehler.items()):
+                metrik = f"{_PROMETHEUS_PRAEFIX}{name}_total"
+                zeilen += [f"# TYPE {metrik} counter", f"{metrik} {wert:g}"]
+            for name, histogramm in sorted(self._histogramme.items()):
+                metrik = f"{_PROMETHEUS_PRAEFIX}{name}_sekunden"
+                zeilen.append(f"# TYPE {metrik} histogram")
+                kumuliert = 0
+                for grenze, anzahl in zip(BUCKETS + (float("inf"),), histogramm.buckets):
+                    kumuliert += anzahl
+                    le = "+Inf" if grenze == float("inf") else f"{grenze:g}"
+                    zeilen.append(f'{metrik}_bucket{{le="{le}"}} {kumuliert}')
+                zeilen += [f"{metrik}_sum {histogramm.summe:.6f}", f"{metrik}_count {histogramm.anzahl}"]
+            zeilen.append(f"{_PROMETHEUS_PRAEFIX}letzter_lauf_zeitstempel {time.time():.0f}")
+        return "\n".join(zeilen) + "\n"
+
+    def schreibe(self, json_datei: str | None = METRIKEN_DATEI, prometheus_datei: str | None = METRIKEN_PROMETHEUS) -> None:
+        """Schreibt die Zusammenfassung des Laufs (atomar, damit Leser nie eine halbe Datei sehen)."""
+        if not self.aktiv:
+            return
+        try:
+            if json_datei:
+                _schreibe_atomar(json_datei, json.dumps(self.zusammenfassung(), indent=2, ensure_ascii=False))
+            if prometheus_datei:
+                _schreibe_atomar(prometheus_datei, self.prometheus_text())
+        except OSError as e:
+            logging.warning(f"Metriken konnten nicht geschrieben werden: {e}")
+
+
+def _schreibe_atomar(pfad: str, inhalt: str) -> None:
+    tmp_pfad = f"{pfad}.tmp"
+    with open(tmp_pfad, "w", encoding="utf-8") as f:
+        f.write(inhalt)
+    os.replace(tmp_pfad, pfad)
+
+
+# Prozessweite Instanz
+metriken = Metriken()
+
+
+def gemessen(name: str):
+    """Decorator: misst jeden Aufruf der Funktion unter name (ohne Overhead, wenn die Messung aus ist)."""
+    def decorator(funktion):
+        @functools.wraps(funktion)
+        def wrapper(*args, **kwargs):
+            if not metriken.aktiv:
+                return funktion(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return funktion(*args, **kwargs)
+            finally:
+                metriken.beobachte(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
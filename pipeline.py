@@ -0,0 +1,113 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable
+
+_ENDE = object()
+
+
+class Stufe:
+    """
+    Eine Pipeline-Stufe mit eigenem Worker-Pool. Jeder Worker liest aus der (begrenzten) Eingangs-Queue,
+    ruft funktion(items, emit) mit bis zu batch_groesse Elementen auf und gibt Ergebnisse per emit weiter.
+    """
+
+    def __init__(self, name: str, funktion: Callable, worker: int = 1, batch_groesse: int = 1,
+                 queue_groesse: int = 100, batch_wartezeit: float = 0.05):
+        self.name = name
+        self.funktion = funktion
+        self.worker = worker
+        self.batch_groesse = batch_groesse
+        self.batch_wartezeit = batch_wartezeit
+        self.eingang: queue.Queue = queue.Queue(maxsize=queue_groesse)
+        self.naechste: "Stufe | None" = None
+        self.verarbeitet = 0
+        self.fehler = 0
+        self.dauer = 0.0
+        self._aktiv = worker
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+
+    def emit(self, item) -> None:
+        if self.naechste is not None:
+            self.naechste.eingang.put(item)
+
+    def _sammle(self) -> tuple[list, bool]:
+        """Holt ein Element blockierend und ergänzt bis zu batch_groesse weitere, die kurz darauf eintreffen."""
+        items = []
+        item = self.eingang.get()
+        if item is _ENDE:
+            return items, True
+        items.append(item)
+        frist = time.monotonic() + self.batch_wartezeit
+        while len(items) < self.batch_groesse:
+            try:
+                item = self.eingang.get(timeout=max(0.0, frist - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is _ENDE:
+                return items, True
+            items.append(item)
+        return items, False
+
+    def _lauf(self) -> None:
+        ende = False
+        while not ende:
+            items, ende = self._sammle()
+            if items:
+                start = time.perf_counter()
+                try:
+                    self.funktion(items, self.emit)
+                    with self._lock:
+                        self.verarbeitet += len(items)
+                except Exception as e:
+                    logging.error(f"❌ Pipeline-Stufe '{self.name}' fehlgeschlagen ({len(items)} Elemente): {e}")
+                    with self._lock:
+                        self.fehler += len(items)
+                with self._lock:
+                    self.dauer += time.perf_counter() - start
+        # Ende-Signal für die übrigen Worker dieser Stufe zurücklegen; der letzte reicht es weiter
+        self.eingang.put(_ENDE)
+        with self._lock:
+            self._aktiv -= 1
+            letzter = self._aktiv == 0
+        if letzter:
+            self.emit(_ENDE)
+
+    def starte(self) -> None:
+        for i in range(self.worker):
+            thread = threading.Thread(target=self._lauf, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def warte(self) -> None:
+        for thread in self._threads:
+            thread.join()
+
+
+class Pipeline:
+    """Verkettet Stufen über begrenzte Queues; der Durchsatz wird so von der langsamsten Stufe bestimmt."""
+
+    def __init__(self, stufen: list[Stufe]):
+        self.stufen = stufen
+        for stufe, naechste in zip(stufen, stufen[1:]):
+            stufe.naechste = naechste
+
+    def ausfuehren(self, items) -> None:
+        """Speist items in die erste Stufe ein und wartet, bis alle Stufen leergelaufen sind."""
+        for stufe in self.stufen:
+            stufe.starte()
+        for item in items:
+            self.stufen[0].eingang.put(item)
+        self.stufen[0].eingang.put(_ENDE)
+        for stufe in self.stufen:
+            stufe.warte()
+
+    @property
+    def fehler(self) -> int:
+        return sum(stufe.fehler for stufe in self.stufen)
+
+    def bericht(self) -> str:
+        teile = [f"{s.name}: {s.verarbeitet} ok/{s.fehler} Fehler/{s.dauer:.2f}s" for s in self.stufen]
+        return "Pipeline – " + ", ".join(teile)
@@ -0,0 +1,76 @@
+import logging
+import random
+import threading
+import time
+
+# HTTP-Statuscodes, bei denen sich ein erneuter Versuch lohnt
+WIEDERHOLBARE_STATUS = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+    Token-Bucket: füllt sich mit rate Tokens pro Sekunde bis zur kapazitaet auf.
+    erwerbe() blockiert, bis genug Tokens vorhanden sind (threadsicher).
+    """
+
+    def __init__(self, rate: float, kapazitaet: float | None = None):
+        self.rate = rate
+        self.kapazitaet = kapazitaet if kapazitaet is not None else max(rate, 1.0)
+        self._tokens = self.kapazitaet
+        self._zeit = time.monotonic()
+        self._lock = threading.Lock()
+        self.wartezeit = 0.0
+
+    def setze_rate(self, rate: float, kapazitaet: float | None = None) -> None:
+        """Stellt das Limit um (z. B. pro Postfach) und beginnt mit vollem Bucket."""
+        with self._lock:
+            self.rate = rate
+            self.kapazitaet = kapazitaet if kapazitaet is not None else max(rate, 1.0)
+            self._tokens = self.kapazitaet
+            self._zeit = time.monotonic()
+            self.wartezeit = 0.0
+
+    def _auffuellen(self) -> None:
+        jetzt = time.monotonic()
+        self._tokens = min(self.kapazitaet, self._tokens + (jetzt - self._zeit) * self.rate)
+        self._zeit = jetzt
+
+    def erwerbe(self, tokens: float = 1.0) -> None:
+        if self.rate <= 0:
+            return  # unbegrenzt
+        # Mehr als die Kapazität kann nie angespart werden
+        tokens = min(tokens, self.kapazitaet)
+        while True:
+            with self._lock:
+                self._auffuellen()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                warten = (tokens - self._tokens) / self.rate
+            self.wartezeit += warten
+            time.sleep(warten)
+
+
+def http_status(fehler: Exception) -> int | None:
+    """Ermittelt den HTTP-Status aus googleapiclient- (resp.status) oder google.api_core-Fehlern (code)."""
+    resp = getattr(fehler, 'resp', None)
+    status = getattr(resp, 'status', None)
+    if status is None:
+        status = getattr(fehler, 'code', None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def mit_backoff(funktion, *args, max_versuche: int = 5, basis: float = 1.0, **kwargs):
+    """Ruft funktion auf und wiederholt sie bei 429/5xx mit exponentiellem Backoff (mit Jitter)."""
+    for versuch in range(max_versuche):
+        try:
+            return funktion(*args, **kwargs)
+        except Exception as e:
+            if http_status(e) not in WIEDERHOLBARE_STATUS or versuch == max_versuche - 1:
+                raise
+            warten = min(basis * 2 ** versuch, 60) * (0.5 + random.random() / 2)
+            logging.warning(f"⏳ Rate-Limit/Serverfehler ({http_status(e)}), neuer Versuch in {warten:.1f}s: {e}")
+            time.sleep(warten)
@@ -0,0 +1,83 @@
+import logging
+import os
+import re
+import threading
+from collections import Counter
+
+REGEL_SCHWELLE = float(os.getenv("REGEL_SCHWELLE", 3))
+# Der Punktestand der besten Kategorie muss mind. REGEL_ABSTAND-mal so hoch sein wie der der zweitbesten
+REGEL_ABSTAND = float(os.getenv("REGEL_ABSTAND", 2))
+
+# Gewichtung pro Feld: ein Treffer im Betreff zählt mehr als einer im Body
+FELD_GEWICHTE = {"subject": 3.0, "sender": 2.0, "body": 1.0}
+_BODY_PREFIX = 5000
+
+
+class RegelEngine:
+    """
+    Lokaler Schnellpfad vor Gemini: alle Keywords aus regeln.json werden einmalig zu einem
+    kombinierten Regex (Wortgrenzen, Unicode-Casefolding) kompiliert. Nur eindeutige Treffer
+    oberhalb der Schwelle werden lokal entschieden, alles andere geht an das LLM.
+    """
+
+    def __init__(self, regeln: dict, schwelle: float = REGEL_SCHWELLE, abstand: float = REGEL_ABSTAND):
+        self.schwelle = schwelle
+        self.abstand = abstand
+        self.anfragen = 0
+        self.treffer = 0
+        self._lock = threading.Lock()
+        self._kategorien_pro_keyword: dict[str, set[str]] = {}
+        for kategorie, regel in regeln.items():
+            for keyword in regel.get("keywords", []):
+                keyword = keyword.casefold().strip()
+                if keyword:
+                    self._kategorien_pro_keyword.setdefault(keyword, set()).add(kategorie)
+        if self._kategorien_pro_keyword:
+            # Längste Keywords zuerst, damit "payment reminder" vor "payment" greift
+            alternativen = sorted(self._kategorien_pro_keyword, key=len, reverse=True)
+            self._pattern = re.compile(r'(?<!\w)(?:' + '|'.join(map(re.escape, alternativen)) + r')(?!\w)')
+        else:
+            self._pattern = None
+
+    def bewerte(self, subject: str, sender: str, body: str) -> Counter:
+        """Gibt die gewichteten Punkte pro Kategorie zurück (jedes Keyword zählt einmal pro Feld)."""
+        punkte: Counter = Counter()
+        if self._pattern is None:
+            return punkte
+        felder = {"subject": subject, "sender": sender, "body": (body or '')[:_BODY_PREFIX]}
+        for feld, text in felder.items():
+            for keyword in set(self._pattern.findall((text or '').casefold())):
+                for kategorie in self._kategorien_pro_keyword[keyword]:
+                    punkte[kategorie] += FELD_GEWICHTE[feld]
+        return punkte
+
+    def klassifiziere(self, subject: str, sender: str, body: str, vorlaeufig: bool = False) -> dict | None:
+        """
+        Entscheidet eine E-Mail lokal, wenn das Ergebnis eindeutig ist.
+        vorlaeufig=True kennzeichnet eine Vorprüfung nur anhand der Header: ein Fehltreffer wird dann
+        nicht gezählt, da die E-Mail anschließend mit Body erneut geprüft wird.
+        :return: Ergebnis-Dict wie classify_email oder None (-> Gemini fragen)
+        """
+        rangfolge = self.bewerte(subject, sender, body).most_common(2)
+        kategorie, bester = rangfolge[0] if rangfolge else (None, 0.0)
+        zweiter = rangfolge[1][1] if len(rangfolge) > 1 else 0.0
+        if not rangfolge or bester < self.schwelle or bester < self.abstand * zweiter:
+            if not vorlaeufig:
+                with self._lock:
+                    self.anfragen += 1
+            return None
+        with self._lock:
+            self.anfragen += 1
+            self.treffer += 1
+        logging.info(f"⚡ Regel-Treffer: '{kategorie}' ({bester:g} Punkte) für Betreff: '{subject}'")
+        return {
+            "kategorie": kategorie,
+            "ist_newsletter": kategorie.lower().strip() == "newsletter",
+            "ist_unbezahlt": False,
+            "unsubscribe_url": None
+        }
+
+    def bericht(self) -> str:
+        """Kurzbericht über die Trefferquote (= eingesparte Gemini-Aufrufe)."""
+        quote = self.treffer / self.anfragen * 100 if self.anfragen else 0.0
+        return f"Regel-Engine: {self.treffer}/{self.anfragen} E-Mails lokal klassifiziert ({quote:.1f} %), {self.treffer} Gemini-Aufrufe eingespart."
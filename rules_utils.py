@@ -1,6 +1,19 @@
 import json
 import logging
-from typing import Dict
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+REGELN_FLUSH_INTERVALL = float(os.getenv("REGELN_FLUSH_INTERVALL", 30))
 
 def lade_regeln(regeln_datei: str) -> Dict:
     """Lädt die Regeln aus der Datei oder gibt ein leeres Dict zurück."""
@@ -12,6 +25,140 @@ def lade_regeln(regeln_datei: str) -> Dict:
         return {}
 
 def speichere_regeln(regeln: Dict, regeln_datei: str) -> None:
-    """Speichert die Regeln in die Datei."""
-    with open(regeln_datei, "w", encoding="utf-8") as f:
-        json.dump(regeln, f, indent=2, ensure_ascii=False) 
\ No newline at end of file
+    """Speichert die Regeln atomar in die Datei (Temp-Datei + fsync + rename)."""
+    verzeichnis = os.path.dirname(os.path.abspath(regeln_datei))
+    fd, tmp_pfad = tempfile.mkstemp(prefix=".regeln-", suffix=".tmp", dir=verzeichnis)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(regeln, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_pfad, regeln_datei)
+    except BaseException:
+        if os.path.exists(tmp_pfad):
+            os.remove(tmp_pfad)
+        raise
+    if hasattr(os, "O_DIRECTORY"):
+        # Auch den Verzeichniseintrag (rename) dauerhaft machen
+        dir_fd = os.open(verzeichnis, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+@contextmanager
+def _datei_lock(pfad: str):
+    """Exklusive prozessübergreifende Sperre über eine separate .lock-Datei."""
+    with open(pfad + ".lock", "a+") as lock_datei:
+        if fcntl:
+            fcntl.flock(lock_datei.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_datei.seek(0)
+            msvcrt.locking(lock_datei.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_datei.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_datei.seek(0)
+                msvcrt.locking(lock_datei.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class RulesStore:
+    """
+    Regeln im Speicher mit vorberechnetem Index der normalisierten Kategorienamen. self.regeln wird nie
+    verändert, sondern bei jeder Änderung ersetzt; Leser können ein einmal gelesenes Dict ohne Lock durchlaufen.
+    Neue Kategorien werden nur als "dirty" markiert und gesammelt atomar geschrieben (am Laufende oder
+    spätestens nach flush_intervall Sekunden). Änderungen anderer Prozesse werden anhand der mtime
+    nachgeladen und beim Schreiben zusammengeführt, sodass keine Regel verloren geht.
+    """
+
+    def __init__(self, regeln_datei: str, flush_intervall: float = REGELN_FLUSH_INTERVALL):
+        self._pfad = regeln_datei
+        self._flush_intervall = flush_intervall
+        self._lock = threading.RLock()
+        self.regeln: Dict = {}
+        self._normalisiert: Dict[str, str] = {}
+        self._neu: Dict[str, Dict] = {}
+        self._mtime: Optional[float] = None
+        self._letzter_flush = time.monotonic()
+        self._lade()
+
+    @staticmethod
+    def normalisiere(kategorie: str) -> str:
+        return kategorie.lower().strip()
+
+    def _mtime_datei(self) -> Optional[float]:
+        try:
+            return os.stat(self._pfad).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _lade(self) -> None:
+        """Lädt die Datei und übernimmt noch nicht geschriebene eigene Kategorien."""
+        self._mtime = self._mtime_datei()
+        regeln = lade_regeln(self._pfad) if self._mtime is not None else {}
+        for kategorie, regel in self._neu.items():
+            regeln.setdefault(kategorie, regel)
+        # Neues Dict und Referenz austauschen, statt self.regeln zu verändern: Klassifizierungs-Threads
+        # iterieren parallel über den Stand, den sie zuvor gelesen haben
+        self._normalisiert = {self.normalisiere(k): k for k in regeln}
+        self.regeln = regeln
+
+    def aktualisiere(self) -> bool:
+        """Lädt die Regeln neu, wenn die Datei seit dem letzten Laden geändert wurde (Hot Reload)."""
+        with self._lock:
+            if self._mtime_datei() == self._mtime:
+                return False
+            self._lade()
+            logging.info(f"Regeln aus '{self._pfad}' neu geladen ({len(self.regeln)} Kategorien).")
+            return True
+
+    def kategorien(self) -> list[str]:
+        return list(self.regeln)
+
+    def finde(self, kategorie: str) -> Optional[str]:
+        """Gibt den Originalnamen einer Kategorie zurück (Vergleich normalisiert), sonst None."""
+        return self._normalisiert.get(self.normalisiere(kategorie))
+
+    def stelle_sicher(self, kategorie: str) -> Tuple[str, str, bool]:
+        """
+        Gibt (Kategoriename, Labelname, neu_angelegt) zurück und legt unbekannte Kategorien als Regel an.
+        """
+        with self._lock:
+            vorhanden = self.finde(kategorie)
+            if vorhanden is None:
+                # Evtl. hat ein anderer Prozess die Kategorie schon angelegt
+                self.aktualisiere()
+                vorhanden = self.finde(kategorie)
+            if vorhanden is not None:
+                return vorhanden, self.regeln[vorhanden]["label"], False
+            regel = {
+                "keywords": [],
+                "label": kategorie.capitalize()
+            }
+            # Copy-on-write wie in _lade
+            self.regeln = {**self.regeln, kategorie: regel}
+            self._normalisiert = {**self._normalisiert, self.normalisiere(kategorie): kategorie}
+            self._neu[kategorie] = regel
+            if time.monotonic() - self._letzter_flush >= self._flush_intervall:
+                self.flush()
+            return kategorie, regel["label"], True
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._neu)
+
+    def flush(self) -> None:
+        """Schreibt neue Kategorien atomar; vorher wird der aktuelle Dateistand eingelesen und zusammengeführt."""
+        with self._lock:
+            self._letzter_flush = time.monotonic()
+            if not self._neu:
+                return
+            with _datei_lock(self._pfad):
+                self._lade()
+                speichere_regeln(self.regeln, self._pfad)
+                self._mtime = self._mtime_datei()
+            logging.info(f"Regeln gespeichert ({len(self._neu)} neue Kategorien).")
+            self._neu.clear()
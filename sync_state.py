@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+from googleapiclient.errors import HttpError
+from gmail_utils import zaehle_gmail_anfrage, QUOTA_MESSAGES_LIST
+from metriken import metriken
+
+QUOTA_GET_PROFILE = 1
+QUOTA_HISTORY_LIST = 2
+
+SYNC_STATE_DATEI = os.getenv("SYNC_STATE_DATEI", "sync_state.json")
+
+
+class SyncState:
+    """Speichert die zuletzt verarbeitete Gmail-historyId lokal, damit Folgeläufe nur neue E-Mails abfragen."""
+
+    def __init__(self, pfad: str = SYNC_STATE_DATEI):
+        self._pfad = pfad
+        self.history_id: str | None = None
+        try:
+            with open(pfad, "r", encoding="utf-8") as f:
+                self.history_id = json.load(f).get("history_id")
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def speichere(self, history_id: str | None) -> None:
+        """Schreibt die historyId atomar (None setzt den Stand zurück -> nächster Lauf macht einen Voll-Scan)."""
+        self.history_id = history_id
+        tmp_pfad = f"{self._pfad}.tmp"
+        with open(tmp_pfad, "w", encoding="utf-8") as f:
+            json.dump({"history_id": history_id}, f)
+        os.replace(tmp_pfad, self._pfad)
+
+
+def _voll_scan(service, max_emails: int | None) -> tuple[list[dict], str | None]:
+    """Listet alle ungelesenen INBOX-E-Mails seitenweise. historyId wird vorab gelesen, damit nichts verloren geht."""
+    zaehle_gmail_anfrage(QUOTA_GET_PROFILE)
+    history_id = service.users().getProfile(userId='me').execute().get('historyId')
+    messages: list[dict] = []
+    page_token = None
+    while True:
+        zaehle_gmail_anfrage(QUOTA_MESSAGES_LIST)
+        with metriken.messe("gmail_messages_list"):
+            results = service.users().messages().list(
+                userId='me',
+                labelIds=['INBOX'],
+                q="is:unread",
+                maxResults=500,
+                pageToken=page_token
+            ).execute()
+        messages.extend(results.get('messages', []))
+        page_token = results.get('nextPageToken')
+        if max_emails and len(messages) > max_emails:
+            # Rest bleibt ungelesen in der INBOX und wird beim nächsten Voll-Scan gefunden
+            return messages[:max_emails], None
+        if not page_token:
+            return messages, history_id
+
+
+def _history_abruf(service, start_history_id: str, max_emails: int | None) -> tuple[list[dict], str | None]:
+    """Holt über users.history.list alle seit start_history_id neu hinzugekommenen ungelesenen INBOX-E-Mails."""
+    messages: dict[str, dict] = {}
+    history_id = start_history_id
+    page_token = None
+    while True:
+        zaehle_gmail_anfrage(QUOTA_HISTORY_LIST)
+        with metriken.messe("gmail_history_list"):
+            results = service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=['messageAdded'],
+                labelId='INBOX',
+                pageToken=page_token
+            ).execute()
+        for eintrag in results.get('history', []):
+            for added in eintrag.get('messagesAdded', []):
+                msg = added['message']
+                label_ids = msg.get('labelIds', [])
+                if 'INBOX' in label_ids and 'UNREAD' in label_ids:
+                    messages.setdefault(msg['id'], {'id': msg['id'], 'threadId': msg.get('threadId')})
+        history_id = results.get('historyId', history_id)
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+    neue = list(messages.values())
+    if max_emails and len(neue) > max_emails:
+        # Mehr als ein Lauf verarbeiten darf: Stand zurücksetzen, der Voll-Scan holt den Rest
+        return neue[:max_emails], None
+    return neue, history_id
+
+
+def hole_neue_nachrichten(service, state: SyncState, max_emails: int | None = None) -> tuple[list[dict], str | None]:
+    """
+    Holt neue ungelesene INBOX-E-Mails: inkrementell per historyId, sonst (oder bei abgelaufener historyId)
+    per vollständig paginiertem Scan.
+    :return: (messages, neue historyId) – die historyId erst nach erfolgreicher Verarbeitung speichern.
+    """
+    if state.history_id:
+        try:
+            messages, history_id = _history_abruf(service, state.history_id, max_emails)
+            logging.info(f"Inkrementeller Abruf seit historyId {state.history_id}: {len(messages)} neue E-Mails.")
+            return messages, history_id
+        except HttpError as e:
+            if getattr(e.resp, 'status', None) != 404:
+                raise
+            logging.warning(f"historyId {state.history_id} ist abgelaufen – führe Voll-Scan durch.")
+    return _voll_scan(service, max_emails)
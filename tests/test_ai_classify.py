@@ -27,10 +27,11 @@ def dummy_classify_email(subject, sender, body, regeln, gmail_labels=None):
         "unsubscribe_url": None
     }
 
-def test_classify_email_mock(monkeypatch):
+def test_classify_email_mock(monkeypatch, tmp_path):
     # Dummy-Modell einsetzen
     import ai_classify
-    ai_classify._classifier_instance = None
+    monkeypatch.setattr(ai_classify, "_classifier_instance", None)
+    monkeypatch.setattr(ai_classify, "KLASSIFIKATIONS_CACHE_DB", str(tmp_path / "cache.db"))
     monkeypatch.setattr(ai_classify, "classify_email", dummy_classify_email)
 
     regeln = {
@@ -46,9 +47,10 @@ def test_classify_email_mock(monkeypatch):
     assert result["kategorie"] == "rechnung"
     assert not result["ist_newsletter"]
 
-def test_classify_email_fallback(monkeypatch):
+def test_classify_email_fallback(monkeypatch, tmp_path):
     import ai_classify
-    ai_classify._classifier_instance = None
+    monkeypatch.setattr(ai_classify, "_classifier_instance", None)
+    monkeypatch.setattr(ai_classify, "KLASSIFIKATIONS_CACHE_DB", str(tmp_path / "cache.db"))
     monkeypatch.setattr(ai_classify, "classify_email", dummy_classify_email)
 
     regeln = {
@@ -64,3 +66,82 @@ def test_classify_email_fallback(monkeypatch):
     assert result["kategorie"] == "newsletter"
     assert result["ist_newsletter"]
 
+
+
+class BatchDummyModel:
+    def __init__(self, antworten):
+        self.antworten = list(antworten)
+        self.prompts = []
+
+    def generate_content(self, prompt):
+        self.prompts.append(prompt)
+        antwort = self.antworten.pop(0)
+        if isinstance(antwort, Exception):
+            raise antwort
+        return DummyResponse(antwort)
+
+
+def dummy_classifier(model, tmp_path):
+    import ai_classify
+    from lokaler_classifier import LokalerClassifier
+    classifier = ai_classify.GeminiClassifier(api_key="test", cache_pfad=str(tmp_path / "cache.db"),
+                                              lokales_modell=LokalerClassifier(pfad=None))
+    classifier._model = model
+    return classifier
+
+
+def test_classify_batch_eine_anfrage_und_einzelnachfrage(tmp_path):
+    regeln = {
+        "rechnung": {"keywords": [], "label": "Rechnungen"},
+        "newsletter": {"keywords": [], "label": "Newsletter"}
+    }
+    emails = [
+        {"id": "a", "subject": "Zahlung offen", "sender": "a@firma.de", "body": "Bitte zahlen"},
+        {"id": "b", "subject": "Sommer-News", "sender": "news@shop.de", "body": "Angebote"},
+        {"id": "c", "subject": "Hallo", "sender": "x@y.de", "body": "..."},
+    ]
+    model = BatchDummyModel([
+        '```json\n[{"id": "E1", "kategorie": "Rechnung"}, {"id": "E2", "kategorie": "newsleter"}]\n```',
+        "unbekannt",
+    ])
+    classifier = dummy_classifier(model, tmp_path)
+    ergebnisse = classifier.classify_batch(emails, regeln)
+    assert ergebnisse["a"]["kategorie"] == "rechnung"
+    assert ergebnisse["b"]["kategorie"] == "newsletter"
+    assert ergebnisse["b"]["ist_newsletter"]
+    assert ergebnisse["c"]["kategorie"] is None
+    # Ein Batch-Aufruf plus eine Einzelanfrage für die fehlende E-Mail E3
+    assert len(model.prompts) == 2
+    assert "E3" in model.prompts[0]
+
+
+def test_classify_batch_gescheiterte_anfrage_ohne_einzelanfragen(tmp_path):
+    regeln = {"rechnung": {"keywords": [], "label": "Rechnungen"}}
+    emails = [{"id": i, "subject": f"Betreff {i}", "sender": "a@b.de", "body": "Text"} for i in "abc"]
+    model = BatchDummyModel([RuntimeError("503 Service Unavailable")])
+    classifier = dummy_classifier(model, tmp_path)
+    ergebnisse = classifier.classify_batch(emails, regeln)
+    assert len(model.prompts) == 1
+    assert all(r["kategorie"] is None and r["fehler"] for r in ergebnisse.values()) and len(ergebnisse) == 3
+
+
+def test_classify_batch_nutzt_cache(tmp_path):
+    regeln = {"rechnung": {"keywords": [], "label": "Rechnungen"}}
+    emails = [{"id": "a", "subject": "Rechnung 1", "sender": "a@firma.de", "body": ""}]
+    model = BatchDummyModel(["rechnung"])
+    classifier = dummy_classifier(model, tmp_path)
+    classifier.classify_batch(emails, regeln)
+    emails2 = [{"id": "b", "subject": "Rechnung 2", "sender": "a@firma.de", "body": ""}]
+    assert classifier.classify_batch(emails2, regeln)["b"]["kategorie"] == "rechnung"
+    assert len(model.prompts) == 1
+
+
+def test_few_shot_index_folgt_der_version(tmp_path):
+    from training_store import Trainingsdaten
+    classifier = dummy_classifier(BatchDummyModel([]), tmp_path)
+    daten = Trainingsdaten([{"label": "Bank", "subject": "Kontoauszug", "sender": "bank@x.de", "body": ""}], version=1)
+    index = classifier._beispiel_index(daten)
+    assert classifier._beispiel_index(daten) is index
+    # Gleiche Länge, neue Version: neu aufbauen
+    neu = Trainingsdaten([{"label": "Shop", "subject": "Bestellung", "sender": "shop@x.de", "body": ""}], version=2)
+    assert classifier._beispiel_index(neu) is not index
@@ -0,0 +1,145 @@
+import json
+
+import pytest
+
+import ai_classify
+import backfill
+import lokaler_classifier
+import main
+from backfill import EmlVerzeichnis, MboxQuelle, als_gmail_nachricht
+from bench.fake_gemini import FakeGeminiModel, erzeuge_classifier
+from bench.fake_gmail import FakeGmailService, FakePostfach
+from utils import get_email_body
+
+MBOX = (b"From a@x.de Mon Sep  1 08:00:00 2025\n"
+        b"Message-ID: <eins@x.de>\nSubject: Eins\n\nHallo\n>From Berlin\n\n"
+        b"From b@x.de Mon Sep  1 09:00:00 2025\n"
+        b"Message-ID: <zwei@x.de>\nSubject: Zwei\n\nText\n"
+        b"From c@x.de Mon Sep  1 10:00:00 2025\n"
+        b"Subject: Ohne ID\n\nText\n")
+
+
+def test_mbox_streaming_und_fortsetzen(tmp_path):
+    pfad = tmp_path / "archiv.mbox"
+    pfad.write_bytes(MBOX)
+    quelle = MboxQuelle(str(pfad))
+    nachrichten = list(quelle.nachrichten())
+    assert [n.message_id for n in nachrichten] == ["eins@x.de", "zwei@x.de", ""]
+    assert nachrichten[-1].position == len(MBOX)
+    assert "From Berlin" in nachrichten[0].parse().get_content()
+    assert [n.message_id for n in quelle.nachrichten(nachrichten[0].position)] == ["zwei@x.de", ""]
+
+    full = als_gmail_nachricht("g1", nachrichten[1].parse())
+    assert get_email_body(full).strip() == "Text"
+    assert main.lese_email(full)["subject"] == "Zwei"
+
+
+def test_eml_verzeichnis_position_ist_dateianzahl(tmp_path):
+    (tmp_path / "b").mkdir()
+    (tmp_path / "a.eml").write_bytes(b"Message-ID: <a@x.de>\n\nA\n")
+    (tmp_path / "b" / "c.eml").write_bytes(b"Message-ID: <c@x.de>\n\nC\n")
+    (tmp_path / "notiz.txt").write_text("keine E-Mail")
+    quelle = EmlVerzeichnis(str(tmp_path))
+    assert [(n.message_id, n.position) for n in quelle.nachrichten()] == [("a@x.de", 1), ("c@x.de", 2)]
+    assert [n.message_id for n in quelle.nachrichten(1)] == ["c@x.de"]
+
+
+def _umgebung(monkeypatch, tmp_path):
+    postfach = FakePostfach(ungelesen=0, gelabelt_pro_label=6)
+    service = FakeGmailService(postfach)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "get_gmail_service", lambda creds=None: service)
+    monkeypatch.setattr(ai_classify, "_classifier_instance", erzeuge_classifier(FakeGeminiModel(), "cache.db"))
+    monkeypatch.setattr(lokaler_classifier, "LOKAL_KALIBRIERUNG_DATEI", "")
+    # Export des Postfachs plus eine Nachricht, die es in Gmail nicht (mehr) gibt
+    with open("archiv.mbox", "wb") as f:
+        for msg_id in postfach.nachrichten:
+            f.write(b"From export Mon Sep  1 08:00:00 2025\n" + postfach.als_rfc822(msg_id) + b"\n")
+        f.write(b"From export Mon Sep  1 08:00:00 2025\nMessage-ID: <geloescht@x.de>\nSubject: Weg\n\nText\n")
+    return postfach, service
+
+
+def _eintraege(pfad):
+    with open(pfad, encoding="utf-8") as f:
+        return [json.loads(z) for z in f.readlines()[1:] if "checkpoint" not in z]
+
+
+def test_plane_setzt_nach_absturz_fort_und_wendet_gruppiert_an(monkeypatch, tmp_path):
+    postfach, service = _umgebung(monkeypatch, tmp_path)
+    anzahl = len(postfach.nachrichten)
+    sitzung = main.Sitzung(None)
+    quelle = backfill.oeffne_quelle("archiv.mbox")
+
+    # Absturz nach dem zweiten Block: zweiter Checkpoint fehlt, letzte Zeile halb geschrieben
+    zaehler = backfill.plane(sitzung, quelle, "plan.jsonl", block_groesse=5)
+    vollstaendig = _eintraege("plan.jsonl")
+    with open("plan.jsonl", "rb") as f:
+        zeilen = f.readlines()
+    checkpoints = [i for i, z in enumerate(zeilen) if b"checkpoint" in z]
+    with open("plan.jsonl", "wb") as f:
+        f.writelines(zeilen[:checkpoints[1]])
+        f.write(b'{"id": "halb')
+
+    plan = backfill.Plan("plan.jsonl", quelle.beschreibung)
+    plan.close()
+    assert plan.position == json.loads(zeilen[checkpoints[0]])["checkpoint"]
+    fortgesetzt = backfill.plane(sitzung, quelle, "plan.jsonl", block_groesse=5)
+    sitzung.beenden()
+    assert _eintraege("plan.jsonl") == vollstaendig
+    assert fortgesetzt == zaehler
+    assert zaehler["gelesen"] == anzahl + 1 and zaehler["nicht_gefunden"] == 1
+    assert zaehler["geplant"] == anzahl - zaehler["ohne_kategorie"]
+
+    service.setze_zaehler_zurueck()
+    for nachricht in postfach.nachrichten.values():
+        nachricht["labelIds"].append("INBOX")
+    ergebnis = backfill.wende_an(service, "plan.jsonl")
+    labels = {e["label"] for e in vollstaendig if "id" in e}
+    assert ergebnis["angewendet"] == zaehler["geplant"]
+    assert service.aufrufe["messages.batchModify"] == len(labels)
+    registry = {l["name"]: l["id"] for l in postfach.labels.values()}
+    for eintrag in vollstaendig:
+        if "id" in eintrag:
+            assert registry[eintrag["label"]] in postfach.nachrichten[eintrag["id"]]["labelIds"]
+    # Backfill setzt nur Labels, ohne die E-Mails zu archivieren
+    assert all("INBOX" in n["labelIds"] for n in postfach.nachrichten.values())
+
+    # Fortschritt ist gespeichert: erneutes Anwenden überträgt nichts mehr
+    service.setze_zaehler_zurueck()
+    assert backfill.wende_an(service, "plan.jsonl")["angewendet"] == 0
+    assert service.aufrufe["messages.batchModify"] == 0
+
+
+def test_wende_an_ignoriert_unbestaetigten_block(tmp_path):
+    postfach = FakePostfach(ungelesen=0, gelabelt_pro_label=1)
+    service = FakeGmailService(postfach)
+    ids = list(postfach.nachrichten)
+    pfad = tmp_path / "plan.jsonl"
+    zeilen = [{"quelle": "mbox:/x", "version": 1}, {"id": ids[0], "label": "Bank"}, {"checkpoint": 10},
+              {"id": ids[1], "label": "Bank"}]
+    pfad.write_text("".join(json.dumps(z) + "\n" for z in zeilen), encoding="utf-8")
+
+    assert backfill.wende_an(service, str(pfad))["angewendet"] == 1
+    # Fortschritt endet vor dem unbestätigten Eintrag; nach seinem Checkpoint wird nur er übertragen
+    with open(pfad, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"checkpoint": 20, "fertig": True}) + "\n")
+    assert backfill.wende_an(service, str(pfad))["angewendet"] == 1
+
+
+def test_plane_bricht_bei_gemini_ausfall_vor_dem_checkpoint_ab(monkeypatch, tmp_path):
+    postfach, service = _umgebung(monkeypatch, tmp_path)
+    model = FakeGeminiModel(fehlerquote=1.0, fehler_code=400)
+    monkeypatch.setattr(ai_classify, "_classifier_instance", erzeuge_classifier(model, "cache2.db"))
+    sitzung = main.Sitzung(None)
+    quelle = backfill.oeffne_quelle("archiv.mbox")
+    try:
+        with pytest.raises(RuntimeError):
+            backfill.plane(sitzung, quelle, "plan.jsonl", block_groesse=5)
+        plan = backfill.Plan("plan.jsonl", quelle.beschreibung)
+        plan.close()
+        assert plan.position == 0 and _eintraege("plan.jsonl") == []
+
+        model.fehlerquote = 0.0
+        assert backfill.plane(sitzung, quelle, "plan.jsonl", block_groesse=5)["gelesen"] == len(postfach.nachrichten) + 1
+    finally:
+        sitzung.beenden()
@@ -0,0 +1,32 @@
+from beispiel_index import BeispielIndex, absender_domain
+
+
+def beispiel(label, subject, sender, body=""):
+    return {"label": label, "subject": subject, "sender": sender, "body": body}
+
+
+TRAININGSDATEN = [
+    beispiel("Rechnungen", "Ihre Rechnung Nr. 4711", "Telekom <rechnung@telekom.de>", "Rechnungsbetrag 39,99 EUR"),
+    beispiel("Rechnungen", "Rechnung Juli", "Vodafone <billing@vodafone.de>", "Ihre Monatsrechnung"),
+    beispiel("Newsletter", "Sommer-Sale: 30% auf alles", "Shop <news@shop.de>", "Jetzt zugreifen"),
+    beispiel("Newsletter", "Die Woche im Überblick", "Zeitung <newsletter@zeitung.de>", "Top-Themen"),
+    beispiel("Termine", "Einladung: Meeting Montag", "Kollege <k@firma.de>", "Besprechung um 10 Uhr"),
+]
+
+
+def test_absender_domain():
+    assert absender_domain("Telekom <rechnung@telekom.de>") == "telekom.de"
+    assert absender_domain("") == ""
+
+
+def test_aehnlichste_beispiele_zuerst():
+    index = BeispielIndex(TRAININGSDATEN)
+    gewaehlt = index.waehle_beispiele("Ihre Rechnung Nr. 4812", "Telekom <rechnung@telekom.de>", "", k=1, pro_label=0)
+    assert gewaehlt == [TRAININGSDATEN[0]]
+
+
+def test_pro_label_ergaenzung_und_token_budget():
+    index = BeispielIndex(TRAININGSDATEN)
+    gewaehlt = index.waehle_beispiele("Rechnung August", "x@vodafone.de", "Meeting Überblick", k=1, pro_label=1)
+    assert len({item["label"] for item in gewaehlt}) >= 2
+    assert index.waehle_beispiele("Rechnung", "", "", token_budget=5) == []
@@ -0,0 +1,39 @@
+import gmail_utils
+from bench.fake_gemini import FakeGeminiModel, erzeuge_classifier
+from bench.fake_gmail import FakeGmailService, FakePostfach
+from sync_state import SyncState, hole_neue_nachrichten
+
+
+def test_fake_gmail_mit_batch_und_history(tmp_path):
+    postfach = FakePostfach(ungelesen=120, gelabelt_pro_label=2)
+    service = FakeGmailService(postfach)
+    state = SyncState(str(tmp_path / "sync.json"))
+
+    messages, history_id = hole_neue_nachrichten(service, state)
+    assert len(messages) == 120
+    geladen = gmail_utils.batch_get_metadata(service, [m["id"] for m in messages])
+    assert len(geladen) == 120 and "body" not in next(iter(geladen.values()))["payload"]
+    assert service.aufrufe["messages.get"] == 120
+    assert service.http_anfragen < 10
+
+    gmail_utils.move_emails_to_labels(service, {"Label_1": [m["id"] for m in messages]})
+    assert postfach.ungelesen_in_inbox() == 0
+
+    state.speichere(history_id)
+    neu = postfach.fuege_ungelesene_hinzu(3)
+    messages, _ = hole_neue_nachrichten(service, state)
+    assert [m["id"] for m in messages] == neu
+
+
+def test_fake_gemini_batch_antwort_und_tokens(tmp_path):
+    model = FakeGeminiModel()
+    classifier = erzeuge_classifier(model, str(tmp_path / "cache.db"))
+    regeln = {"rechnung": {"keywords": [], "label": "Rechnungen"}, "bank": {"keywords": [], "label": "Bank"}}
+    emails = [
+        {"id": "a", "subject": "Ihre Rechnung", "sender": "x@y.de", "body": "Text"},
+        {"id": "b", "subject": "Neuer Kontoauszug verfügbar", "sender": "bank@y.de", "body": "Text"},
+    ]
+    ergebnisse = classifier.classify_batch(emails, regeln)
+    assert ergebnisse["a"]["kategorie"] == "rechnung"
+    assert ergebnisse["b"]["kategorie"] == "bank"
+    assert model.anfragen == 1 and model.prompt_tokens > 0
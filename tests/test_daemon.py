@@ -0,0 +1,78 @@
+import datetime
+import threading
+import time
+from unittest.mock import MagicMock
+
+import daemon
+import gmail_utils
+from daemon import Daemon, PollIntervall
+
+
+def test_poll_intervall_backoff_und_reset():
+    intervall = PollIntervall(minimum=10, maximum=60, faktor=2)
+    assert [intervall.naechstes(0) for _ in range(4)] == [20, 40, 60, 60]
+    assert intervall.naechstes(3) == 10
+
+
+def test_daemon_ruft_ab_bis_zum_stopp(monkeypatch):
+    monkeypatch.setattr(daemon, "erneuere_credentials", lambda creds: False)
+    monkeypatch.setattr(daemon.metriken, "schreibe", lambda: None)
+    sitzung = MagicMock()
+    ergebnisse = iter([5, 0, 0])
+    wartezeiten = []
+
+    d = Daemon(sitzung, PollIntervall(minimum=0.001, maximum=0.004), training_intervall=3600)
+
+    def verarbeite_neue():
+        neue = next(ergebnisse)
+        if d.abrufe == 2:
+            d.stoppe()
+        return neue
+    sitzung.verarbeite_neue.side_effect = verarbeite_neue
+    original = d.intervall.naechstes
+    d.intervall.naechstes = lambda neue: wartezeiten.append(original(neue)) or wartezeiten[-1]
+
+    d.ausfuehren()
+    assert d.abrufe == 3
+    assert wartezeiten == [0.001, 0.002, 0.004]
+    sitzung.lerne.assert_called_once_with()
+    sitzung.beenden.assert_called_once()
+
+
+def test_erneuere_credentials_nur_kurz_vor_ablauf(tmp_path):
+    creds = MagicMock()
+    creds.refresh_token = "r"
+    creds.to_json.return_value = "{}"
+    jetzt = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+    creds.expiry = jetzt + datetime.timedelta(hours=1)
+    assert not gmail_utils.erneuere_credentials(creds, str(tmp_path / "token.json"), vorlauf=300)
+    creds.expiry = jetzt + datetime.timedelta(seconds=60)
+    assert gmail_utils.erneuere_credentials(creds, str(tmp_path / "token.json"), vorlauf=300)
+    creds.refresh.assert_called_once()
+    assert (tmp_path / "token.json").read_text() == "{}"
+
+
+def test_beenden_erst_nach_laufendem_abgleich(monkeypatch):
+    monkeypatch.setattr(daemon, "erneuere_credentials", lambda creds: False)
+    monkeypatch.setattr(daemon, "get_label_registry", lambda service: MagicMock())
+    monkeypatch.setattr(daemon.metriken, "schreibe", lambda: None)
+    sitzung = MagicMock()
+    d = Daemon(sitzung, PollIntervall(minimum=0.001, maximum=0.001), training_intervall=0.001)
+    im_abgleich = threading.Event()
+    ablauf = []
+
+    def lerne(service=None):
+        if service is None:
+            return
+        # Abgleich im Hintergrund läuft noch, während der Daemon gestoppt wird
+        im_abgleich.set()
+        d.stoppe()
+        time.sleep(0.05)
+        ablauf.append("lerne fertig")
+    sitzung.lerne.side_effect = lerne
+    sitzung.verarbeite_neue.side_effect = lambda: im_abgleich.wait(5) and 0
+    sitzung.beenden.side_effect = lambda: ablauf.append("beenden")
+
+    d.ausfuehren()
+    assert ablauf == ["lerne fertig", "beenden"]
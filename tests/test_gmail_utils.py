@@ -0,0 +1,157 @@
+import pytest
+from unittest.mock import MagicMock
+from googleapiclient.errors import HttpError
+
+import gmail_utils
+from gmail_utils import batch_execute, batch_get_messages, move_emails_to_labels
+from rate_limit import RateLimiter
+
+
+@pytest.fixture(autouse=True)
+def ohne_quota_limit(monkeypatch):
+    monkeypatch.setattr(gmail_utils, "gmail_quota", RateLimiter(0))
+
+
+class FakeResp(dict):
+    def __init__(self, status):
+        super().__init__()
+        self.status = status
+        self.reason = "fake"
+
+
+class FakeBatch:
+    """Simuliert BatchHttpRequest: ruft für jede Teilanfrage den Callback auf."""
+
+    def __init__(self, service):
+        self._service = service
+        self._eintraege = []
+
+    def add(self, request, callback=None, request_id=None):
+        self._eintraege.append((request, callback, request_id))
+
+    def execute(self):
+        self._service.batch_aufrufe += 1
+        if self._service.batch_aufrufe in self._service.batch_ausnahmen:
+            raise self._service.batch_ausnahmen[self._service.batch_aufrufe]
+        for request, callback, request_id in self._eintraege:
+            fehler = self._service.fehler.get(request_id)
+            if fehler:
+                self._service.fehler[request_id] = fehler[1:]
+                callback(request_id, None, fehler[0])
+            else:
+                callback(request_id, {"id": request_id, "format": request["format"]}, None)
+
+
+def fake_service(fehler=None):
+    service = MagicMock()
+    service.batch_aufrufe = 0
+    service.batch_ausnahmen = {}
+    service.fehler = fehler or {}
+    service.new_batch_http_request.side_effect = lambda: FakeBatch(service)
+    service.users.return_value.messages.return_value.get.side_effect = lambda **kw: kw
+    return service
+
+
+def http_error(status):
+    return HttpError(FakeResp(status), b"")
+
+
+def test_batch_get_messages_chunks(monkeypatch):
+    service = fake_service()
+    ids = [f"m{i}" for i in range(120)]
+    result = batch_get_messages(service, ids, chunk_size=50)
+    assert set(result) == set(ids)
+    assert result["m0"]["format"] == "full"
+    assert service.batch_aufrufe == 3
+
+
+def test_batch_execute_wiederholt_nur_fehlgeschlagene(monkeypatch):
+    monkeypatch.setattr(gmail_utils.time, "sleep", lambda s: None)
+    service = fake_service({"m1": [http_error(429)], "m2": [http_error(404)]})
+    get = service.users().messages().get
+    ergebnisse, fehler = batch_execute(service, ["m0", "m1", "m2"], lambda i: get(id=i, format="full"))
+    assert set(ergebnisse) == {"m0", "m1"}
+    assert set(fehler) == {"m2"}
+    # Zweiter Durchlauf enthält nur die wiederholbare Teilanfrage m1
+    assert service.batch_aufrufe == 2
+
+
+def test_batch_execute_ganzer_batch_scheitert_im_zweiten_versuch(monkeypatch):
+    monkeypatch.setattr(gmail_utils.time, "sleep", lambda s: None)
+    service = fake_service({"m1": [http_error(429)]})
+    service.batch_ausnahmen[2] = ConnectionError("Verbindung abgebrochen")
+    get = service.users().messages().get
+    ergebnisse, fehler = batch_execute(service, ["m0", "m1"], lambda i: get(id=i, format="full"))
+    # m1 scheitert erst einzeln, dann mit dem ganzen Batch und wird trotzdem ein drittes Mal versucht
+    assert set(ergebnisse) == {"m0", "m1"} and fehler == {}
+    assert service.batch_aufrufe == 3
+
+    service = fake_service({"m1": [http_error(429)]})
+    service.batch_ausnahmen.update({2: ConnectionError("weg"), 3: ConnectionError("immer noch weg")})
+    ergebnisse, fehler = batch_execute(service, ["m0", "m1"], lambda i: get(id=i, format="full"), max_versuche=3)
+    assert set(ergebnisse) == {"m0"} and isinstance(fehler["m1"], ConnectionError)
+
+
+def test_move_emails_to_labels_sammelt_fehler_pro_gruppe():
+    service = MagicMock()
+    batch_modify = service.users.return_value.messages.return_value.batchModify
+    batch_modify.return_value.execute.side_effect = [http_error(400), {}]
+    fehler = move_emails_to_labels(service, {"Label_1": ["a"], "Label_2": ["b"]})
+    assert list(fehler) == ["Label_1"]
+    assert batch_modify.call_count == 2
+
+
+def test_move_emails_to_labels_gruppiert():
+    service = MagicMock()
+    move_emails_to_labels(service, {"Label_1": ["a", "b", "a"], "Label_2": ["c"]})
+    calls = service.users.return_value.messages.return_value.batchModify.call_args_list
+    assert len(calls) == 2
+    assert calls[0].kwargs["body"]["ids"] == ["a", "b"]
+    assert calls[1].kwargs["body"]["addLabelIds"] == ["Label_2"]
+
+
+def label_service(labels):
+    service = MagicMock()
+    service.users.return_value.labels.return_value.list.return_value.execute.side_effect = \
+        lambda: {"labels": list(labels)}
+    return service
+
+
+def test_label_registry_lookup_ohne_weitere_list_aufrufe():
+    service = label_service([{"id": "Label_1", "name": "Rechnungen"}, {"id": "INBOX", "name": "INBOX"}])
+    registry = gmail_utils.LabelRegistry(service)
+    assert registry.get_id("rechnungen") == "Label_1"
+    assert registry.get_or_create("RECHNUNGEN") == "Label_1"
+    assert registry.get_name("INBOX") == "INBOX"
+    assert registry.namen() == ["rechnungen", "inbox"]
+    assert service.users.return_value.labels.return_value.list.call_count == 1
+
+
+def test_label_registry_legt_fehlendes_label_an():
+    service = label_service([])
+    service.users.return_value.labels.return_value.create.return_value.execute.return_value = \
+        {"id": "Label_9", "name": "Termine"}
+    registry = gmail_utils.LabelRegistry(service)
+    assert registry.get_or_create("Termine") == "Label_9"
+    assert registry.get_or_create("termine") == "Label_9"
+    assert service.users.return_value.labels.return_value.create.call_count == 1
+
+
+def test_label_registry_409_konflikt():
+    labels = []
+    service = label_service(labels)
+
+    def create_conflict():
+        labels.append({"id": "Label_5", "name": "Updates"})
+        raise http_error(409)
+
+    service.users.return_value.labels.return_value.create.return_value.execute.side_effect = create_conflict
+    registry = gmail_utils.LabelRegistry(service)
+    assert registry.get_or_create("Updates") == "Label_5"
+
+
+def test_get_label_registry_wird_wiederverwendet():
+    service = label_service([{"id": "Label_1", "name": "Rechnungen"}])
+    assert gmail_utils.get_or_create_label(service, "Rechnungen") == "Label_1"
+    assert gmail_utils.get_all_labels(service) == {"Label_1": "Rechnungen"}
+    assert service.users.return_value.labels.return_value.list.call_count == 1
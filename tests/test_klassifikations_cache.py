@@ -0,0 +1,40 @@
+from klassifikations_cache import KlassifikationsCache, fingerprint
+
+ERGEBNIS = {"kategorie": "newsletter", "ist_newsletter": True, "ist_unbezahlt": False, "unsubscribe_url": None}
+
+
+def test_fingerprint_maskiert_zahlen_und_daten():
+    a = fingerprint("Ihr Kontoauszug vom 01.07.2025 (Nr. 12)", "Bank <info@bank.de>", "Hallo, Stand 1.234 EUR")
+    b = fingerprint("Ihr Kontoauszug vom 15.08.2025 (Nr. 13)", "Bank Service <INFO@bank.de>", "Hallo, Stand 99 EUR")
+    c = fingerprint("Ihr Kontoauszug vom 15.08.2025 (Nr. 13)", "andere@bank.de", "Hallo, Stand 99 EUR")
+    assert a == b
+    assert a != c
+
+
+def test_lru_und_disk_stufe(tmp_path):
+    pfad = str(tmp_path / "cache.db")
+    cache = KlassifikationsCache(pfad, max_eintraege=1)
+    cache.pruefe_kategorien(["newsletter", "rechnung"])
+    cache.set("a", ERGEBNIS)
+    cache.set("b", ERGEBNIS)
+    assert cache.get("b") == ERGEBNIS
+    assert cache.get("a") == ERGEBNIS  # aus dem Speicher verdrängt, aber auf Disk
+    assert cache.get("x") is None
+    assert (cache.treffer_speicher, cache.treffer_disk, cache.fehltreffer) == (1, 1, 1)
+
+    neu = KlassifikationsCache(pfad)
+    neu.pruefe_kategorien(["rechnung", "newsletter"])
+    assert neu.get("a") == ERGEBNIS
+
+
+def test_ttl_und_kategorien_invalidierung(tmp_path):
+    pfad = str(tmp_path / "cache.db")
+    cache = KlassifikationsCache(pfad, ttl=0)
+    cache.set("a", ERGEBNIS)
+    assert cache.get("a") is None
+
+    cache = KlassifikationsCache(pfad)
+    cache.pruefe_kategorien(["newsletter"])
+    cache.set("a", ERGEBNIS)
+    cache.pruefe_kategorien(["newsletter", "termine"])
+    assert cache.get("a") is None
@@ -0,0 +1,91 @@
+import json
+import logging
+import multiprocessing
+
+import pytest
+
+import ai_classify
+import konten
+import lokaler_classifier
+import main
+from bench.fake_gemini import FakeGeminiModel, erzeuge_classifier
+from bench.fake_gmail import FakeGmailService, FakePostfach
+from konten import Konto, lade_konten
+from rate_limit import RateLimiter
+
+
+def test_lade_konten_pfade_und_validierung(tmp_path):
+    datei = tmp_path / "konten.json"
+    datei.write_text(json.dumps({"konten": [
+        {"name": "mario", "max_emails": 10},
+        {"name": "team", "token": "/geheim/team.json", "gmail_quota_pro_sekunde": 50},
+    ]}), encoding="utf-8")
+    (mario, team), credentials = lade_konten(str(datei))
+    assert credentials == str(tmp_path / "credentials.json")
+    assert mario.regeln == str(tmp_path / "konten" / "mario" / "regeln.json")
+    assert mario.max_emails == 10 and mario.gemini_anfragen_pro_minute is None
+    assert team.token == "/geheim/team.json" and team.gmail_quota_pro_sekunde == 50
+
+    datei.write_text(json.dumps({"konten": [{"name": "a"}, {"name": "a"}]}), encoding="utf-8")
+    with pytest.raises(ValueError):
+        lade_konten(str(datei))
+    datei.write_text(json.dumps({"konten": [{"name": "a", "tokn": "x"}]}), encoding="utf-8")
+    with pytest.raises(ValueError):
+        lade_konten(str(datei))
+
+
+def _fakes(monkeypatch, tmp_path, ungelesen=8):
+    service = FakeGmailService(FakePostfach(ungelesen=ungelesen, gelabelt_pro_label=5))
+    monkeypatch.setattr(konten, "lade_credentials", lambda *args, **kwargs: None)
+    # Prozessweite Limits nicht für die übrigen Tests umstellen
+    monkeypatch.setattr(konten, "gmail_quota", RateLimiter(0))
+    monkeypatch.setattr(konten, "gemini_limit", RateLimiter(0))
+    monkeypatch.setattr(main, "get_gmail_service", lambda creds=None: service)
+    monkeypatch.setattr(ai_classify, "_classifier_instance",
+                        erzeuge_classifier(FakeGeminiModel(), str(tmp_path / "gemeinsamer_cache.db"), lokal=True))
+    monkeypatch.setattr(lokaler_classifier, "LOKALER_CLASSIFIER_DATEI", lokaler_classifier.LOKALER_CLASSIFIER_DATEI)
+    monkeypatch.setattr(lokaler_classifier, "LOKAL_KALIBRIERUNG_DATEI", lokaler_classifier.LOKAL_KALIBRIERUNG_DATEI)
+    return service
+
+
+def test_verarbeite_konto_eigene_dateien_und_limits(monkeypatch, tmp_path, caplog):
+    caplog.set_level(logging.INFO)
+    service = _fakes(monkeypatch, tmp_path)
+    konto = Konto("mario", verzeichnis=str(tmp_path / "mario"), max_emails=5, gmail_quota_pro_sekunde=0,
+                  gemini_anfragen_pro_minute=0)
+    bericht = konten.verarbeite_konto(konto)
+
+    assert bericht["status"] == "ok" and bericht["emails"] == 5
+    assert bericht["gmail_quota_einheiten"] > 0
+    # 3 außerhalb von max_emails des Kontos, 2 Reise-E-Mails ohne passende Kategorie
+    assert service.postfach.ungelesen_in_inbox() == 5
+    for datei in ("sync_state.json", "trainingsdaten.db", "lauf.log", "metriken.json"):
+        assert (tmp_path / "mario" / datei).exists()
+    assert konten.gmail_quota.rate == 0
+    assert "Postfach 'mario'" in (tmp_path / "mario" / "lauf.log").read_text(encoding="utf-8")
+
+
+def test_verarbeite_konto_fehler_im_bericht(monkeypatch, tmp_path):
+    _fakes(monkeypatch, tmp_path)
+
+    def kein_token(*args, **kwargs):
+        raise RuntimeError("Kein gültiges Token")
+    monkeypatch.setattr(konten, "lade_credentials", kein_token)
+    bericht = konten.verarbeite_konto(Konto("team", verzeichnis=str(tmp_path / "team")))
+    assert bericht["status"] == "fehler" and "Token" in bericht["fehler"]
+    assert "team" in konten.bericht_text([bericht])
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="Fakes werden per fork vererbt")
+def test_fuehre_aus_verteilt_auf_prozesse(monkeypatch, tmp_path):
+    _fakes(monkeypatch, tmp_path)
+    liste = [Konto(name, verzeichnis=str(tmp_path / name), max_emails=3) for name in ("a", "b", "c")]
+    anteil = ai_classify.GEMINI_ANFRAGEN_PRO_MINUTE / 2
+    liste[1].gemini_anfragen_pro_minute = anteil * 10
+    liste[2].gemini_anfragen_pro_minute = anteil / 2
+    berichte = konten.fuehre_aus(liste, worker=2)
+    assert [b["konto"] for b in berichte] == ["a", "b", "c"]
+    assert all(b["status"] == "ok" and b["emails"] == 3 for b in berichte)
+    # Ohne eigenes Limit teilen sich die gleichzeitig laufenden Postfächer das Gemini-Limit,
+    # eigene Limits werden auf diesen Anteil begrenzt
+    assert [konto.gemini_anfragen_pro_minute for konto in liste] == [anteil, anteil, anteil / 2]
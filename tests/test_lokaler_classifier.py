@@ -0,0 +1,92 @@
+import json
+
+import lokaler_classifier
+from lokaler_classifier import LokalerClassifier
+
+
+def beispiel(msg_id, label, subject, sender, body=""):
+    return {"id": msg_id, "label": label, "subject": subject, "sender": sender, "body": body}
+
+
+def trainingsdaten(n=12):
+    daten = []
+    for i in range(n):
+        daten.append(beispiel(f"r{i}", "Rechnungen", f"Ihre Rechnung Nr. {4700 + i}", "Telekom <rechnung@telekom.de>",
+                              f"Rechnungsbetrag {i},99 EUR fällig"))
+        daten.append(beispiel(f"n{i}", "Newsletter", f"Sommer-Sale Woche {i}", "Shop <news@shop.de>",
+                              "Jetzt zugreifen, Angebote der Woche"))
+    return daten
+
+
+def test_vorhersage_sicher_und_zu_wenig_daten(monkeypatch):
+    modell = LokalerClassifier(pfad=None)
+    modell.trainiere(trainingsdaten(n=5))
+    assert modell.vorhersage("Rechnung", "rechnung@telekom.de", "") is None  # unter LOKAL_MIN_BEISPIELE
+    monkeypatch.setattr(lokaler_classifier, "LOKAL_MIN_BEISPIELE", 4)
+    label, p = modell.vorhersage("Ihre Rechnung Nr. 9999", "Telekom <rechnung@telekom.de>", "Rechnungsbetrag")
+    assert label == "Rechnungen" and p > 0.99
+    assert abs(sum(modell.wahrscheinlichkeiten("Hallo", "x@y.de", "").values()) - 1) < 1e-9
+
+
+def test_inkrementell_und_persistiert(tmp_path):
+    pfad = str(tmp_path / "modell.json")
+    daten = trainingsdaten()
+    modell = LokalerClassifier(pfad)
+    assert modell.trainiere(daten)
+    assert not modell.trainiere(list(daten))
+    modell.speichere()
+
+    geladen = LokalerClassifier(pfad)
+    assert len(geladen) == len(daten)
+    vorher = geladen.wahrscheinlichkeiten("Sommer-Sale", "news@shop.de", "")
+    assert vorher == modell.wahrscheinlichkeiten("Sommer-Sale", "news@shop.de", "")
+
+    # Umgelabeltes Beispiel wird abgezogen und neu gelernt, entferntes nur abgezogen
+    daten[0] = dict(daten[0], label="Newsletter")
+    assert geladen.trainiere(daten[:-1])
+    assert len(geladen) == len(daten) - 1
+    frisch = LokalerClassifier(pfad=None)
+    frisch.trainiere(daten[:-1])
+    assert geladen.wahrscheinlichkeiten("Rechnung", "x@telekom.de", "") == frisch.wahrscheinlichkeiten("Rechnung", "x@telekom.de", "")
+
+
+def test_classify_batch_fragt_gemini_nur_bei_unsicherheit(tmp_path, monkeypatch):
+    from test_ai_classify import BatchDummyModel, dummy_classifier
+    kalibrierung = tmp_path / "kalibrierung.jsonl"
+    monkeypatch.setattr(lokaler_classifier, "LOKAL_KALIBRIERUNG_DATEI", str(kalibrierung))
+    regeln = {"rechnung": {"keywords": [], "label": "Rechnungen"}}
+    emails = [
+        {"id": "a", "subject": "Ihre Rechnung Nr. 5000", "sender": "Telekom <rechnung@telekom.de>", "body": "Rechnungsbetrag"},
+        {"id": "b", "subject": "Sommer-Sale Woche 40", "sender": "Shop <news@shop.de>", "body": "Angebote"},
+        {"id": "c", "subject": "Hallo", "sender": "freund@privat.de", "body": "Wie geht's?"},
+    ]
+    model = BatchDummyModel(["unbekannt"])
+    classifier = dummy_classifier(model, tmp_path)
+    ergebnisse = classifier.classify_batch(emails, regeln, ["Newsletter"], trainingsdaten())
+
+    assert ergebnisse["a"]["kategorie"] == "rechnung"
+    assert ergebnisse["b"]["kategorie"] == "newsletter" and ergebnisse["b"]["ist_newsletter"]
+    assert ergebnisse["c"]["kategorie"] is None
+    # Nur die unsichere E-Mail geht an Gemini, ihre lokale Vorhersage landet im Kalibrierungsprotokoll
+    assert len(model.prompts) == 1 and "Hallo" in model.prompts[0]
+    zeilen = [json.loads(z) for z in kalibrierung.read_text(encoding="utf-8").splitlines()]
+    assert len(zeilen) == 1 and zeilen[0]["gemini"] is None and zeilen[0]["wahrscheinlichkeit"] < 0.9
+
+
+def test_mehrere_labels_und_systemlabels(monkeypatch):
+    monkeypatch.setattr(lokaler_classifier, "LOKAL_MIN_BEISPIELE", 4)
+    daten = trainingsdaten(n=5)
+    # Dieselbe E-Mail unter zwei Labels zählt für beide; Systemlabels werden nicht gelernt
+    daten.append(beispiel("x", "Rechnungen", "Rechnung und Angebot", "Shop <news@shop.de>"))
+    daten.append(beispiel("x", "Wichtig", "Rechnung und Angebot", "Shop <news@shop.de>"))
+    daten.append(beispiel("r0", "UNREAD", "Ihre Rechnung Nr. 4700", "Telekom <rechnung@telekom.de>"))
+    daten.append(beispiel("n0", "CATEGORY_PROMOTIONS", "Sommer-Sale Woche 0", "Shop <news@shop.de>"))
+    modell = LokalerClassifier(pfad=None)
+    modell.trainiere(daten)
+    assert len(modell) == 12
+    assert set(modell.wahrscheinlichkeiten("Rechnung", "x@y.de", "")) == {"Rechnungen", "Newsletter", "Wichtig"}
+
+    # Entfernt eines der beiden Labels nur dessen Beispiel
+    assert modell.trainiere([item for item in daten if item["label"] != "Wichtig"])
+    assert len(modell) == 11
+    assert set(modell.wahrscheinlichkeiten("Rechnung", "x@y.de", "")) == {"Rechnungen", "Newsletter"}
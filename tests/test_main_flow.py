@@ -56,3 +56,90 @@ def test_main_flow(mock_log_kat, mock_log_unsub, mock_save_rules, mock_load_rule
     # Umgebungsvariablen patchen
     with patch.dict(os.environ, {"REGELN_DATEI": "regeln.json", "LOG_DATEI": "mail_log.txt", "MAX_EMAILS": "50", "UNSUBSCRIBE_LOG": "unsubscribe_log.txt"}):
         main()
+
+
+def test_lade_emails_metadaten_zuerst(monkeypatch):
+    import main
+    from regel_engine import RegelEngine
+
+    def meta(msg_id, subject):
+        return {"id": msg_id, "labelIds": ["INBOX", "UNREAD"], "snippet": "",
+                "payload": {"headers": [{"name": "Subject", "value": subject}, {"name": "From", "value": "a@b.de"}]}}
+
+    metadaten = {"1": meta("1", "Ihre Rechnung"), "2": meta("2", "Hallo")}
+    voll_geladen = []
+
+    def fake_full(service, ids):
+        voll_geladen.extend(ids)
+        return {i: dict(metadaten[i], payload=dict(metadaten[i]["payload"], body={})) for i in ids}
+
+    monkeypatch.setattr(main, "batch_get_metadata", lambda service, ids: {i: metadaten[i] for i in ids if i in metadaten})
+    monkeypatch.setattr(main, "batch_get_full", fake_full)
+    engine = RegelEngine({"rechnung": {"keywords": ["rechnung"], "label": "Rechnungen"}})
+
+    geladen, fehlend = main.lade_emails(MagicMock(), [{"id": "1"}, {"id": "2"}, {"id": "3"}], engine)
+    ergebnisse = {msg["id"]: result for msg, _, _, result in geladen}
+    assert ergebnisse["1"]["kategorie"] == "rechnung"
+    assert ergebnisse["2"] is None
+    # Body nur für die nicht per Header entscheidbare E-Mail
+    assert voll_geladen == ["2"]
+    assert fehlend == ["3"]
+    assert (engine.treffer, engine.anfragen) == (1, 2)
+
+
+def test_import_laedt_gemini_nicht():
+    import subprocess
+    import sys
+    code = "import main, sys; assert 'google.generativeai' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.dirname(__file__)), check=True)
+
+
+def test_ohne_neue_emails_kein_training(monkeypatch, tmp_path):
+    import main
+    from bench.fake_gmail import FakeGmailService, FakePostfach
+
+    monkeypatch.chdir(tmp_path)
+    service = FakeGmailService(FakePostfach(ungelesen=0, gelabelt_pro_label=1))
+    monkeypatch.setattr(main, "lade_credentials", lambda: None)
+    monkeypatch.setattr(main, "get_gmail_service", lambda creds=None: service)
+    monkeypatch.setattr(main, "TRAININGS_DB", str(tmp_path / "t.db"))
+    monkeypatch.setattr(main, "SYNC_STATE_DATEI", str(tmp_path / "sync.json"))
+    monkeypatch.setattr(main, "REGELN_DATEI", str(tmp_path / "regeln.json"))
+    lerne = MagicMock()
+    monkeypatch.setattr(main.Sitzung, "lerne", lerne)
+
+    main.main([])
+    lerne.assert_not_called()
+    assert set(service.aufrufe) == {"getProfile", "messages.list"}
+
+
+def test_gemini_ausfall_schreibt_history_id_nicht_fort(monkeypatch, tmp_path):
+    import ai_classify
+    import main as ablauf
+    from bench.fake_gemini import FakeGeminiModel, erzeuge_classifier
+    from bench.fake_gmail import FakeGmailService, FakePostfach
+    from sync_state import SyncState
+
+    postfach = FakePostfach(ungelesen=0, gelabelt_pro_label=3)
+    service = FakeGmailService(postfach)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ablauf, "get_gmail_service", lambda creds=None: service)
+    model = FakeGeminiModel(fehlerquote=1.0, fehler_code=400)
+    monkeypatch.setattr(ai_classify, "_classifier_instance", erzeuge_classifier(model, "cache.db"))
+    sitzung = ablauf.Sitzung(None, sync_state_datei="sync.json")
+    try:
+        sitzung.lauf()
+        stand = SyncState("sync.json").history_id
+        assert stand is not None
+
+        # Neue E-Mails, die Gemini zuordnen müsste (keine Regel, kein Cache): Gemini fällt aus
+        postfach.fuege_ungelesene_hinzu(4)
+        assert sitzung.lauf() == 4
+        assert SyncState("sync.json").history_id == stand
+
+        # Nach dem Ausfall liefert der nächste Lauf dieselben E-Mails erneut
+        model.fehlerquote = 0.0
+        assert sitzung.lauf() == 4
+        assert SyncState("sync.json").history_id != stand
+    finally:
+        sitzung.beenden()
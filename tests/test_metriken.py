@@ -0,0 +1,65 @@
+import json
+from types import SimpleNamespace
+
+import ai_classify
+import metriken as metriken_modul
+from metriken import Histogramm, Metriken, gemessen
+
+
+def test_zaehler_histogramm_und_ausgabe(tmp_path):
+    m = Metriken(aktiv=True)
+    m.zaehle("gmail_quota_einheiten", 5)
+    m.zaehle("gmail_quota_einheiten", 50)
+    m.beobachte("gemini_anfrage", 0.2)
+    m.beobachte("gemini_anfrage", 3.0)
+    with m.messe("email_label"):
+        pass
+
+    zusammenfassung = m.zusammenfassung()
+    assert zusammenfassung["zaehler"]["gmail_quota_einheiten"] == 55
+    assert zusammenfassung["zeiten"]["gemini_anfrage"]["anzahl"] == 2
+    assert zusammenfassung["zeiten"]["gemini_anfrage"]["p50_s"] == 0.25
+    assert zusammenfassung["zeiten"]["email_label"]["anzahl"] == 1
+
+    m.schreibe(str(tmp_path / "m.json"), str(tmp_path / "m.prom"))
+    assert json.loads((tmp_path / "m.json").read_text())["zaehler"]["gmail_quota_einheiten"] == 55
+    prom = (tmp_path / "m.prom").read_text()
+    assert "mail_ai_gmail_quota_einheiten_total 55" in prom
+    assert 'mail_ai_gemini_anfrage_sekunden_bucket{le="+Inf"} 2' in prom
+
+
+def test_quantil_nie_ueber_maximum():
+    histogramm = Histogramm()
+    for sekunden in (0.06, 0.07, 0.08):
+        histogramm.beobachte(sekunden)
+    # Bucket-Obergrenze wäre 0.1
+    assert histogramm.quantil(0.5) == 0.08 and histogramm.quantil(0.95) == 0.08
+
+
+def test_ausgeschaltet_ohne_wirkung(tmp_path, monkeypatch):
+    m = Metriken(aktiv=False)
+    monkeypatch.setattr(metriken_modul, "metriken", m)
+
+    @gemessen("funktion")
+    def funktion():
+        return 42
+
+    assert funktion() == 42
+    with m.messe("x"):
+        m.zaehle("y")
+    m.schreibe(str(tmp_path / "m.json"))
+    assert m.zusammenfassung()["zaehler"] == {} and m.zusammenfassung()["zeiten"] == {}
+    assert not (tmp_path / "m.json").exists()
+
+
+def test_gemini_tokens_aus_usage_metadata(monkeypatch, tmp_path):
+    m = Metriken(aktiv=True)
+    monkeypatch.setattr(ai_classify, "metriken", m)
+    classifier = ai_classify.GeminiClassifier(api_key="test", cache_pfad=str(tmp_path / "cache.db"))
+    usage = SimpleNamespace(prompt_token_count=120, candidates_token_count=3)
+    classifier._model = SimpleNamespace(generate_content=lambda prompt: SimpleNamespace(text="x", usage_metadata=usage))
+
+    classifier._generate("prompt")
+    assert m.zaehler("gemini_anfragen") == 1
+    assert m.zaehler("gemini_prompt_tokens") == 120
+    assert m.zaehler("gemini_antwort_tokens") == 3
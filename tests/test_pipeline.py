@@ -0,0 +1,96 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+import main
+import rate_limit
+from pipeline import Pipeline, Stufe
+from rate_limit import RateLimiter, mit_backoff
+from rules_utils import RulesStore, speichere_regeln
+
+
+def test_pipeline_reicht_alle_elemente_durch():
+    ergebnis = []
+    lock = threading.Lock()
+
+    def verdoppeln(items, emit):
+        for item in items:
+            emit(item * 2)
+
+    def sammeln(items, emit):
+        with lock:
+            ergebnis.extend(items)
+
+    pipeline = Pipeline([Stufe("x2", verdoppeln, worker=3, batch_groesse=4), Stufe("sammeln", sammeln, batch_groesse=10)])
+    pipeline.ausfuehren(range(100))
+    assert sorted(ergebnis) == [i * 2 for i in range(100)]
+    assert pipeline.stufen[0].verarbeitet == 100
+    assert pipeline.fehler == 0
+
+
+def test_pipeline_zaehlt_fehler():
+    def kaputt(items, emit):
+        raise RuntimeError("kaputt")
+
+    pipeline = Pipeline([Stufe("kaputt", kaputt, worker=2)])
+    pipeline.ausfuehren([1, 2, 3])
+    assert pipeline.fehler == 3
+
+
+def test_rate_limiter_begrenzt_rate():
+    limiter = RateLimiter(rate=100, kapazitaet=1)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.erwerbe()
+    assert time.monotonic() - start >= 0.04
+
+
+class Fehler429(Exception):
+    code = 429
+
+
+def test_mit_backoff_wiederholt_bei_429(monkeypatch):
+    monkeypatch.setattr(rate_limit.time, "sleep", lambda s: None)
+    aufrufe = []
+
+    def funktion():
+        aufrufe.append(1)
+        if len(aufrufe) < 3:
+            raise Fehler429()
+        return "ok"
+
+    assert mit_backoff(funktion) == "ok"
+    assert len(aufrufe) == 3
+    with pytest.raises(ValueError):
+        mit_backoff(lambda: (_ for _ in ()).throw(ValueError()))
+
+
+def test_klassifiziere_pipeline(monkeypatch, tmp_path):
+    full_msgs = {
+        str(i): {"id": str(i), "labelIds": ["INBOX", "UNREAD"],
+                 "payload": {"headers": [{"name": "Subject", "value": f"Mail {i}"}], "body": {}}}
+        for i in range(20)
+    }
+    verschoben = {}
+    monkeypatch.setattr(main, "batch_get_metadata", lambda service, ids: {i: full_msgs[i] for i in ids})
+    monkeypatch.setattr(main, "batch_get_full", lambda service, ids: {i: full_msgs[i] for i in ids})
+    monkeypatch.setattr(main, "classify_emails_batch", lambda emails, *a: {
+        m["id"]: {"kategorie": "rechnung", "ist_newsletter": False, "ist_unbezahlt": False} for m in emails})
+    monkeypatch.setattr(main, "get_or_create_label", lambda service, name: "Label_1")
+    def fake_move(service, verschiebungen):
+        for label_id, ids in verschiebungen.items():
+            verschoben.setdefault(label_id, []).extend(ids)
+        return {}
+    monkeypatch.setattr(main, "move_emails_to_labels", fake_move)
+    regel_engine = MagicMock()
+    regel_engine.klassifiziere.return_value = None
+    speichere_regeln({"rechnung": {"keywords": [], "label": "Rechnungen"}}, str(tmp_path / "regeln.json"))
+
+    ok = main.klassifiziere_pipeline(MagicMock(), MagicMock, [{"id": i} for i in full_msgs],
+                                     RulesStore(str(tmp_path / "regeln.json")), [], [], regel_engine)
+    assert ok
+    # Vorläufig per Header, danach einmal pro E-Mail in der Parse-Stufe mit Body
+    assert regel_engine.klassifiziere.call_count == 2 * len(full_msgs)
+    assert sorted(verschoben["Label_1"]) == sorted(full_msgs)
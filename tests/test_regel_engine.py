@@ -0,0 +1,38 @@
+from regel_engine import RegelEngine
+
+REGELN = {
+    "rechnung": {"keywords": ["Rechnung", "payment reminder", "payment"], "label": "Rechnungen"},
+    "newsletter": {"keywords": ["newsletter", "abbestellen"], "label": "Newsletter"},
+    "termine": {"keywords": ["meeting"], "label": "Termine"},
+    "persoenlich": {"keywords": [], "label": "Persoenlich"},
+}
+
+
+def test_eindeutiger_betreff_treffer():
+    engine = RegelEngine(REGELN)
+    result = engine.klassifiziere("Ihre RECHNUNG für Juni", "firma@example.com", "")
+    assert result["kategorie"] == "rechnung"
+    assert not result["ist_newsletter"]
+
+
+def test_wortgrenzen_und_casefolding():
+    engine = RegelEngine(REGELN)
+    # "Rechnungsstellung" enthält "rechnung" nur als Wortteil
+    assert engine.bewerte("Rechnungsstellung", "", "")["rechnung"] == 0
+    assert engine.bewerte("Payment Reminder", "", "")["rechnung"] == 3
+
+
+def test_mehrdeutig_geht_an_gemini():
+    engine = RegelEngine(REGELN)
+    assert engine.klassifiziere("Newsletter: Rechnung", "", "") is None
+    assert engine.klassifiziere("Hallo", "", "Wie geht's?") is None
+    assert engine.klassifiziere("Hallo", "", "Newsletter abbestellen") is None  # unter der Schwelle
+
+
+def test_newsletter_und_bericht():
+    engine = RegelEngine(REGELN)
+    result = engine.klassifiziere("Unser Newsletter", "news@shop.de", "Hier abbestellen")
+    assert result["ist_newsletter"]
+    engine.klassifiziere("Hallo", "", "")
+    assert engine.treffer == 1 and engine.anfragen == 2
+    assert "1/2" in engine.bericht()
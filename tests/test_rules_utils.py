@@ -0,0 +1,72 @@
+import json
+import os
+import threading
+
+from rules_utils import RulesStore, lade_regeln, speichere_regeln
+
+
+def test_stelle_sicher_findet_normalisiert_und_legt_neu_an(tmp_path):
+    pfad = str(tmp_path / "regeln.json")
+    speichere_regeln({"Rechnung": {"keywords": [], "label": "Rechnungen"}}, pfad)
+    store = RulesStore(pfad, flush_intervall=3600)
+
+    assert store.stelle_sicher(" rechnung ") == ("Rechnung", "Rechnungen", False)
+    assert store.stelle_sicher("reisen") == ("reisen", "Reisen", True)
+    assert store.stelle_sicher("Reisen") == ("reisen", "Reisen", False)
+    # Erst beim flush() wird geschrieben
+    assert "reisen" not in lade_regeln(pfad)
+    store.flush()
+    assert lade_regeln(pfad)["reisen"]["label"] == "Reisen"
+    assert not store.dirty
+
+
+def test_flush_fuehrt_aenderungen_anderer_prozesse_zusammen(tmp_path):
+    pfad = str(tmp_path / "regeln.json")
+    speichere_regeln({}, pfad)
+    a = RulesStore(pfad, flush_intervall=3600)
+    b = RulesStore(pfad, flush_intervall=3600)
+    a.stelle_sicher("reisen")
+    b.stelle_sicher("bank")
+    a.flush()
+    b.flush()
+    assert set(lade_regeln(pfad)) == {"reisen", "bank"}
+    # Hot Reload über mtime
+    assert a.aktualisiere()
+    assert a.finde("BANK") == "bank"
+
+
+def test_gleichzeitige_worker_verlieren_keine_regel(tmp_path):
+    pfad = str(tmp_path / "regeln.json")
+    store = RulesStore(pfad, flush_intervall=0)
+
+    def worker(n):
+        for i in range(20):
+            store.stelle_sicher(f"kategorie {n}-{i}")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    store.flush()
+    with open(pfad, encoding="utf-8") as f:
+        assert len(json.load(f)) == 80
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_leser_iterieren_waehrend_neuladen_und_neuanlage(tmp_path):
+    pfad = str(tmp_path / "regeln.json")
+    speichere_regeln({"bank": {"keywords": [], "label": "Bank"}, "shop": {"keywords": [], "label": "Shop"}}, pfad)
+    store = RulesStore(pfad)
+    # Ein Klassifizierungs-Thread ist mitten in regeln.items()
+    laufend = iter(store.regeln.items())
+    next(laufend)
+
+    store.stelle_sicher("Reisen")
+    speichere_regeln({"bank": {"keywords": [], "label": "Bank"}}, pfad)
+    os.utime(pfad, ns=(1, 1))
+    assert store.aktualisiere()
+
+    assert [k for k, _ in laufend] == ["shop"]
+    assert set(store.regeln) == {"bank", "Reisen"}
+    assert store.finde("reisen") == "Reisen" and store.finde("shop") is None
@@ -0,0 +1,65 @@
+from unittest.mock import MagicMock
+from googleapiclient.errors import HttpError
+
+from sync_state import SyncState, hole_neue_nachrichten
+
+
+class FakeResp(dict):
+    status = 404
+    reason = "Not Found"
+
+
+def test_voll_scan_paginiert(tmp_path):
+    service = MagicMock()
+    service.users.return_value.getProfile.return_value.execute.return_value = {"historyId": "500"}
+    service.users.return_value.messages.return_value.list.return_value.execute.side_effect = [
+        {"messages": [{"id": "1"}, {"id": "2"}], "nextPageToken": "p2"},
+        {"messages": [{"id": "3"}]},
+    ]
+    state = SyncState(str(tmp_path / "state.json"))
+    messages, history_id = hole_neue_nachrichten(service, state)
+    assert [m["id"] for m in messages] == ["1", "2", "3"]
+    assert history_id == "500"
+
+    state.speichere(history_id)
+    assert SyncState(str(tmp_path / "state.json")).history_id == "500"
+
+
+def test_voll_scan_mit_limit_schreibt_stand_nicht_fort(tmp_path):
+    service = MagicMock()
+    service.users.return_value.messages.return_value.list.return_value.execute.return_value = {
+        "messages": [{"id": str(i)} for i in range(10)], "nextPageToken": "p2"
+    }
+    messages, history_id = hole_neue_nachrichten(service, SyncState(str(tmp_path / "s.json")), max_emails=5)
+    assert len(messages) == 5
+    assert history_id is None
+
+
+def test_inkrementeller_abruf(tmp_path):
+    pfad = tmp_path / "state.json"
+    SyncState(str(pfad)).speichere("100")
+    service = MagicMock()
+    service.users.return_value.history.return_value.list.return_value.execute.side_effect = [
+        {"history": [{"messagesAdded": [{"message": {"id": "a", "labelIds": ["INBOX", "UNREAD"]}}]}],
+         "nextPageToken": "n", "historyId": "150"},
+        {"history": [{"messagesAdded": [
+            {"message": {"id": "b", "labelIds": ["INBOX"]}},
+            {"message": {"id": "a", "labelIds": ["INBOX", "UNREAD"]}},
+        ]}], "historyId": "160"},
+    ]
+    messages, history_id = hole_neue_nachrichten(service, SyncState(str(pfad)))
+    assert [m["id"] for m in messages] == ["a"]
+    assert history_id == "160"
+    service.users.return_value.messages.return_value.list.assert_not_called()
+
+
+def test_abgelaufene_history_id_faellt_auf_voll_scan_zurueck(tmp_path):
+    pfad = tmp_path / "state.json"
+    SyncState(str(pfad)).speichere("1")
+    service = MagicMock()
+    service.users.return_value.history.return_value.list.return_value.execute.side_effect = HttpError(FakeResp(), b"")
+    service.users.return_value.getProfile.return_value.execute.return_value = {"historyId": "900"}
+    service.users.return_value.messages.return_value.list.return_value.execute.return_value = {"messages": [{"id": "x"}]}
+    messages, history_id = hole_neue_nachrichten(service, SyncState(str(pfad)))
+    assert messages == [{"id": "x"}]
+    assert history_id == "900"
@@ -0,0 +1,74 @@
+from text_normalisierung import html_zu_text, kuerze_auf_tokens, normalisiere_email, normalisiere_text, zaehle_tokens
+
+
+def test_html_ohne_script_und_style():
+    html = "<html><head><style>p {color: red}</style></head><body><p>Hallo&nbsp;Welt</p><script>x()</script><div>Zweite Zeile</div></body></html>"
+    text = normalisiere_text(html)
+    assert "color" not in text and "x()" not in text
+    assert text.split("\n") == ["Hallo Welt", "", "Zweite Zeile"]
+
+
+def test_zitate_signatur_und_fusszeilen_entfernt():
+    body = (
+        "Hallo Maria,\n\nanbei die Unterlagen.\n\n"
+        "Impressum: Muster GmbH, Amtsgericht München HRB 1234\n"
+        "Newsletter abbestellen: https://example.com/u\n"
+        "-- \nMax Mustermann\nTel. 0123\n"
+        "Am 01.07.2025 schrieb Maria <m@example.com>:\n> alte Nachricht\n"
+    )
+    text = normalisiere_text(body)
+    assert "Unterlagen" in text
+    assert "Amtsgericht" not in text
+    assert "abbestellen" in text  # Abmelde-Hinweis bleibt als Newsletter-Signal
+    assert "Mustermann" not in text and "alte Nachricht" not in text
+
+
+def test_lange_urls_gekuerzt():
+    text = normalisiere_text("Mehr unter https://click.example.com/track?id=" + "a" * 200 + " jetzt")
+    assert text == "Mehr unter [Link: click.example.com] jetzt"
+
+
+def test_token_budget():
+    text = " ".join(["wort"] * 1000)
+    gekuerzt = kuerze_auf_tokens(text, 100)
+    assert zaehle_tokens(gekuerzt) <= 100
+    assert len(normalisiere_text(text, max_tokens=50).split()) == 25
+
+
+def test_memoisierung_pro_id():
+    assert normalisiere_email("id-1", "<p>Erste Fassung</p>") == "Erste Fassung"
+    assert normalisiere_email("id-1", "<p>Erste Fassung</p>") == "Erste Fassung"
+    # Metadaten-Abruf ohne Body darf den späteren Vollabruf nicht verdecken
+    assert normalisiere_email("id-2", "") == ""
+    assert normalisiere_email("id-2", "Volltext") == "Volltext"
+
+
+def test_kaputtes_html():
+    assert "Text" in html_zu_text("<div><p>Text</span")
+
+
+def test_fusszeilen_woerter_im_inhalt_bleiben():
+    body = (
+        "Sehr geehrte Damen und Herren,\n"
+        "Ihr Copyright-Verstoß vom 3. Juli wurde geprüft.\n"
+        "Die Datenschutzerklärung Ihrer Seite ist ebenfalls betroffen.\n"
+        "Bitte melden Sie sich bis Freitag.\n"
+        "Mit freundlichen Grüßen\nKanzlei Muster\n"
+        "___\nImpressum: Kanzlei Muster, Amtsgericht Köln\n© 2025 Kanzlei Muster\n"
+    )
+    text = normalisiere_text(body)
+    assert "Copyright-Verstoß" in text and "Datenschutzerklärung Ihrer Seite" in text
+    assert "Amtsgericht" not in text and "© 2025" not in text
+
+
+def test_weitergeleitete_nachricht_bleibt_antwortverlauf_nicht():
+    weiterleitung = (
+        "---------- Forwarded message ---------\n"
+        "From: Shop <bestellung@shop.de>\nDate: Mo., 1. Sept. 2025\nSubject: Ihre Bestellung\n\n"
+        "Ihre Bestellung 4711 wurde versandt.\n"
+    )
+    assert "Bestellung 4711 wurde versandt" in normalisiere_text(weiterleitung)
+    assert "Bestellung 4711" in normalisiere_text("________________\n" + weiterleitung.split("\n", 1)[1])
+
+    antwort = "Passt, danke!\n\n________________________________\nVon: Maria <m@example.com>\nGesendet: Montag\n\nAlter Verlauf\n"
+    assert normalisiere_text(antwort) == "Passt, danke!"
@@ -0,0 +1,74 @@
+import base64
+from unittest.mock import MagicMock
+
+import training_store
+from training_store import TrainingsStore
+
+
+def fake_msg(msg_id):
+    return {
+        "id": msg_id,
+        "payload": {
+            "headers": [{"name": "Subject", "value": f"Betreff {msg_id}"}, {"name": "From", "value": "a@b.de"}],
+            "body": {"data": base64.urlsafe_b64encode(b"x" * 2000).decode()},
+        },
+    }
+
+
+def test_synchronisiere_laedt_nur_neue_und_entfernt_alte(tmp_path, monkeypatch):
+    listing = {"Label_1": ["1", "2"]}
+    geladen = []
+
+    def fake_get_batch(service, ids):
+        geladen.extend(ids)
+        return {i: fake_msg(i) for i in ids}
+
+    monkeypatch.setattr(training_store, "get_emails_for_label",
+                        lambda service, label_id, max_results: [{"id": i} for i in listing[label_id]])
+    monkeypatch.setattr(training_store, "batch_get_full", fake_get_batch)
+
+    store = TrainingsStore(str(tmp_path / "t.db"))
+    store.synchronisiere(MagicMock(), {"Label_1": "Rechnungen"})
+    assert geladen == ["1", "2"]
+
+    listing["Label_1"] = ["2", "3"]
+    store.synchronisiere(MagicMock(), {"Label_1": "Rechnungen"})
+    assert geladen == ["1", "2", "3"]
+
+    daten = store.lade()
+    assert [d["subject"] for d in daten] == ["Betreff 2", "Betreff 3"]
+    assert daten[0]["label"] == "Rechnungen"
+    assert len(daten[0]["body"]) == training_store.TRAININGS_BODY_LAENGE
+
+
+def test_synchronisiere_entfernt_geloeschte_labels(tmp_path, monkeypatch):
+    monkeypatch.setattr(training_store, "get_emails_for_label", lambda service, label_id, max_results: [{"id": "1"}])
+    monkeypatch.setattr(training_store, "batch_get_full", lambda service, ids: {i: fake_msg(i) for i in ids})
+
+    pfad = str(tmp_path / "t.db")
+    store = TrainingsStore(pfad)
+    store.synchronisiere(MagicMock(), {"Label_1": "Alt", "Label_2": "Neu"})
+    store.close()
+
+    store = TrainingsStore(pfad)
+    store.synchronisiere(MagicMock(), {"Label_2": "Neu umbenannt"})
+    assert [d["label"] for d in store.lade()] == ["Neu umbenannt"]
+
+
+def test_version_aendert_sich_nur_bei_aenderungen(tmp_path, monkeypatch):
+    listing = {"Label_1": ["1", "2"]}
+    monkeypatch.setattr(training_store, "get_emails_for_label",
+                        lambda service, label_id, max_results: [{"id": i} for i in listing[label_id]])
+    monkeypatch.setattr(training_store, "batch_get_full", lambda service, ids: {i: fake_msg(i) for i in ids})
+
+    store = TrainingsStore(str(tmp_path / "t.db"))
+    store.synchronisiere(MagicMock(), {"Label_1": "Rechnungen"})
+    vorher = store.lade()
+    store.synchronisiere(MagicMock(), {"Label_1": "Rechnungen"})
+    assert store.lade().version == vorher.version
+
+    # Gleiche Anzahl Beispiele, anderer Inhalt
+    listing["Label_1"] = ["1", "3"]
+    store.synchronisiere(MagicMock(), {"Label_1": "Rechnungen"})
+    nachher = store.lade()
+    assert len(nachher) == len(vorher) and nachher.version != vorher.version
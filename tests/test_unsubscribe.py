@@ -0,0 +1,68 @@
+from unittest.mock import MagicMock
+
+from unsubscribe import AbmeldeExecutor, lade_abmelde_historie
+
+
+def fake_session():
+    session = MagicMock()
+    session.get.return_value.status_code = 200
+    session.post.return_value.status_code = 200
+    return session
+
+
+def test_historie_aus_log(tmp_path):
+    log = tmp_path / "unsubscribe_log.txt"
+    log.write_text(
+        "2025-07-17 12:43:13 | Betreff | mit | Pipe | https://a.example/u?x=1\n"
+        "2025-07-17 12:44:13 | Sale | https://b.example/u | News@Shop.de\n",
+        encoding="utf-8",
+    )
+    urls, absender = lade_abmelde_historie(str(log))
+    assert urls == {"https://a.example/u?x=1", "https://b.example/u"}
+    assert absender == {"news@shop.de"}
+
+
+def test_one_click_post_und_deduplizierung(tmp_path):
+    log = tmp_path / "unsubscribe_log.txt"
+    session = fake_session()
+    executor = AbmeldeExecutor(str(log), session=session)
+    future = executor.abmelden("<https://list.example/unsub>", "Newsletter 1", "Shop <news@shop.de>",
+                               "List-Unsubscribe=One-Click")
+    assert future.result() == 200
+    session.post.assert_called_once()
+    assert session.post.call_args.kwargs["data"] == {"List-Unsubscribe": "One-Click"}
+
+    # Gleicher Absender, andere URL -> keine zweite Anfrage
+    assert executor.abmelden("<https://list.example/unsub2>", "Newsletter 2", "news@shop.de") is None
+    executor.beenden()
+    assert executor.gestartet == 1 and executor.uebersprungen == 1
+
+    # Neuer Lauf kennt die Abmeldung aus dem Log
+    neu = AbmeldeExecutor(str(log), session=fake_session())
+    assert neu.abmelden("<https://list.example/unsub>", "Newsletter 3") is None
+    neu.beenden()
+
+
+def test_get_ohne_one_click_und_mailto(tmp_path):
+    session = fake_session()
+    executor = AbmeldeExecutor(str(tmp_path / "log.txt"), session=session)
+    executor.abmelden("<https://x.example/u>", "Betreff").result()
+    session.get.assert_called_once()
+    assert executor.abmelden("<mailto:unsub@x.example>", "Betreff", "a@x.example") is None
+    executor.beenden()
+    assert "mailto:unsub@x.example" in (tmp_path / "log.txt").read_text(encoding="utf-8")
+
+
+def test_fehlgeschlagene_abmeldung_wird_erneut_versucht(tmp_path):
+    log = tmp_path / "log.txt"
+    session = fake_session()
+    session.get.side_effect = [ConnectionError("Timeout"), MagicMock(status_code=503), MagicMock(status_code=200)]
+    executor = AbmeldeExecutor(str(log), session=session)
+    assert executor.abmelden("<https://x.example/u>", "Sale", "news@x.example").result() is None
+    assert executor.abmelden("<https://x.example/u>", "Sale", "news@x.example").result() == 503
+    assert not log.exists()
+    assert executor.abmelden("<https://x.example/u>", "Sale", "news@x.example").result() == 200
+    assert executor.abmelden("<https://x.example/u>", "Sale", "news@x.example") is None
+    executor.beenden()
+    assert session.get.call_count == 3
+    assert log.read_text(encoding="utf-8").count("https://x.example/u") == 1
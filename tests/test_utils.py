@@ -0,0 +1,36 @@
+import base64
+
+from utils import get_email_body
+
+
+def b64(text):
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode().rstrip("=")
+
+
+def test_get_email_body_verschachtelte_multiparts():
+    full_msg = {"payload": {"mimeType": "multipart/mixed", "parts": [
+        {"mimeType": "multipart/alternative", "parts": [
+            {"mimeType": "text/html", "body": {"data": b64("<p>HTML</p>")}},
+            {"mimeType": "text/plain", "body": {"data": b64("Nur Text")}},
+        ]},
+        {"mimeType": "application/pdf", "body": {"attachmentId": "a1", "size": 1000}},
+    ]}}
+    assert get_email_body(full_msg) == "Nur Text"
+
+
+def test_get_email_body_html_fallback_und_byte_budget():
+    full_msg = {"payload": {"parts": [{"mimeType": "text/html", "body": {"data": b64("ä" * 1000)}}]}}
+    body = get_email_body(full_msg, max_bytes=100)
+    assert 45 <= len(body) <= 51
+    assert set(body) == {"ä"}
+    assert len(get_email_body(full_msg, max_bytes=None)) == 1000
+
+
+def test_get_email_body_ohne_body():
+    assert get_email_body({"payload": {"headers": []}}) == ""
+
+
+def test_get_email_body_html_budget_nach_textextraktion():
+    html = "<html><head><style>" + ".x { color: red; }\n" * 2000 + "</style></head><body><p>Ihre Rechnung</p></body></html>"
+    full_msg = {"payload": {"parts": [{"mimeType": "text/html", "body": {"data": b64(html)}}]}}
+    assert get_email_body(full_msg, max_bytes=1000).strip() == "Ihre Rechnung"
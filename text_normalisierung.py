@@ -0,0 +1,168 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+
+# Token-Budget für den E-Mail-Text im Prompt (ersetzt das frühere Abschneiden nach 2000 Zeichen)
+PROMPT_BODY_TOKENS = int(os.getenv("PROMPT_BODY_TOKENS", 500))
+NORMALISIERUNG_CACHE_GROESSE = int(os.getenv("NORMALISIERUNG_CACHE_GROESSE", 2048))
+
+_MAX_URL_LAENGE = 40
+_HTML_ERKENNUNG = re.compile(r'<\s*(html|body|div|p|br|table|td|span|a|img|style)\b', re.IGNORECASE)
+_URL = re.compile(r'https?://[^\s<>"\')\]]+')
+_TOKEN = re.compile(r'\w+|[^\w\s]', re.UNICODE)
+
+# Ab hier folgt nur noch zitierter Verlauf
+_ANTWORT_KOPF = re.compile(
+    r'^\s*(am .{1,200} schrieb .{0,200}:|on .{1,200} wrote:|-{2,}\s*(ursprüngliche nachricht|original message)\s*-{2,})\s*$',
+    re.IGNORECASE
+)
+# Kopfzeile einer zitierten Nachricht (Outlook); auch Kopf weitergeleiteter Nachrichten, daher nur nach einem Trenner
+_VON_KOPF = re.compile(r'^\s*(von|from):\s.*@.*$', re.IGNORECASE)
+_TRENNER = re.compile(r'^\s*_{3,}\s*$')
+_SIGNATUR = re.compile(r'^\s*--\s*$')
+# Typische Fußzeilen (Impressum, Rechtliches); Abmelde-Hinweise bleiben als Newsletter-Signal erhalten.
+# Gilt nur im Fußbereich: nach dem letzten ___-Trenner oder in den letzten _FUSS_ZEILEN Textzeilen
+# (bei kürzeren Texten nur nach einem Trenner).
+_FUSS_ZEILEN = 3
+_FUSSZEILE = re.compile(
+    r'(impressum|datenschutz(erklärung|hinweis)|privacy policy|alle rechte vorbehalten|all rights reserved'
+    r'|copyright|©|handelsregister|registergericht|geschäftsführ|ust-?id|steuernummer|amtsgericht'
+    r'|diese e-?mail (wurde|ist|enthält) .*(automatisch|vertraulich)|this (e-?mail|message) (is|was|may) .*(confidential|automatically))',
+    re.IGNORECASE
+)
+
+_BLOCK_TAGS = {'p', 'div', 'br', 'tr', 'li', 'table', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'section', 'article'}
+_IGNORIERTE_TAGS = {'script', 'style', 'head', 'title', 'noscript'}
+
+
+class _TextExtraktor(HTMLParser):
+    """Sehr einfacher HTML->Text-Konverter ohne DOM: sammelt nur sichtbaren Text."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.teile: list[str] = []
+        self._ignorieren = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _IGNORIERTE_TAGS:
+            self._ignorieren += 1
+        elif tag in _BLOCK_TAGS:
+            self.teile.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in _IGNORIERTE_TAGS:
+            self._ignorieren = max(0, self._ignorieren - 1)
+        elif tag in _BLOCK_TAGS:
+            self.teile.append('\n')
+
+    def handle_data(self, data):
+        if not self._ignorieren:
+            self.teile.append(data)
+
+
+def html_zu_text(html: str) -> str:
+    parser = _TextExtraktor()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        # Kaputtes Markup: Tags grob entfernen
+        return re.sub(r'<[^>]+>', ' ', html)
+    return ''.join(parser.teile)
+
+
+def _kuerze_url(match: re.Match) -> str:
+    url = match.group(0)
+    if len(url) <= _MAX_URL_LAENGE:
+        return url
+    return f"[Link: {urlparse(url).netloc}]"
+
+
+def zaehle_tokens(text: str) -> int:
+    """Schätzt die Tokenanzahl: Wörter und Satzzeichen, lange Wörter zählen mehrfach (~4 Zeichen pro Token)."""
+    return sum(len(t) // 4 + 1 for t in _TOKEN.findall(text))
+
+
+def kuerze_auf_tokens(text: str, max_tokens: int) -> str:
+    """Schneidet den Text nach max_tokens (geschätzten) Tokens ab."""
+    verbraucht = 0
+    for match in _TOKEN.finditer(text):
+        verbraucht += len(match.group(0)) // 4 + 1
+        if verbraucht > max_tokens:
+            return text[:match.start()].rstrip()
+    return text
+
+
+def _ohne_fusszeilen(zeilen: list[str]) -> list[str]:
+    """Entfernt Fußzeilen im Fußbereich und fasst Leerzeilen zusammen."""
+    textzeilen = [i for i, z in enumerate(zeilen) if z]
+    fuss_start = textzeilen[-_FUSS_ZEILEN] if len(textzeilen) > _FUSS_ZEILEN else len(zeilen)
+    trenner = [i for i, z in enumerate(zeilen) if _TRENNER.match(z)]
+    if trenner:
+        fuss_start = min(fuss_start, trenner[-1])
+    ergebnis = []
+    for i, zeile in enumerate(zeilen):
+        if i >= fuss_start and _FUSSZEILE.search(zeile):
+            continue
+        if zeile or (ergebnis and ergebnis[-1]):
+            ergebnis.append(zeile)
+    return ergebnis
+
+
+def normalisiere_text(body: str, max_tokens: int | None = PROMPT_BODY_TOKENS) -> str:
+    """
+    Bereitet einen E-Mail-Body für den Prompt auf: HTML -> Text, zitierte Antworten, Signaturen und
+    Fußzeilen entfernen, lange URLs kürzen, Whitespace zusammenfassen und auf max_tokens kürzen.
+    """
+    if not body:
+        return ""
+    if _HTML_ERKENNUNG.search(body):
+        body = html_zu_text(body)
+    zeilen = []
+    vorherige = ""
+    for zeile in body.splitlines():
+        if _ANTWORT_KOPF.match(zeile) or _SIGNATUR.match(zeile):
+            break
+        zeile = zeile.strip()
+        # Von:/From: nach Zitat oder Trenner unter eigenem Text beginnt den Verlauf; ohne eigenen Text
+        # (reine Weiterleitung) bleibt der weitergeleitete Inhalt erhalten
+        if _VON_KOPF.match(zeile) and (vorherige.startswith('>') or _TRENNER.match(vorherige)):
+            if any(z and not _TRENNER.match(z) for z in zeilen):
+                while zeilen and (not zeilen[-1] or _TRENNER.match(zeilen[-1])):
+                    zeilen.pop()
+                break
+        if zeile:
+            vorherige = zeile
+        if zeile.startswith('>'):
+            continue
+        zeilen.append(re.sub(r'[ \t\u00a0\u200b\u200c]+', ' ', _URL.sub(_kuerze_url, zeile)))
+    zeilen = _ohne_fusszeilen(zeilen)
+    text = '\n'.join(zeilen).strip()
+    if max_tokens:
+        text = kuerze_auf_tokens(text, max_tokens)
+    return text
+
+
+_cache: OrderedDict[tuple, str] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def normalisiere_email(msg_id: str | None, body: str, max_tokens: int | None = PROMPT_BODY_TOKENS) -> str:
+    """Wie normalisiere_text, aber pro Nachrichten-ID gemerkt (LRU), da dieselbe E-Mail mehrfach ausgewertet wird."""
+    if not msg_id:
+        return normalisiere_text(body, max_tokens)
+    # Länge des Bodys gehört zum Schlüssel: Metadaten-Abruf (ohne Body) und Vollabruf unterscheiden sich
+    schluessel = (msg_id, max_tokens, len(body or ''))
+    with _cache_lock:
+        if schluessel in _cache:
+            _cache.move_to_end(schluessel)
+            return _cache[schluessel]
+    text = normalisiere_text(body, max_tokens)
+    with _cache_lock:
+        _cache[schluessel] = text
+        while len(_cache) > NORMALISIERUNG_CACHE_GROESSE:
+            _cache.popitem(last=False)
+    return text
@@ -0,0 +1,115 @@
+import itertools
+import logging
+import os
+import sqlite3
+from gmail_utils import batch_get_full, get_emails_for_label
+from utils import get_email_body
+from text_normalisierung import normalisiere_text
+
+TRAININGS_DB = os.getenv("TRAININGS_DB", "trainingsdaten.db")
+TRAININGS_BODY_LAENGE = int(os.getenv("TRAININGS_BODY_LAENGE", 500))
+
+
+# Prozessweit eindeutig, damit Versionen verschiedener Speicher (Postfächer) nie übereinstimmen
+_versionen = itertools.count(1)
+
+
+class Trainingsdaten(list):
+    """Unveränderlich gemeinte Liste der Trainingsbeispiele mit der Version des Speichers beim Laden."""
+
+    def __init__(self, beispiele=(), version: int | None = None):
+        super().__init__(beispiele)
+        self.version = version
+
+
+def _header(headers: list[dict], name: str, default: str = '') -> str:
+    return next((h['value'] for h in headers if h['name'] == name), default)
+
+
+class TrainingsStore:
+    """
+    Lokaler SQLite-Speicher der Trainingsbeispiele (ID, Label, Betreff, Absender, gekürzter Body).
+    Pro Lauf werden nur noch unbekannte E-Mails geladen und aus dem Label entfernte gelöscht.
+    """
+
+    def __init__(self, pfad: str = TRAININGS_DB):
+        self._conn = sqlite3.connect(pfad, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS beispiele (
+                label_id TEXT NOT NULL,
+                msg_id TEXT NOT NULL,
+                label TEXT NOT NULL,
+                subject TEXT,
+                sender TEXT,
+                body TEXT,
+                PRIMARY KEY (label_id, msg_id)
+            )
+        """)
+        self._conn.commit()
+        # Ändert sich bei jedem Schreibzugriff; Classifier bauen Index und lokales Modell nur bei neuer Version ab
+        self.version = next(_versionen)
+
+    def bekannte_ids(self, label_id: str) -> set[str]:
+        rows = self._conn.execute("SELECT msg_id FROM beispiele WHERE label_id = ?", (label_id,))
+        return {row[0] for row in rows}
+
+    def speichere(self, label_id: str, label_name: str, full_msgs: list[dict]) -> None:
+        rows = []
+        for full_msg in full_msgs:
+            headers = full_msg['payload']['headers']
+            rows.append((
+                label_id,
+                full_msg['id'],
+                label_name,
+                _header(headers, 'Subject', '(Kein Betreff)'),
+                _header(headers, 'From'),
+                normalisiere_text(get_email_body(full_msg), max_tokens=None)[:TRAININGS_BODY_LAENGE],
+            ))
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO beispiele VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.version = next(_versionen)
+
+    def entferne(self, label_id: str, msg_ids: set[str] | None = None) -> None:
+        """Entfernt einzelne E-Mails eines Labels oder (ohne msg_ids) das ganze Label."""
+        with self._conn:
+            if msg_ids is None:
+                self._conn.execute("DELETE FROM beispiele WHERE label_id = ?", (label_id,))
+            else:
+                self._conn.executemany("DELETE FROM beispiele WHERE label_id = ? AND msg_id = ?",
+                                       [(label_id, msg_id) for msg_id in msg_ids])
+        self.version = next(_versionen)
+
+    def synchronisiere(self, service, label_dict: dict[str, str], max_pro_label: int = 50) -> None:
+        """
+        Gleicht den Speicher mit Gmail ab: listet pro Label die aktuellen IDs, lädt nur neue E-Mails
+        (per Batch) nach und löscht E-Mails, die das Label verlassen haben.
+        """
+        for label_id in {row[0] for row in self._conn.execute("SELECT DISTINCT label_id FROM beispiele")} - set(label_dict):
+            self.entferne(label_id)
+        for label_id, label_name in label_dict.items():
+            aktuelle_ids = {msg['id'] for msg in get_emails_for_label(service, label_id, max_results=max_pro_label)}
+            bekannte = self.bekannte_ids(label_id)
+            neue = aktuelle_ids - bekannte
+            veraltet = bekannte - aktuelle_ids
+            if veraltet:
+                self.entferne(label_id, veraltet)
+            if neue:
+                full_msgs = batch_get_full(service, sorted(neue))
+                self.speichere(label_id, label_name, list(full_msgs.values()))
+            with self._conn:
+                # Umbenannte Labels nachziehen
+                umbenannt = self._conn.execute("UPDATE beispiele SET label = ? WHERE label_id = ? AND label != ?",
+                                               (label_name, label_id, label_name)).rowcount
+            if umbenannt:
+                self.version = next(_versionen)
+            if neue or veraltet:
+                logging.info(f"Trainingsdaten '{label_name}': {len(neue)} neu, {len(veraltet)} entfernt.")
+
+    def lade(self) -> Trainingsdaten:
+        """Gibt alle gespeicherten Beispiele im bisherigen trainingsdaten-Format zurück, mit der aktuellen Version."""
+        rows = self._conn.execute("SELECT msg_id, label, subject, sender, body FROM beispiele ORDER BY label, msg_id")
+        return Trainingsdaten(({"id": msg_id, "label": label, "subject": subject, "sender": sender, "body": body}
+                               for msg_id, label, subject, sender, body in rows), self.version)
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,150 @@
+import logging
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metriken import gemessen
+from utils import log_unsubscribe_link
+
+ABMELDE_WORKER = int(os.getenv("ABMELDE_WORKER", 8))
+ABMELDE_PRO_HOST = int(os.getenv("ABMELDE_PRO_HOST", 2))
+ABMELDE_TIMEOUT = float(os.getenv("ABMELDE_TIMEOUT", 10))
+
+
+def absender_adresse(sender: str) -> str:
+    """Reine Absenderadresse aus einem From-Header ("Name <a@b.de>" -> "a@b.de")."""
+    match = re.search(r'<([^>]+)>', sender or '')
+    return (match.group(1) if match else sender or '').strip().lower()
+
+
+def lade_abmelde_historie(unsubscribe_log: str) -> tuple[set[str], set[str]]:
+    """Liest bereits verwendete Abmelde-URLs und Absender aus der Logdatei ("Zeit | Betreff | URL [| Absender]")."""
+    urls: set[str] = set()
+    absender: set[str] = set()
+    try:
+        with open(unsubscribe_log, "r", encoding="utf-8") as f:
+            for zeile in f:
+                teile = zeile.rstrip("\n").split(" | ")
+                # Der Betreff kann selbst " | " enthalten: URL ist das letzte http/mailto-Feld
+                for idx in range(len(teile) - 1, 0, -1):
+                    if teile[idx].startswith(("http", "mailto:")):
+                        urls.add(teile[idx])
+                        if idx + 1 < len(teile) and teile[idx + 1]:
+                            absender.add(teile[idx + 1].lower())
+                        break
+    except FileNotFoundError:
+        pass
+    return urls, absender
+
+
+class AbmeldeExecutor:
+    """
+    Führt Newsletter-Abmeldungen im Hintergrund aus, damit die Klassifizierung nie auf fremde Server wartet.
+    Nutzt eine gemeinsame Keep-Alive-Session, begrenzt parallele Anfragen pro Host und meldet sich pro
+    URL bzw. Absender nur einmal erfolgreich ab (auch über Läufe hinweg, anhand des Abmelde-Logs);
+    fehlgeschlagene Abmeldungen (Netzwerkfehler, 4xx/5xx) werden beim nächsten Newsletter erneut versucht.
+    Mit List-Unsubscribe-Post wird die Ein-Klick-Abmeldung nach RFC 8058 (POST) verwendet.
+    """
+
+    def __init__(self, unsubscribe_log: str, worker: int = ABMELDE_WORKER, pro_host: int = ABMELDE_PRO_HOST,
+                 timeout: float = ABMELDE_TIMEOUT, session: requests.Session | None = None):
+        self._unsubscribe_log = unsubscribe_log
+        self._timeout = timeout
+        self._pro_host = pro_host
+        self._pool = ThreadPoolExecutor(max_workers=worker, thread_name_prefix="abmelden")
+        self._session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=worker, pool_maxsize=worker)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._host_limits: dict[str, threading.Semaphore] = {}
+        self._urls, self._absender = lade_abmelde_historie(unsubscribe_log)
+        # Gerade laufende HTTP-Abmeldungen (noch nicht erfolgreich, daher nicht in _urls/_absender)
+        self._laufend: set[str] = set()
+        self._laufend_absender: set[str] = set()
+        self.gestartet = 0
+        self.uebersprungen = 0
+
+    def _host_limit(self, host: str) -> threading.Semaphore:
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.Semaphore(self._pro_host)
+            return self._host_limits[host]
+
+    def abmelden(self, list_unsubscribe: str, subject: str, sender: str = "",
+                 list_unsubscribe_post: str | None = None) -> Future | None:
+        """
+        Plant eine Abmeldung über den List-Unsubscribe-Header ein (HTTP oder mailto).
+        :return: Future der HTTP-Anfrage, None wenn bereits abgemeldet oder keine HTTP-URL vorhanden
+        """
+        urls = re.findall(r'<(http[^>]+)>', list_unsubscribe)
+        mailtos = re.findall(r'<mailto:([^>]+)>', list_unsubscribe)
+        if not urls and not mailtos:
+            return None
+        url = urls[0] if urls else f"mailto:{mailtos[0]}"
+        adresse = absender_adresse(sender)
+        with self._lock:
+            if (url in self._urls or url in self._laufend
+                    or (adresse and (adresse in self._absender or adresse in self._laufend_absender))):
+                self.uebersprungen += 1
+                logging.info(f"Abmeldung übersprungen (bereits erledigt oder in Arbeit): {adresse or url}")
+                return None
+            if not urls:
+                self._merke(url, adresse, subject)
+            else:
+                self._laufend.add(url)
+                if adresse:
+                    self._laufend_absender.add(adresse)
+        if not urls:
+            logging.info(f"Abmeldung per E-Mail an: {mailtos[0]}")
+            return None
+        self.gestartet += 1
+        one_click = bool(list_unsubscribe_post) and "one-click" in list_unsubscribe_post.lower()
+        return self._pool.submit(self._http_abmelden, url, one_click, subject, adresse)
+
+    def _merke(self, url: str, adresse: str, subject: str) -> None:
+        """Abmeldung als erledigt merken und loggen (Aufrufer hält self._lock)."""
+        self._urls.add(url)
+        if adresse:
+            self._absender.add(adresse)
+        log_unsubscribe_link(subject, url, self._unsubscribe_log, adresse)
+
+    @gemessen("abmelden_http")
+    def _http_abmelden(self, url: str, one_click: bool, subject: str = "", adresse: str = "") -> int | None:
+        status = None
+        try:
+            with self._host_limit(urlparse(url).netloc):
+                if one_click:
+                    # RFC 8058: POST mit "List-Unsubscribe=One-Click" als Formular-Body
+                    response = self._session.post(url, data={"List-Unsubscribe": "One-Click"}, timeout=self._timeout)
+                else:
+                    response = self._session.get(url, timeout=self._timeout)
+            status = response.status_code
+            if status < 400:
+                logging.info(f"Abmeldung durchgeführt ({'One-Click' if one_click else 'GET'}), Status: {status} – {url}")
+            else:
+                logging.warning(f"Abmeldung über {url} fehlgeschlagen, Status: {status} – wird erneut versucht")
+            return status
+        except Exception as e:
+            logging.warning(f"Fehler bei der Abmeldung über {url}: {e}")
+            return None
+        finally:
+            # Nur erfolgreiche Abmeldungen gelten als erledigt; sonst beim nächsten Newsletter erneut versuchen
+            with self._lock:
+                self._laufend.discard(url)
+                self._laufend_absender.discard(adresse)
+                if status is not None and status < 400:
+                    self._merke(url, adresse, subject)
+
+    def beenden(self, warten: bool = True) -> None:
+        """Wartet auf laufende Abmeldungen und schließt die Session."""
+        self._pool.shutdown(wait=warten)
+        self._session.close()
+
+    def bericht(self) -> str:
+        return f"Abmeldungen: {self.gestartet} gestartet, {self.uebersprungen} als Duplikat übersprungen."
@@ -1,33 +1,66 @@
 import base64
+import os
 import datetime
 import requests
 import re
 from typing import Any, Dict, List, Optional
 
-def get_email_body(full_msg: dict) -> str:
-    """Extrahiert den Body einer E-Mail (text/plain bevorzugt, sonst text/html)."""
-    body_data = ""
-    if 'parts' in full_msg['payload']:
-        for part in full_msg['payload']['parts']:
-            if part['mimeType'] == 'text/plain' and 'data' in part['body']:
-                body_data = part['body']['data']
-                break
-        if not body_data:
-            for part in full_msg['payload']['parts']:
-                if part['mimeType'] == 'text/html' and 'data' in part['body']:
-                    body_data = part['body']['data']
-                    break
-    elif 'body' in full_msg['payload'] and 'data' in full_msg['payload']['body']:
-        body_data = full_msg['payload']['body']['data']
+from text_normalisierung import html_zu_text
+
+# Obergrenze der dekodierten Body-Bytes (Klassifizierung nutzt ohnehin nur den Anfang)
+BODY_MAX_BYTES = int(os.getenv("BODY_MAX_BYTES", 20000))
+
+def _finde_body_data(parts: List[Dict[str, Any]], mime_type: str) -> Optional[str]:
+    """Sucht rekursiv (auch in verschachtelten multipart-Teilen) den ersten Teil mit mime_type und Daten."""
+    for part in parts:
+        if part.get('mimeType') == mime_type and part.get('body', {}).get('data'):
+            return part['body']['data']
+        if 'parts' in part:
+            data = _finde_body_data(part['parts'], mime_type)
+            if data:
+                return data
+    return None
+
+def _dekodiere(body_data: str) -> str:
     try:
+        body_data += '=' * (-len(body_data) % 4)
         return base64.urlsafe_b64decode(body_data).decode('utf-8', errors='ignore')
     except Exception:
         return ""
 
+def get_email_body(full_msg: dict, max_bytes: Optional[int] = BODY_MAX_BYTES) -> str:
+    """
+    Extrahiert den Body einer E-Mail (text/plain bevorzugt, sonst text/html).
+    Bei text/plain werden nur so viele Base64-Zeichen dekodiert, wie für max_bytes nötig sind. HTML wird
+    vollständig dekodiert und erst nach der Textextraktion gekürzt, da <head>/<style> allein oft größer sind.
+    """
+    payload = full_msg.get('payload', {})
+    body_data = ""
+    ist_html = False
+    if 'parts' in payload:
+        body_data = _finde_body_data(payload['parts'], 'text/plain') or ""
+        if not body_data:
+            body_data = _finde_body_data(payload['parts'], 'text/html') or ""
+            ist_html = bool(body_data)
+    elif 'data' in payload.get('body', {}):
+        body_data = payload['body']['data']
+        ist_html = payload.get('mimeType') == 'text/html'
+    if not max_bytes:
+        return _dekodiere(body_data)
+    if ist_html:
+        text = html_zu_text(_dekodiere(body_data))
+        return text.encode('utf-8')[:max_bytes].decode('utf-8', errors='ignore')
+    # 4 Base64-Zeichen ergeben 3 Bytes
+    return _dekodiere(body_data[:(max_bytes + 2) // 3 * 4])
+
 def extract_list_unsubscribe(headers: List[Dict[str, Any]]) -> Optional[str]:
     """Extrahiert den List-Unsubscribe-Header, falls vorhanden."""
+    return extract_header(headers, 'List-Unsubscribe')
+
+def extract_header(headers: List[Dict[str, Any]], name: str) -> Optional[str]:
+    """Extrahiert einen Header (Groß-/Kleinschreibung egal), falls vorhanden."""
     for h in headers:
-        if h['name'].lower() == 'list-unsubscribe':
+        if h['name'].lower() == name.lower():
             return h['value']
     return None
 
@@ -51,10 +84,13 @@ def abmelden_via_list_unsubscribe(header_value: str, subject: str, log_unsubscri
         return True
     return False
 
-def log_unsubscribe_link(subject: str, url: str, unsubscribe_log: str) -> None:
-    """Loggt einen Abmelde-Link in die Logdatei."""
+def log_unsubscribe_link(subject: str, url: str, unsubscribe_log: str, sender: Optional[str] = None) -> None:
+    """Loggt einen Abmelde-Link (optional mit Absender) in die Logdatei."""
+    zeile = f"{datetime.datetime.now()} | {subject} | {url}"
+    if sender:
+        zeile += f" | {sender}"
     with open(unsubscribe_log, "a", encoding="utf-8") as f:
-        f.write(f"{datetime.datetime.now()} | {subject} | {url}\n")
+        f.write(zeile + "\n")
 
 def logge_neue_kategorie(kategorie: str, labelname: str, log_datei: str) -> None:
     """Loggt das Anlegen einer neuen Kategorie in die Logdatei."""